@@ -1,5 +1,10 @@
+import uuid
 from django.contrib import admin
+from django.utils.html import format_html
+from .fields import blind_index
 from .models.go_electric_rebate_application import GoElectricRebateApplication
+from .pagination import EstimatedCountPaginator
+from .services.documents import PROCESSED, document_url
 from django.contrib.admin.templatetags import admin_modify
 from django.contrib.auth.models import Group
 
@@ -19,6 +24,28 @@ admin_modify.submit_row = submit_row_custom
 
 @admin.register(GoElectricRebateApplication)
 class GoElectricRebateApplicationAdmin(admin.ModelAdmin):
+    list_display = (
+        "last_name",
+        "first_name",
+        "user",
+        "application_type",
+        "verified",
+        "created",
+        "documents_preview",
+    )
+    list_select_related = ("user",)
+    # The filters and the default ordering are all backed by indexes
+    list_filter = ("application_type", "verified", "created")
+    ordering = ("-created",)
+    search_fields = ("=email",)
+    search_help_text = "Email, SIN or application ID"
+    list_per_page = 50
+    paginator = EstimatedCountPaginator
+    # Avoids a second COUNT(*) of the whole table next to the filtered one
+    show_full_result_count = False
+    # The documents are shown by their tags, with presigned URLs cached by
+    # document_url rather than a new storage URL on every page
+    exclude = ("doc1", "doc2")
     readonly_fields = (
         "id",
         "application_type",
@@ -33,9 +60,8 @@ class GoElectricRebateApplicationAdmin(admin.ModelAdmin):
         "drivers_licence",
         "date_of_birth",
         "tax_year",
-        "doc1",
+        "net_income",
         "doc1_tag",
-        "doc2",
         "doc2_tag",
         "user",
         "spouse_email",
@@ -43,5 +69,30 @@ class GoElectricRebateApplicationAdmin(admin.ModelAdmin):
         "consent_tax",
     )
 
+    def get_search_results(self, request, queryset, search_term):
+        # SINs are encrypted and only searchable by their blind index, IDs
+        # are matched on the primary key rather than by a scan
+        term = search_term.strip().replace(" ", "").replace("-", "")
+        if term.isdigit() and len(term) == 9:
+            return queryset.filter(sin_hash=blind_index(term)), False
+        try:
+            return queryset.filter(id=uuid.UUID(term)), False
+        except ValueError:
+            pass
+        return super().get_search_results(request, queryset, search_term)
+
+    @admin.display(description="Documents")
+    def documents_preview(self, obj):
+        # Only thumbnails are shown in the list, loaded as they scroll into
+        # view
+        if obj.documents_status != PROCESSED:
+            return "-"
+        return format_html(
+            '<img src="{}" height="48" loading="lazy" /> '
+            '<img src="{}" height="48" loading="lazy" />',
+            document_url(obj.doc1.name, obj.documents_status),
+            document_url(obj.doc2.name, obj.documents_status),
+        )
+
     def has_delete_permission(self, request, obj=None):
         return False
@@ -0,0 +1,228 @@
+"""
+Custom model fields
+"""
+import hashlib
+import hmac
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+
+from cryptography.fernet import Fernet, MultiFernet
+from django.conf import settings
+from django.db.models import CharField
+from django.db.models.query_utils import DeferredAttribute
+from encrypted_fields import fields as encrypted_fields
+
+
+def blind_index(value):
+    """
+    Deterministic keyed hash of a value, so that encrypted columns can be
+    matched with an indexed equality lookup instead of decrypting every row.
+    """
+    if value is None:
+        return None
+
+    return hmac.new(
+        settings.SIN_BLIND_INDEX_KEY.encode('utf-8'),
+        str(value).replace(' ', '').encode('utf-8'),
+        hashlib.sha256
+    ).hexdigest()
+
+
+class BlindIndexField(CharField):
+    """
+    Indexed column holding the blind index of another field on the same
+    model. It is recomputed from the source field every time the model is
+    saved.
+    """
+    def __init__(self, *args, source=None, **kwargs):
+        self.source = source
+        kwargs.setdefault('max_length', 64)
+        kwargs.setdefault('db_index', True)
+        kwargs.setdefault('editable', False)
+        kwargs.setdefault('null', True)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        kwargs['source'] = self.source
+        return name, path, args, kwargs
+
+    def pre_save(self, model_instance, add):
+        value = blind_index(getattr(model_instance, self.source))
+        setattr(model_instance, self.attname, value)
+        return value
+
+
+class Ciphertext(str):
+    """
+    A value read from an encrypted column that hasn't been decrypted yet
+    """
+
+
+def _salt_keys():
+    salt_keys = settings.SALT_KEY
+    if isinstance(salt_keys, list):
+        salt_keys = tuple(salt_keys)
+    return salt_keys
+
+
+@lru_cache(maxsize=None)
+def _fernet_keys(secret_key, salt_keys):
+    # Deriving the keys takes 100,000 PBKDF2 rounds per key, so it's done
+    # once per process rather than once per field
+    return tuple(encrypted_fields.EncryptedFieldMixin().keys)
+
+
+def fernet_keys():
+    """
+    The Fernet keys derived from SECRET_KEY and each SALT_KEY, the one
+    values are encrypted with first
+    """
+    return _fernet_keys(settings.SECRET_KEY, _salt_keys())
+
+
+@lru_cache(maxsize=None)
+def _fernet(secret_key, salt_keys):
+    keys = _fernet_keys(secret_key, salt_keys)
+    if len(keys) == 1:
+        return Fernet(keys[0])
+    return MultiFernet([Fernet(key) for key in keys])
+
+
+def fernet():
+    return _fernet(settings.SECRET_KEY, _salt_keys())
+
+
+_DECRYPTED = ContextVar('decrypted', default=None)
+
+# Plaintexts a DecryptMemo holds at most
+MEMO_SIZE = 10000
+
+
+class DecryptMemo(OrderedDict):
+    """
+    The plaintexts of the last maxsize ciphertexts decrypted, so that
+    iterating over a large queryset holds a bounded number of them
+    """
+    def __init__(self, maxsize=None):
+        super().__init__()
+        self.maxsize = MEMO_SIZE if maxsize is None else maxsize
+
+    def __getitem__(self, ciphertext):
+        value = super().__getitem__(ciphertext)
+        self.move_to_end(ciphertext)
+        return value
+
+    def __setitem__(self, ciphertext, value):
+        super().__setitem__(ciphertext, value)
+        self.move_to_end(ciphertext)
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+
+
+@contextmanager
+def decrypt_cache():
+    """
+    Remembers the values decrypted inside the block, so a ciphertext read
+    several times (the same row in a list and a detail, an export walking
+    the same table twice...) is only decrypted once.
+    Entered for every request by api.middleware.DecryptCacheMiddleware.
+    """
+    token = _DECRYPTED.set({})
+    try:
+        yield
+    finally:
+        _DECRYPTED.reset(token)
+
+
+def decrypt(ciphertext, memo=None):
+    """
+    Plaintext of a ciphertext, looked up in memo and the decrypt cache of
+    the current request first
+    """
+    cache = _DECRYPTED.get()
+    for known in (memo, cache):
+        if known is not None and ciphertext in known:
+            return known[ciphertext]
+
+    value = fernet().decrypt(ciphertext.encode('utf-8')).decode('utf-8')
+    for known in (memo, cache):
+        if known is not None:
+            known[ciphertext] = value
+    return value
+
+
+def decrypt_row(row, memo):
+    """
+    Decrypts the Ciphertexts in a row of values() or values_list()
+    """
+    if isinstance(row, Ciphertext):
+        return decrypt(row, memo)
+    if isinstance(row, dict):
+        return {
+            key: (decrypt(value, memo) if isinstance(value, Ciphertext)
+                  else value)
+            for key, value in row.items()
+        }
+    if isinstance(row, tuple):
+        values = [
+            decrypt(value, memo) if isinstance(value, Ciphertext) else value
+            for value in row
+        ]
+        return row._make(values) if hasattr(row, '_make') else tuple(values)
+    return row
+
+
+class DecryptingAttribute(DeferredAttribute):
+    """
+    Decrypts the value of an encrypted field the first time it's read from
+    a model instance
+    """
+    def __get__(self, instance, cls=None):
+        if instance is None:
+            return self
+        value = super().__get__(instance, cls)
+        if isinstance(value, Ciphertext):
+            value = self.field.to_python(value)
+            instance.__dict__[self.field.attname] = value
+        return value
+
+    # Makes this a data descriptor, otherwise the instance's __dict__ would
+    # shadow __get__ once the value is loaded
+    def __set__(self, instance, value):
+        instance.__dict__[self.field.attname] = value
+
+
+class EncryptedCharField(encrypted_fields.EncryptedCharField):
+    """
+    EncryptedCharField storing the same Fernet tokens, but only decrypting
+    them when the attribute is first read (rows loaded for other columns
+    never pay for it), sharing one set of derived keys between fields and
+    caching decrypted values for the request.
+    Querysets of values() or values_list() need to decrypt their rows
+    themselves, see api.managers.sin.SinQuerySet.
+    """
+    descriptor_class = DecryptingAttribute
+
+    @property
+    def f(self):
+        return fernet()
+
+    def get_prep_value(self, value):
+        if isinstance(value, Ciphertext):
+            return str(value)
+        return super().get_prep_value(value)
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return Ciphertext(value)
+
+    def to_python(self, value):
+        if isinstance(value, Ciphertext):
+            value = decrypt(value)
+        if value is None or isinstance(value, str):
+            return value
+        return str(value)
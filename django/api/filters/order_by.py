@@ -3,13 +3,17 @@ Copied from https://github.com/encode/django-rest-framework/issues/1005
 This is to support ordering by nested fields without needing to add
 custom coding per Model
 """
-from typing import List, Tuple
+from typing import Dict, List, Tuple
+from encrypted_fields.fields import EncryptedFieldMixin
 from rest_framework.filters import OrderingFilter
+from django.core.exceptions import FieldDoesNotExist
 from django.db.models import Field, Model, QuerySet
 
 
 class RelatedOrderingFilter(OrderingFilter):
     _max_related_depth = 2
+    # Shared by every instance, the filter is instantiated per request
+    _all_related_fields_cache: Dict[tuple, List[tuple]] = {}
 
     @staticmethod
     def _get_verbose_name(field: Field, non_verbose_name: str) -> str:
@@ -45,6 +49,47 @@ class RelatedOrderingFilter(OrderingFilter):
                 ))
         return valid_fields
 
+    def _all_related_fields(
+            self,
+            model: Model,
+            annotations: Tuple[str]
+    ) -> List[tuple]:
+        """
+        Every field reachable from the model, worked out once per model and
+        set of annotations since walking the relations isn't cheap
+        """
+        cache_key = (model, annotations)
+        valid_fields = self._all_related_fields_cache.get(cache_key)
+        if valid_fields is None:
+            valid_fields = [
+                *[field for field in self._retrieve_all_related_fields(
+                    model._meta.get_fields(),
+                    model
+                ) if not self._is_encrypted(model, field[0])],
+                *[(key, key.title().split('__'))
+                    for key in annotations]
+            ]
+            self._all_related_fields_cache[cache_key] = valid_fields
+        return valid_fields
+
+    @staticmethod
+    def _is_encrypted(model: Model, field_name: str) -> bool:
+        """
+        Whether the field (possibly across relations) is stored encrypted,
+        where sorting would compare ciphertexts after a full scan
+        """
+        for part in field_name.split('__'):
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                return False
+            if isinstance(field, EncryptedFieldMixin):
+                return True
+            if field.related_model is None:
+                return False
+            model = field.related_model
+        return False
+
     def get_valid_fields(
             self,
             queryset: QuerySet,
@@ -55,14 +100,22 @@ class RelatedOrderingFilter(OrderingFilter):
         if not valid_fields == '__all_related__':
             if not context:
                 context = {}
-            valid_fields = super().get_valid_fields(queryset, view, context)
+            valid_fields = [
+                field for field in
+                super().get_valid_fields(queryset, view, context)
+                if not self._is_encrypted(queryset.model, field[0])
+            ]
         else:
+            valid_fields = self._all_related_fields(
+                queryset.model,
+                tuple(sorted(queryset.query.annotations))
+            )
+
+        # Only these can be ordered on when the view has a whitelist, say
+        # the indexed columns
+        whitelist = getattr(view, 'ordering_whitelist', None)
+        if whitelist is not None:
             valid_fields = [
-                *self._retrieve_all_related_fields(
-                    queryset.model._meta.get_fields(),
-                    queryset.model
-                ),
-                *[(key, key.title().split('__'))
-                    for key in queryset.query.annotations]
+                field for field in valid_fields if field[0] in whitelist
             ]
         return valid_fields
@@ -0,0 +1,20 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django_extensions.management.jobs import DailyJob
+
+from api.services.scheduler import prune_runs
+
+LOGGER = logging.getLogger(__name__)
+
+
+class Job(DailyJob):
+    help = "Deletes the succeeded job runs past JOB_RUN_RETENTION_DAYS."
+
+    def execute(self):
+        before = timezone.now() - timedelta(
+            days=settings.JOB_RUN_RETENTION_DAYS
+        )
+        LOGGER.info("%s old job runs deleted", prune_runs(before))
@@ -1,12 +1,29 @@
+import logging
+
+from django.conf import settings
 from django_extensions.management.jobs import HourlyJob
 
+from api.services.cra_inbox import poll
+from api.services.crypto import CryptoPool
+
+LOGGER = logging.getLogger(__name__)
+
 
 class Job(HourlyJob):
-    help = "My sample job."
+    help = "Fetches the new CRA response files and reconciles them."
 
     def execute(self):
-        # executing empty sample job
-        file = open('/api/cron.log','a')
-        file.write('Cron has run\n')
-        file.close()
-        pass
+        if not settings.CRA_FTP_HOST:
+            LOGGER.info("CRA_FTP_HOST isn't set, the CRA inbox isn't polled")
+            return
+
+        with CryptoPool() as crypto_pool:
+            processed = poll(crypto_pool=crypto_pool)
+
+        for entry in processed:
+            LOGGER.info(
+                "%s %s: %s records, %s applications and %s household members "
+                "verified, %s unmatched",
+                entry.path, entry.status, entry.records, entry.applications,
+                entry.household_members, entry.unmatched,
+            )
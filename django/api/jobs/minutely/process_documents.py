@@ -0,0 +1,15 @@
+from django_extensions.management.jobs import MinutelyJob
+
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+from api.services.documents import drain_documents
+
+
+class Job(MinutelyJob):
+    help = "Normalizes uploaded documents and makes their thumbnails."
+
+    def execute(self):
+        for model in (GoElectricRebateApplication, HouseholdMember):
+            drain_documents(model)
@@ -0,0 +1,10 @@
+from django_extensions.management.jobs import MinutelyJob
+
+from api.services.email_outbox import drain_outbox
+
+
+class Job(MinutelyJob):
+    help = "Sends the emails waiting in the outbox."
+
+    def execute(self):
+        drain_outbox()
@@ -1,4 +1,8 @@
 import base64
+import hashlib
+import threading
+import time
+from jose import jwk, jwt
 from keycloak import KeycloakOpenID
 from django.conf import settings
 from django.core.exceptions import ObjectDoesNotExist
@@ -6,6 +10,8 @@ from django.contrib.auth import get_user_model
 from rest_framework.authentication import TokenAuthentication
 from rest_framework.exceptions import AuthenticationFailed
 
+from api.cache import ExpiringLRUCache
+
 import logging
 
 
@@ -29,31 +35,131 @@ def base64_decode(data: str) -> str:
     return base64.urlsafe_b64decode(data).decode("utf-8")
 
 
-class KeycloakAuthentication(TokenAuthentication):
-    keyword = "Bearer"
+class KeycloakKeys:
+    """
+    Process-wide cache of the realm's signing keys, keyed by key id (kid).
 
-    def authenticate_credentials(self, token):
-        keycloak_openid = KeycloakOpenID(
-            server_url=settings.KEYCLOAK_URL,
-            client_id=settings.KEYCLOAK_CLIENT_ID,
-            realm_name=settings.KEYCLOAK_REALM,
+    Keys are fetched from the realm's certs endpoint once per TTL by each
+    worker process, by one thread while the others wait for it. A token
+    signed with an unknown kid triggers a refresh (at most once per refresh
+    interval) so that key rotation is picked up without waiting for the TTL.
+    """
+    def __init__(self, ttl=None, refresh_interval=None):
+        self.ttl = ttl or settings.KEYCLOAK_KEYS_TTL
+        self.refresh_interval = (
+            refresh_interval or settings.KEYCLOAK_KEYS_REFRESH_INTERVAL
         )
+        self._keys = {}
+        self._fetched = 0
+        self._lock = threading.Lock()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = KeycloakOpenID(
+                server_url=settings.KEYCLOAK_URL,
+                client_id=settings.KEYCLOAK_CLIENT_ID,
+                realm_name=settings.KEYCLOAK_REALM,
+            )
+        return self._client
+
+    def get(self, kid):
+        key = self._keys.get(kid)
+        if key is not None and time.time() < self._fetched + self.ttl:
+            return key
+
+        with self._lock:
+            # Another thread may have refreshed while we were waiting
+            key = self._keys.get(kid)
+            now = time.time()
+            if key is not None and now < self._fetched + self.ttl:
+                return key
+            if key is None and now < self._fetched + self.refresh_interval:
+                raise KeyError(kid)
 
-        # Decode the token from the front-end
-        KEYCLOAK_PUBLIC_KEY = (
-            "-----BEGIN PUBLIC KEY-----\n"
-            + keycloak_openid.public_key()
-            + "\n-----END PUBLIC KEY-----"
+            self._fetch()
+
+        return self._keys[kid]
+
+    def _fetch(self):
+        keys = self.client.certs()["keys"]
+        self._keys = {
+            key["kid"]: jwk.construct(key, algorithm=key.get("alg", "RS256"))
+            for key in keys
+            if key.get("use", "sig") == "sig"
+        }
+        self._fetched = time.time()
+        log.debug("Fetched keycloak keys")
+
+
+KEYCLOAK_KEYS = KeycloakKeys()
+
+
+def verify_token(token, keys=None):
+    """
+    Verifies the signature, audience and expiry of a token locally, using
+    the cached realm keys.
+    """
+    keys = keys or KEYCLOAK_KEYS
+    options = {
+        "verify_signature": True,
+        "verify_aud": True,
+        "verify_exp": True,
+        # A token without exp would otherwise be accepted, and cached forever
+        "require_exp": True,
+    }
+
+    try:
+        kid = jwt.get_unverified_header(token).get("kid")
+        return jwt.decode(
+            token,
+            keys.get(kid),
+            algorithms=["RS256"],
+            audience=settings.KEYCLOAK_CLIENT_ID,
+            options=options,
         )
+    except Exception:
+        raise AuthenticationFailed("Invalid Token")
 
-        options = {"verify_signature": True, "verify_aud": True, "verify_exp": True}
 
-        try:
-            token_info = keycloak_openid.decode_token(
-                token, key=KEYCLOAK_PUBLIC_KEY, options=options
-            )
-        except Exception:
-            raise AuthenticationFailed("Invalid Token")
+# Claims of tokens that have already been verified, until they expire
+TOKEN_CACHE = ExpiringLRUCache(settings.KEYCLOAK_TOKEN_CACHE_SIZE)
+
+# Users by sub, invalidated when the user is saved (see api.signals)
+USER_CACHE = ExpiringLRUCache(settings.KEYCLOAK_USER_CACHE_SIZE)
+
+
+def cache_stats():
+    return {
+        "tokens": TOKEN_CACHE.stats(),
+        "users": USER_CACHE.stats(),
+    }
+
+
+def verify_cached_token(token):
+    """
+    Returns the claims of a token, only verifying its signature the first
+    time it is seen.
+    """
+    digest = hashlib.sha256(token.encode("utf-8")).digest()
+    token_info = TOKEN_CACHE.get(digest)
+    if token_info is None:
+        token_info = verify_token(token)
+        TOKEN_CACHE.set(digest, token_info, token_info["exp"])
+
+    return token_info
+
+
+class KeycloakAuthentication(TokenAuthentication):
+    keyword = "Bearer"
+
+    def authenticate_credentials(self, token):
+        token_info = verify_cached_token(token)
+
+        user = USER_CACHE.get(token_info.get("sub"))
+        if user is not None:
+            return user, token
 
         user, created = ITVRUser.objects.get_or_create(
             username=token_info.get("sub"),
@@ -68,4 +174,8 @@ class KeycloakAuthentication(TokenAuthentication):
             log.debug("Created user")
             log.debug(user)
 
+        USER_CACHE.set(
+            user.username, user, time.time() + settings.KEYCLOAK_USER_CACHE_TTL
+        )
+
         return user, token
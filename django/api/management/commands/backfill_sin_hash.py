@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+
+from api.fields import blind_index
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+
+
+class Command(BaseCommand):
+    help = "Fills in the SIN blind index of rows saved before it existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Number of rows decrypted and updated at a time."
+        )
+        parser.add_argument(
+            '--all', action='store_true',
+            help="Recompute every row, e.g. after rotating the key."
+        )
+
+    def handle(self, *args, **options):
+        for model in (GoElectricRebateApplication, HouseholdMember):
+            updated = self.backfill(
+                model, options['chunk_size'], options['all']
+            )
+            self.stdout.write(f"{model.__name__}: {updated} rows updated")
+
+    def backfill(self, model, chunk_size, recompute):
+        queryset = model.objects.all()
+        if not recompute:
+            queryset = queryset.filter(sin_hash__isnull=True)
+
+        rows = queryset.values_list('pk', 'sin') \
+            .iterator(chunk_size=chunk_size)
+        updated = 0
+        chunk = []
+        for pk, sin in rows:
+            chunk.append(model(pk=pk, sin_hash=blind_index(sin)))
+            if len(chunk) >= chunk_size:
+                updated += model.objects.bulk_update(chunk, ['sin_hash'])
+                chunk = []
+
+        if chunk:
+            updated += model.objects.bulk_update(chunk, ['sin_hash'])
+
+        return updated
@@ -0,0 +1,71 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.services import export
+
+
+class Command(BaseCommand):
+    help = (
+        "Exports applications with their household members as CSV or "
+        "Parquet, to a file or to MinIO."
+    )
+
+    def add_arguments(self, parser):
+        destination = parser.add_mutually_exclusive_group(required=True)
+        destination.add_argument(
+            '--output',
+            help="File to write the export to."
+        )
+        destination.add_argument(
+            '--object-name',
+            help="MinIO object to upload the export to."
+        )
+        parser.add_argument(
+            '--format', choices=export.FORMATS, default='csv',
+            help="csv, or parquet (needs pyarrow)."
+        )
+        parser.add_argument(
+            '--columns', default=','.join(export.DEFAULT_COLUMNS),
+            help=(
+                "Comma separated columns to export, out of: "
+                + ', '.join(export.COLUMNS)
+                + ". SINs are only exported (and decrypted) when listed."
+            )
+        )
+        parser.add_argument(
+            '--chunk-size', type=int, default=export.CHUNK_SIZE,
+            help="Rows fetched from the database and written at a time."
+        )
+
+    def handle(self, *args, **options):
+        columns = [
+            column.strip() for column in options['columns'].split(',')
+            if column.strip()
+        ]
+        unknown = set(columns) - set(export.COLUMNS)
+        if unknown:
+            raise CommandError(
+                "Unknown columns: " + ", ".join(sorted(unknown))
+            )
+
+        if options['format'] == 'parquet':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError:
+                raise CommandError("Parquet exports need pyarrow installed")
+
+        if options['output']:
+            with open(options['output'], 'wb') as out:
+                stats = export.export_to(
+                    out, columns, options['format'],
+                    chunk_size=options['chunk_size']
+                )
+        else:
+            stats = export.upload(
+                options['object_name'], columns, options['format'],
+                chunk_size=options['chunk_size']
+            )
+
+        self.stdout.write(
+            f"Exported {stats.rows} rows in {stats.elapsed:.1f}s "
+            f"({stats.rows_per_second:.0f} rows/s)"
+        )
@@ -0,0 +1,39 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+from api.services.documents import drain_documents
+
+
+class Command(BaseCommand):
+    help = "Normalizes uploaded documents and makes their thumbnails."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=10,
+            help="Number of rows leased and processed at a time."
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling for new documents instead of exiting."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help="Seconds between polls when looping."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            for model in (GoElectricRebateApplication, HouseholdMember):
+                processed = drain_documents(model, options['batch_size'])
+                if processed:
+                    self.stdout.write(
+                        f"{model.__name__}: processed {processed} rows"
+                    )
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
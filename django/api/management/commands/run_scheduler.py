@@ -0,0 +1,53 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from api.services.scheduler import job_stats, run_pending
+
+
+class Command(BaseCommand):
+    help = "Runs the scheduled jobs (api/jobs) as they come due."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Run the jobs due now and exit instead of looping."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=30,
+            help="Seconds between checks for due jobs when looping."
+        )
+        parser.add_argument(
+            '--stats', type=int, metavar='DAYS',
+            help="Print the runs, failures and timings of every job over "
+                 "the last DAYS days and exit."
+        )
+
+    def handle(self, *args, **options):
+        if options['stats'] is not None:
+            since = timezone.now() - timedelta(days=options['stats'])
+            for row in job_stats(since):
+                self.stdout.write(
+                    f"{row['job']}: {row['runs']} runs, "
+                    f"{row['failures']} failed, "
+                    f"average {row['average'] or 0:.3f}s, "
+                    f"longest {row['longest'] or 0:.3f}s, "
+                    f"last slot {row['last'].isoformat()}"
+                )
+            return
+
+        while True:
+            # Connections the database dropped while sleeping, or that are
+            # past CONN_MAX_AGE, are replaced before every check
+            close_old_connections()
+            for run in run_pending():
+                self.stdout.write(
+                    f"{run.job} {run.status} for "
+                    f"{run.scheduled_for.isoformat()} in {run.duration:.3f}s"
+                )
+            if options['once']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from api.services.email_outbox import drain_outbox
+
+
+class Command(BaseCommand):
+    help = "Sends the emails waiting in the outbox."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=50,
+            help="Number of emails locked and sent at a time."
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help="Keep polling the outbox instead of exiting once it's empty."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help="Seconds between polls when looping."
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            processed = drain_outbox(options['batch_size'])
+            if processed:
+                self.stdout.write(f"Processed {processed} emails")
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,40 @@
+from django.db.models import QuerySet
+
+from api.fields import DecryptMemo, blind_index, decrypt_row
+
+
+def decrypting(iterable_class):
+    """
+    Iterable of values() or values_list() rows with their encrypted
+    columns decrypted, ciphertexts repeated across nearby rows (joined
+    rows of the same application...) once
+    """
+    class DecryptingIterable(iterable_class):
+        def __iter__(self):
+            memo = DecryptMemo()
+            for row in super().__iter__():
+                yield decrypt_row(row, memo)
+
+    return DecryptingIterable
+
+
+class SinQuerySet(QuerySet):
+    """
+    Lookups on the encrypted SIN through its blind index. Rows of values()
+    and values_list() come back with the SIN decrypted.
+    """
+    def values(self, *fields, **expressions):
+        clone = super().values(*fields, **expressions)
+        clone._iterable_class = decrypting(clone._iterable_class)
+        return clone
+
+    def values_list(self, *fields, flat=False, named=False):
+        clone = super().values_list(*fields, flat=flat, named=named)
+        clone._iterable_class = decrypting(clone._iterable_class)
+        return clone
+
+    def filter_sin(self, sin):
+        return self.filter(sin_hash=blind_index(sin))
+
+    def filter_sins(self, sins):
+        return self.filter(sin_hash__in=[blind_index(sin) for sin in sins])
@@ -0,0 +1,13 @@
+from api.fields import decrypt_cache
+
+
+class DecryptCacheMiddleware:
+    """
+    Decrypts every encrypted value at most once per request
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with decrypt_cache():
+            return self.get_response(request)
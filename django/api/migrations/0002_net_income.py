@@ -0,0 +1,23 @@
+# Generated by Django 4.0.1 on 2026-10-18 11:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goelectricrebateapplication',
+            name='net_income',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='householdmember',
+            name='net_income',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
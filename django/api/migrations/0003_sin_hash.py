@@ -0,0 +1,24 @@
+# Generated by Django 4.0.1 on 2026-10-18 11:49
+
+import api.fields
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_net_income'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goelectricrebateapplication',
+            name='sin_hash',
+            field=api.fields.BlindIndexField(db_index=True, editable=False, max_length=64, null=True, source='sin'),
+        ),
+        migrations.AddField(
+            model_name='householdmember',
+            name='sin_hash',
+            field=api.fields.BlindIndexField(db_index=True, editable=False, max_length=64, null=True, source='sin'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:02
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_documents_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(fields=['application_type'], name='go_electric_applica_f27756_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(fields=['verified'], name='go_electric_verifie_0f6669_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(fields=['created'], name='go_electric_created_1ac733_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='application_email_upper_idx'),
+        ),
+    ]
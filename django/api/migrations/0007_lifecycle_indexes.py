@@ -0,0 +1,37 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_admin_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='goelectricrebateapplication',
+            name='go_electric_verifie_0f6669_idx',
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(condition=models.Q(('verified', False)), fields=['tax_year'], name='application_pending_cra_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(condition=models.Q(('verified', False)), fields=['created'], name='application_unverified_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(condition=models.Q(('documents_status', 'pending')), fields=['created'], name='application_pending_docs_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='householdmember',
+            index=models.Index(condition=models.Q(('verified', False)), fields=['application'], name='member_pending_cra_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='householdmember',
+            index=models.Index(condition=models.Q(('documents_status', 'pending')), fields=['created'], name='member_pending_docs_idx'),
+        ),
+    ]
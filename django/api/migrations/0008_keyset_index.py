@@ -0,0 +1,21 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_lifecycle_indexes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='goelectricrebateapplication',
+            name='go_electric_created_1ac733_idx',
+        ),
+        migrations.AddIndex(
+            model_name='goelectricrebateapplication',
+            index=models.Index(fields=['created', 'id'], name='go_electric_created_3fcf1a_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:10
+
+import api.fields
+import api.validators
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_keyset_index'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='goelectricrebateapplication',
+            name='sin',
+            field=api.fields.EncryptedCharField(max_length=9, validators=[api.validators.validate_sin]),
+        ),
+        migrations.AlterField(
+            model_name='householdmember',
+            name='sin',
+            field=api.fields.EncryptedCharField(max_length=9),
+        ),
+    ]
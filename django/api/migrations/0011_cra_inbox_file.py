@@ -0,0 +1,38 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:20
+
+from django.db import migrations, models
+import django_extensions.db.fields
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_job_run'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CraInboxFile',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', django_extensions.db.fields.CreationDateTimeField(auto_now_add=True, verbose_name='created')),
+                ('modified', django_extensions.db.fields.ModificationDateTimeField(auto_now=True, verbose_name='modified')),
+                ('path', models.CharField(max_length=255, unique=True)),
+                ('size', models.BigIntegerField(blank=True, null=True)),
+                ('mtime', models.DateTimeField(blank=True, null=True)),
+                ('sha256', models.CharField(blank=True, default='', max_length=64)),
+                ('status', models.CharField(choices=[('new', 'New'), ('processing', 'Processing'), ('reconciled', 'Reconciled'), ('failed', 'Failed')], default='new', max_length=10)),
+                ('lines_processed', models.IntegerField(default=0)),
+                ('records', models.IntegerField(default=0)),
+                ('malformed', models.IntegerField(default=0)),
+                ('applications', models.IntegerField(default=0)),
+                ('household_members', models.IntegerField(default=0)),
+                ('unmatched', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, default='')),
+                ('reconciled_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'cra_inbox_file',
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 4.0.1 on 2026-10-18 12:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0012_outbox_email_sending'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='goelectricrebateapplication',
+            name='documents_lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='householdmember',
+            name='documents_lease_expires',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
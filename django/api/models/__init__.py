@@ -2,4 +2,7 @@
 Model Initializer
 """
 from . import go_electric_rebate_application
-from . import household_member
\ No newline at end of file
+from . import household_member
+from . import outbox_email
+from . import job_run
+from . import cra_inbox_file
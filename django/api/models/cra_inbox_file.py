@@ -0,0 +1,50 @@
+from django.db.models import (
+    BigIntegerField,
+    CharField,
+    DateTimeField,
+    IntegerField,
+    TextField,
+)
+from django_extensions.db.models import TimeStampedModel
+
+
+class CraInboxFile(TimeStampedModel):
+    """
+    A response file found on the CRA FTP server, and how far
+    api.services.cra_inbox got reconciling it. A file is only fetched
+    again when its size, time of modification or content changes.
+    """
+    NEW = "new"
+    PROCESSING = "processing"
+    RECONCILED = "reconciled"
+    FAILED = "failed"
+
+    path = CharField(max_length=255, unique=True)
+    size = BigIntegerField(null=True, blank=True)
+    mtime = DateTimeField(null=True, blank=True)
+    sha256 = CharField(max_length=64, blank=True, default="")
+    status = CharField(
+        max_length=10,
+        default=NEW,
+        choices=[
+            (NEW, "New"),
+            (PROCESSING, "Processing"),
+            (RECONCILED, "Reconciled"),
+            (FAILED, "Failed"),
+        ],
+    )
+    # Lines already reconciled, processing restarts after them
+    lines_processed = IntegerField(default=0)
+    records = IntegerField(default=0)
+    malformed = IntegerField(default=0)
+    applications = IntegerField(default=0)
+    household_members = IntegerField(default=0)
+    unmatched = IntegerField(default=0)
+    error = TextField(blank=True, default="")
+    reconciled_at = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.path + ": " + self.status
+
+    class Meta:
+        db_table = "cra_inbox_file"
@@ -12,16 +12,19 @@ from django.db.models import (
     ForeignKey,
     Model,
     DateTimeField,
+    Index,
+    Q,
 )
-from encrypted_fields.fields import EncryptedCharField
+from django.db.models.functions import Upper
+from api.fields import BlindIndexField, EncryptedCharField
+from api.managers.sin import SinQuerySet
+from api.services.documents import STATUSES as DOCUMENT_STATUSES, \
+    PENDING, document_url
 from django.utils.html import mark_safe
-from django.core.files.storage import get_storage_class
 from django.core.validators import MinLengthValidator
 from api.validators import validate_driving_age, validate_sin, validate_consent
 from django_extensions.db.models import TimeStampedModel
 
-media_storage = get_storage_class()()
-
 
 class GoElectricRebateApplication(TimeStampedModel):
     user = ForeignKey(
@@ -30,6 +33,7 @@ class GoElectricRebateApplication(TimeStampedModel):
     )
     id = UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     sin = EncryptedCharField(max_length=9, unique=False, validators=[validate_sin])
+    sin_hash = BlindIndexField(source="sin")
     last_name = CharField(max_length=250, unique=False)
     first_name = CharField(max_length=250, unique=False)
     middle_names = CharField(max_length=250, unique=False, blank=True, null=True)
@@ -45,9 +49,15 @@ class GoElectricRebateApplication(TimeStampedModel):
     doc1 = ImageField(upload_to="docs")
 
     def doc1_tag(self):
+        # The thumbnail, linking to the full size document
         return mark_safe(
-            '<img src="%s" width="800" />'
-            % (media_storage.url(name=self.doc1.file.name))
+            '<a href="%s" target="_blank"><img src="%s" loading="lazy" /></a>'
+            % (
+                document_url(
+                    self.doc1.name, self.documents_status, original=True
+                ),
+                document_url(self.doc1.name, self.documents_status),
+            )
         )
 
     doc1_tag.short_description = "First Uploaded Document"
@@ -55,15 +65,31 @@ class GoElectricRebateApplication(TimeStampedModel):
     doc2 = ImageField(upload_to="docs")
 
     def doc2_tag(self):
+        # The thumbnail, linking to the full size document
         return mark_safe(
-            '<img src="%s" width="800" />'
-            % (media_storage.url(name=self.doc2.file.name))
+            '<a href="%s" target="_blank"><img src="%s" loading="lazy" /></a>'
+            % (
+                document_url(
+                    self.doc2.name, self.documents_status, original=True
+                ),
+                document_url(self.doc2.name, self.documents_status),
+            )
         )
 
     doc2_tag.short_description = "Second Uploaded Document"
 
+    # Whether thumbnails of the documents were made, see api.services.documents
+    documents_status = CharField(
+        max_length=10, default=PENDING, choices=DOCUMENT_STATUSES
+    )
+    # Until when a worker processing the documents holds the row
+    documents_lease_expires = DateTimeField(null=True, blank=True)
+
     verified = BooleanField()
 
+    # Net income (line 23600) assessed by CRA for the tax year
+    net_income = IntegerField(null=True, blank=True)
+
     spouse_email = EmailField(max_length=250, unique=False, null=True, blank=True)
 
     application_type = CharField(
@@ -73,8 +99,36 @@ class GoElectricRebateApplication(TimeStampedModel):
     consent_personal = BooleanField(validators=[validate_consent])
     consent_tax = BooleanField(validators=[validate_consent])
 
+    objects = SinQuerySet.as_manager()
+
     def __str__(self):
         return self.last_name + ", " + self.first_name + ": " + str(self.id)
 
     class Meta:
         db_table = "go_electric_rebate_application"
+        # Back the admin filters, ordering and email search, and the known
+        # access patterns (see api/tests/test_query_plans.py). Most rows end
+        # up verified, so the unverified ones get partial indexes.
+        indexes = [
+            Index(fields=["application_type"]),
+            # Also the keyset of api.pagination.KeysetPagination
+            Index(fields=["created", "id"]),
+            Index(Upper("email"), name="application_email_upper_idx"),
+            # Applications waiting for CRA, by tax year
+            Index(
+                fields=["tax_year"],
+                condition=Q(verified=False),
+                name="application_pending_cra_idx",
+            ),
+            # The review queue, oldest first
+            Index(
+                fields=["created"],
+                condition=Q(verified=False),
+                name="application_unverified_idx",
+            ),
+            Index(
+                fields=["created"],
+                condition=Q(documents_status=PENDING),
+                name="application_pending_docs_idx",
+            ),
+        ]
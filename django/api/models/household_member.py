@@ -1,6 +1,7 @@
 from django.conf import settings
 from django.db.models import (
     CharField,
+    IntegerField,
     ImageField,
     DateField,
     EmailField,
@@ -9,14 +10,16 @@ from django.db.models import (
     ForeignKey,
     Model,
     DateTimeField,
+    Index,
+    Q,
 )
-from encrypted_fields.fields import EncryptedCharField
+from api.fields import BlindIndexField, EncryptedCharField
+from api.managers.sin import SinQuerySet
+from api.services.documents import STATUSES as DOCUMENT_STATUSES, \
+    PENDING, document_url
 from django.utils.html import mark_safe
-from django.core.files.storage import get_storage_class
 from django_extensions.db.models import TimeStampedModel
 
-media_storage = get_storage_class()()
-
 
 class HouseholdMember(TimeStampedModel):
     user = ForeignKey(
@@ -28,6 +31,7 @@ class HouseholdMember(TimeStampedModel):
         on_delete=PROTECT,
     )
     sin = EncryptedCharField(max_length=9, unique=False)
+    sin_hash = BlindIndexField(source="sin")
     last_name = CharField(max_length=250, unique=False)
     first_name = CharField(max_length=250, unique=False)
     middle_names = CharField(max_length=250, unique=False, blank=True, null=True)
@@ -36,9 +40,15 @@ class HouseholdMember(TimeStampedModel):
     doc1 = ImageField(upload_to="docs")
 
     def doc1_tag(self):
+        # The thumbnail, linking to the full size document
         return mark_safe(
-            '<img src="%s" width="800" />'
-            % (media_storage.url(name=self.doc1.file.name))
+            '<a href="%s" target="_blank"><img src="%s" loading="lazy" /></a>'
+            % (
+                document_url(
+                    self.doc1.name, self.documents_status, original=True
+                ),
+                document_url(self.doc1.name, self.documents_status),
+            )
         )
 
     doc1_tag.short_description = "First Uploaded Document"
@@ -46,17 +56,49 @@ class HouseholdMember(TimeStampedModel):
     doc2 = ImageField(upload_to="docs")
 
     def doc2_tag(self):
+        # The thumbnail, linking to the full size document
         return mark_safe(
-            '<img src="%s" width="800" />'
-            % (media_storage.url(name=self.doc2.file.name))
+            '<a href="%s" target="_blank"><img src="%s" loading="lazy" /></a>'
+            % (
+                document_url(
+                    self.doc2.name, self.documents_status, original=True
+                ),
+                document_url(self.doc2.name, self.documents_status),
+            )
         )
 
     doc2_tag.short_description = "Second Uploaded Document"
 
+    # Whether thumbnails of the documents were made, see api.services.documents
+    documents_status = CharField(
+        max_length=10, default=PENDING, choices=DOCUMENT_STATUSES
+    )
+    # Until when a worker processing the documents holds the row
+    documents_lease_expires = DateTimeField(null=True, blank=True)
+
     verified = BooleanField()
 
+    # Net income (line 23600) assessed by CRA for the tax year
+    net_income = IntegerField(null=True, blank=True)
+
+    objects = SinQuerySet.as_manager()
+
     def __str__(self):
         return self.last_name + ", " + self.first_name
 
     class Meta:
         db_table = "household_member"
+        # See api/tests/test_query_plans.py
+        indexes = [
+            # Members waiting for CRA, joined to their application
+            Index(
+                fields=["application"],
+                condition=Q(verified=False),
+                name="member_pending_cra_idx",
+            ),
+            Index(
+                fields=["created"],
+                condition=Q(documents_status=PENDING),
+                name="member_pending_docs_idx",
+            ),
+        ]
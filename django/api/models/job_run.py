@@ -0,0 +1,49 @@
+from django.db.models import (
+    CharField,
+    DateTimeField,
+    FloatField,
+    TextField,
+    UniqueConstraint,
+)
+from django_extensions.db.models import TimeStampedModel
+
+
+class JobRun(TimeStampedModel):
+    """
+    One run of a scheduled job (see api.services.scheduler) for one slot of
+    its schedule. A slot can only be claimed once, whichever pod gets there
+    first.
+    """
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    job = CharField(max_length=100)
+    scheduled_for = DateTimeField()
+    status = CharField(
+        max_length=10,
+        default=RUNNING,
+        choices=[
+            (RUNNING, "Running"),
+            (SUCCEEDED, "Succeeded"),
+            (FAILED, "Failed"),
+        ],
+    )
+    started_at = DateTimeField()
+    finished_at = DateTimeField(null=True, blank=True)
+    duration = FloatField(null=True, blank=True)  # seconds
+    host = CharField(max_length=255, blank=True, default="")
+    error = TextField(blank=True, default="")
+
+    def __str__(self):
+        return "%s %s: %s" % (
+            self.job, self.scheduled_for.isoformat(), self.status
+        )
+
+    class Meta:
+        db_table = "job_run"
+        constraints = [
+            UniqueConstraint(
+                fields=["job", "scheduled_for"], name="job_run_slot"
+            ),
+        ]
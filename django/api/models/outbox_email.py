@@ -0,0 +1,52 @@
+from django.db.models import (
+    CharField,
+    EmailField,
+    IntegerField,
+    JSONField,
+    TextField,
+    DateTimeField,
+    Index,
+)
+from django.utils import timezone
+from django_extensions.db.models import TimeStampedModel
+
+
+class OutboxEmail(TimeStampedModel):
+    """
+    An email waiting to be sent through CHES. Rows are written in the same
+    transaction as the change that caused them and are sent by
+    api.services.email_outbox.
+    """
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    FAILED = "failed"
+
+    recipient = EmailField(max_length=250)
+    cc = JSONField(default=list, blank=True)
+    application_id = CharField(max_length=36)
+    message = TextField()
+    status = CharField(
+        max_length=10,
+        default=PENDING,
+        choices=[
+            (PENDING, "Pending"),
+            (SENDING, "Sending"),
+            (SENT, "Sent"),
+            (FAILED, "Failed"),
+        ],
+    )
+    attempts = IntegerField(default=0)
+    # While sending, when the lease of the worker sending it expires
+    next_attempt_at = DateTimeField(default=timezone.now)
+    last_error = TextField(blank=True, default="")
+    sent_at = DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return self.recipient + ": " + self.status
+
+    class Meta:
+        db_table = "outbox_email"
+        indexes = [
+            Index(fields=["status", "next_attempt_at"]),
+        ]
@@ -3,7 +3,20 @@ Instructions on how django should treat the pagination for the app
 Further reading:
 https://www.django-rest-framework.org/api-guide/pagination/
 """
-from rest_framework.pagination import PageNumberPagination
+import json
+import uuid
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import OrderedDict
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Q, QuerySet
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class StandardResultsSetPagination(PageNumberPagination):
@@ -13,3 +26,135 @@ class StandardResultsSetPagination(PageNumberPagination):
     page_size = 100
     page_size_query_param = 'page_size'
     max_page_size = 1000
+
+
+class KeysetPagination(BasePagination):
+    """
+    Walks a table in (created, id) order, each page starting right after
+    the last row of the previous one. Unlike page numbers there's no OFFSET
+    to skip over nor COUNT(*) to run, so every page costs the same however
+    deep it is. The cursor is opaque to clients, the total count is only
+    computed when asked for with ?count=true.
+    Set as the pagination_class of the viewsets that need it. Any ordering
+    asked for with ?ordering= is ignored.
+    """
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(page_size, self.max_page_size))
+
+    def encode_cursor(self, row):
+        position = json.dumps([row.created.isoformat(), str(row.pk)])
+        return urlsafe_b64encode(position.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            created, pk = json.loads(
+                urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            )
+            created = parse_datetime(created)
+            pk = uuid.UUID(pk)
+        except (AttributeError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if created is None:
+            raise NotFound(self.invalid_cursor_message)
+        return created, pk
+
+    def page_queryset(self, queryset, cursor=None):
+        """
+        The rows from the cursor on, in keyset order
+        """
+        queryset = queryset.order_by('created', 'pk')
+        if cursor:
+            created, pk = self.decode_cursor(cursor)
+            # The redundant created >= bound is what an index range scan
+            # on (created, id) starts from
+            queryset = queryset.filter(created__gte=created).filter(
+                Q(created__gt=created) | Q(created=created, pk__gt=pk)
+            )
+        return queryset
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.count = None
+        if request.query_params.get(self.count_query_param) == 'true':
+            self.count = queryset.count()
+
+        queryset = self.page_queryset(
+            queryset, request.query_params.get(self.cursor_query_param)
+        )
+
+        # One extra row tells whether there is a next page
+        rows = list(queryset[:self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[:self.page_size]
+        return self.rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.rows[-1])
+        )
+
+    def get_paginated_response(self, data):
+        response = OrderedDict([('next', self.get_next_link())])
+        if self.count is not None:
+            response['count'] = self.count
+        response['results'] = data
+        return Response(response)
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'The pagination cursor value.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Number of results to return per page.',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator for the admin that takes the row count of unfiltered tables
+    from the postgres statistics rather than a COUNT(*) scanning the whole
+    table. Small tables, and anything filtered, are still counted exactly.
+    """
+    exact_count_below = 10000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if isinstance(queryset, QuerySet) and not queryset.query.where \
+                and connections[queryset.db].vendor == 'postgresql':
+            with connections[queryset.db].cursor() as cursor:
+                cursor.execute(
+                    "SELECT reltuples FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table]
+                )
+                row = cursor.fetchone()
+            if row and row[0] >= self.exact_count_below:
+                return int(row[0])
+
+        return super().count
@@ -1,23 +1,100 @@
-from rest_framework.serializers import ModelSerializer
+import uuid
+from django.conf import settings
+from django.db import transaction
+from rest_framework.serializers import ModelSerializer, ImageField, \
+    Serializer, ListField, ChoiceField
 from api.models.go_electric_rebate_application import GoElectricRebateApplication
+from api.services.documents import PROCESSED, normalized_name, \
+    thumbnail_name
+from api.services.minio import minio_put_objects
+from api.serializers.mixins import SparseFieldsetMixin
+from api.validators import document_prefix, validate_document
 from rest_framework.parsers import FormParser, MultiPartParser
 
 
+class DocumentField(ImageField):
+    """
+    Either the key of a document the browser already uploaded to minio with
+    a presigned URL, or (for older clients) the uploaded image itself.
+    Represented by the URL of its thumbnail once there is one, or of its
+    full size normalized copy with ?original=true.
+    """
+    model_fields = ("documents_status",)
+
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            request = self.context.get("request")
+            validate_document(data, request and request.user)
+            return data
+        return super().to_internal_value(data)
+
+    def to_representation(self, value):
+        if not value:
+            return None
+        request = self.context.get("request")
+        original = request is not None and \
+            request.query_params.get("original") == "true"
+        if value.instance.documents_status == PROCESSED:
+            name = normalized_name if original else thumbnail_name
+            url = value.storage.url(name(value.name))
+            if request is not None:
+                return request.build_absolute_uri(url)
+            return url
+        return super().to_representation(value)
+
+
+class DocumentUploadSerializer(Serializer):
+    """
+    Hands out presigned URLs the browser can PUT documents to directly,
+    one per content type requested.
+    """
+    content_types = ListField(
+        child=ChoiceField(choices=list(settings.DOCUMENT_CONTENT_TYPES)),
+        min_length=1,
+        max_length=2,
+    )
+
+    def to_representation(self, instance):
+        prefix = document_prefix(self.context["request"].user)
+        object_names = [
+            "%s%s%s" % (
+                prefix,
+                uuid.uuid4().hex,
+                settings.DOCUMENT_CONTENT_TYPES[content_type],
+            )
+            for content_type in instance["content_types"]
+        ]
+        urls = minio_put_objects(object_names)
+        return {
+            "documents": [
+                {"object_name": object_name, "url": urls[object_name]}
+                for object_name in object_names
+            ]
+        }
+
+
 class ApplicationFormCreateSerializer(ModelSerializer):
     parser_classes = (
         MultiPartParser,
         FormParser,
     )
 
+    doc1 = DocumentField()
+    doc2 = DocumentField()
+
     class Meta:
         model = GoElectricRebateApplication
-        exclude = ["user"]
+        exclude = [
+            "user", "sin_hash", "verified", "net_income", "documents_status"
+        ]
 
     def get_serializer_context(self):
         context = super().get_serializer_context()
         context["request"] = self.request
         return context
 
+    # The application and its outbox emails are saved together
+    @transaction.atomic
     def create(self, validated_data):
         user = self.context["request"].user
 
@@ -45,7 +122,29 @@ class ApplicationFormCreateSerializer(ModelSerializer):
         return obj
 
 
-class ApplicationFormSerializer(ModelSerializer):
+class ApplicationFormListSerializer(SparseFieldsetMixin, ModelSerializer):
+    """
+    What lists need to show an application, without the encrypted SIN or
+    document URLs. The full serializer is used when ?fields= asks for more.
+    """
+    class Meta:
+        model = GoElectricRebateApplication
+        fields = [
+            "id",
+            "created",
+            "first_name",
+            "last_name",
+            "email",
+            "application_type",
+            "tax_year",
+            "verified",
+        ]
+
+
+class ApplicationFormSerializer(SparseFieldsetMixin, ModelSerializer):
+    doc1 = DocumentField()
+    doc2 = DocumentField()
+
     class Meta:
         model = GoElectricRebateApplication
-        fields = "__all__"
+        exclude = ["sin_hash"]
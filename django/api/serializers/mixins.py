@@ -0,0 +1,45 @@
+from django.core.exceptions import FieldDoesNotExist
+
+
+def requested_fields(request):
+    """
+    The field names asked for with ?fields=a,b, or None for all of them
+    """
+    if request is None or not request.query_params.get("fields"):
+        return None
+    return {
+        name.strip() for name in request.query_params["fields"].split(",")
+        if name.strip()
+    }
+
+
+class SparseFieldsetMixin:
+    """
+    Serializer mixin limiting the representation to the fields asked for
+    with ?fields=, so nothing else is decrypted or signed. Unknown names
+    are ignored.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        requested = requested_fields(self.context.get("request"))
+        if requested is not None:
+            for name in set(self.fields) - requested:
+                self.fields.pop(name)
+
+    def model_fields(self):
+        """
+        Names of the model columns the serializer reads, to load only those
+        with QuerySet.only(). Fields can list extra columns they need in a
+        model_fields attribute.
+        """
+        model = self.Meta.model
+        names = {model._meta.pk.name}
+        for field in self.fields.values():
+            names.update(getattr(field, "model_fields", ()))
+            source = field.source.split(".")[0]
+            try:
+                if model._meta.get_field(source).concrete:
+                    names.add(source)
+            except FieldDoesNotExist:
+                pass
+        return names
@@ -1,88 +1,223 @@
+from array import array
+from collections import Counter
 from datetime import date
 
+RECORD_WIDTH = 147  # Characters in every CRA record, excluding the newline
+
+
 ##
 # Read a text file that has been posted by CRA
 # INPUT: A string representing a text file
 # OUTPUT: An array of dictionaries for each assessment made
 #
 def read(file):
-  results = [] # Array to return
-  for line in file: 
-    subCode = line[17:21] # Grab the sub-code, defining type of record.
-    if subCode != '0236': continue # If not an income entry.... pass.
-
-    # All rows have a set number of spaces for each value
-    sin = line[4:13]
-    year = line[13:17]
-    income = line[21:30].lstrip("0")
-    results.append({'sin':sin,'year':year,'income':income}) # Add to array
-  return results # Return results
+    results = []  # Array to return
+    for line in file:
+        subCode = line[17:21]  # Grab the sub-code, defining type of record.
+        if subCode != '0236':  # If not an income entry.... pass.
+            continue
+
+        # All rows have a set number of spaces for each value
+        sin = line[4:13]
+        year = line[13:17]
+        income = line[21:30].lstrip("0")
+        # Add to array
+        results.append({'sin': sin, 'year': year, 'income': income})
+    return results  # Return results
+
 
 ##
-# Write a CRA request file
-# INPUT: A dictionary of values to write to the file
-# OUTPUT: A string representing a text file
+# Income assessments decoded from a CRA response file, stored column by
+# column (struct-of-arrays) instead of one dictionary per line.
 #
-def write(data):
-  file = "" # String to return
+class IncomeRecords:
+    def __init__(self):
+        self.sins = []  # SIN of each record
+        self.years = array('H')  # Tax year of each record
+        self.incomes = array('q')  # Income of each record, in dollars
+        self.line_numbers = array('L')  # Line the record was read from
+        self.malformed = []  # (line number, reason) for each malformed line
+        self.lines = 0  # Number of lines read
 
-  today = date.today().strftime("%Y%m%d") # Get today's date
+    def __len__(self):
+        return len(self.sins)
 
-  ####################### Write the header ##############################
-  file += '7100' # Request transaction code
-  file += ' ' * 24 # Blank space
+    def __iter__(self):
+        return zip(self.sins, self.years, self.incomes)
 
-  file += today # 
-  file += ' ' # Blank space
+    def malformed_counts(self):
+        return Counter(reason for _, reason in self.malformed)
 
-  file += 'BCGSP00521' # Requesting institution code TODO: make this dynamic
+    def index(self):
+        return {(sin, year): income for sin, year, income in self}
 
-  file += ' ' * 99 # Blank space
 
-  file += '0\n' # Blank space
+##
+# Decode the lines of a CRA response file into income records
+# INPUT: An iterable of lines as bytes, the records to append to and the line
+#        number of the first line
+# OUTPUT: The income records
+#
+def decode(lines, records=None, first_line=1):
+    if records is None:
+        records = IncomeRecords()
+
+    # Bind everything used in the loop locally, this runs for every line
+    sins, years, incomes = records.sins, records.years, records.incomes
+    line_numbers, malformed = records.line_numbers, records.malformed
+    line_number = first_line - 1
+
+    for line_number, line in enumerate(lines, first_line):
+        if len(line.rstrip(b'\r\n')) != RECORD_WIDTH:
+            malformed.append((line_number, 'invalid length'))
+            continue
+
+        code = line[:4]  # Grab the transaction code
+        if code != b'7201':
+            if code != b'7200' and code != b'7202':  # Not a header or trailer
+                malformed.append((line_number, 'invalid transaction code'))
+            continue
+
+        if line[17:21] != b'0236':  # If not an income entry.... pass.
+            continue
+
+        # All rows have a set number of spaces for each value
+        sin = line[4:13]
+        year = line[13:17]
+        income = line[21:30]
+        if not (sin.isdigit() and year.isdigit() and income.isdigit()):
+            malformed.append((line_number, 'invalid income record'))
+            continue
+
+        sins.append(sin.decode('ascii'))
+        years.append(int(year))
+        incomes.append(int(income))
+        line_numbers.append(line_number)
+
+    records.lines += line_number - first_line + 1
+    return records
 
 
-  ####################### Write the body ##############################
-  for row in data:
-    file += '7101' # Request transaction code
-    file += row['sin'] # SIN
-    file += ' ' * 4 # Blank space
-    file += '0020' # Sub-code
-    file += row['family_name'] # Family name
+##
+# Read a CRA response file in bulk
+# INPUT: The path of the file
+# OUTPUT: The income records for each assessment made
+#
+def read_bulk(path):
+    with open(path, 'rb') as file:
+        return decode(file)
 
-    file += ' ' * (30 - len(row['family_name'])) # Blank space
-    file += row['given_name'] # Given name
 
-    file += ' ' * (30 - len(row['given_name'])) # Blank space
-    file += row['birth_date'].replace('-','') # Birth date
+##
+# Fixed-width record templates for the CRA request file.
+# Every record is RECORD_WIDTH characters wide followed by a newline, so each
+# one can be formatted and written on its own without building the whole
+# file first.
+#
+# Requesting institution code TODO: make this dynamic
+INSTITUTION_CODE = 'BCGSP00521'
+
+HEADER = (
+    '7100'  # Request transaction code
+    + ' ' * 24  # Blank space
+    + '{date}'  # Request date
+    + ' '  # Blank space
+    + INSTITUTION_CODE
+    + ' ' * 99  # Blank space
+    + '0\n'  # Delimiter
+)
+
+RECORD = (
+    '7101'  # Request transaction code
+    + '{sin:9.9}'  # SIN
+    + ' ' * 4  # Blank space
+    + '0020'  # Sub-code
+    + '{family_name:<30.30}'  # Family name, padded to 30 characters
+    + '{given_name:<30.30}'  # Given name, padded to 30 characters
+    + '{birth_date:8.8}'  # Birth date
+    + '{year:4.4}'  # Year
+    + ' ' * 14  # Blank space
+    + 'BCGS'  # Program area code
+    + '1234'  # Record identification number (optional)
+    + ' ' * 31  # Blank space
+    + '0\n'  # Delimiter
+)
+
+TRAILER = (
+    '7102'  # Request transaction code
+    + ' ' * 24  # Blank space
+    + '{date}'  # Request date
+    + ' '  # Blank space
+    + INSTITUTION_CODE
+    + ' ' * 6  # Blank space
+    + '{count:08d}'  # Number of records in file, header and trailer included
+    + ' ' * 85  # Blank space
+    + '0\n'  # terminating character
+)
 
-    file += row['year'] # Year
-    file += ' ' * 14 # Blank space
 
-    file += 'BCGS' # Program area code
-    file += '1234' # Record identification number (optional)
+##
+# Generate the lines of a CRA request file one record at a time
+# INPUT: An iterable of dictionaries of values to write to the file
+# OUTPUT: A generator of strings, one per line (header, body, trailer)
+#
+def iter_write(data, today=None):
+    today = (today or date.today()).strftime("%Y%m%d")  # Get today's date
 
-    file += ' ' * 31 # Blank space
-    file += '0\n' # Delimiter
+    yield HEADER.format(date=today)
 
+    count = 0  # Body records seen so far, used for the trailer
+    for row in data:
+        yield RECORD.format(
+            sin=row['sin'],
+            family_name=row['family_name'],
+            given_name=row['given_name'],
+            birth_date=str(row['birth_date']).replace('-', ''),
+            year=str(row['year'])
+        )
+        count += 1
 
-  ####################### Write the trailer ###########################
-  file += '7102' # Request transaction code 
-  file += ' ' * 24 # Blank space
+    yield TRAILER.format(date=today, count=count + 2)
 
-  file += today # Request date
-  file += ' ' # Blank space
 
-  file += 'BCGSP00521' # Requesting institution code TODO: make this dynamic
+##
+# Stream a CRA request file to a file-like object
+# INPUT: An iterable of dictionaries of values to write to the file, a text
+#        file-like object and how many lines to group into each write call
+# OUTPUT: The number of body records written
+#
+def write_to(data, out, lines_per_write=4096):
+    buffer = []
+    lines = 0
+    for line in iter_write(data):
+        buffer.append(line)
+        if len(buffer) >= lines_per_write:
+            out.write(''.join(buffer))
+            lines += len(buffer)
+            buffer.clear()
+    out.write(''.join(buffer))
+    lines += len(buffer)
+
+    # Every line except the header and trailer is a body record
+    return lines - 2
 
-  file += ' ' * 6 # Blank space
 
-  file += '0' * 8 # Number of records in file TODO: make this dynamic
+##
+# Stream a CRA request file straight into MinIO
+# INPUT: An iterable of dictionaries of values and the object name to upload to
+# OUTPUT: The result of the MinIO upload
+#
+def upload(data, object_name):
+    from api.services.minio import minio_put_stream
 
-  file += ' ' * 85 # Blank space
+    chunks = (line.encode('ascii') for line in iter_write(data))
+    return minio_put_stream(object_name, chunks)
 
-  file += '0\n' # terminating character 
 
-  
-  ####################### Return the file ##############################
-  return file
\ No newline at end of file
+##
+# Write a CRA request file
+# INPUT: An iterable of dictionaries of values to write to the file
+# OUTPUT: A string representing a text file
+#
+def write(data):
+    return ''.join(iter_write(data))
@@ -0,0 +1,157 @@
+"""
+Polls the CRA FTP inbox and reconciles the response files dropped there.
+
+Every file is tracked by a CraInboxFile row. Reconciled files whose size
+and time of modification haven't changed are skipped without being
+downloaded. Changed ones are hashed first and only reconciled again if
+their content is different. Files are reconciled a batch of lines at a
+time, each batch in one transaction with the line offset it reached, so a
+poll that dies part way restarts after the last batch reconciled.
+"""
+import hashlib
+import logging
+from functools import partial
+from itertools import islice
+
+from django.conf import settings
+from django.utils import timezone
+
+from api.models.cra_inbox_file import CraInboxFile
+from api.services import ftp
+from api.services.cra_pipeline import (
+    decode_batches,
+    frame_lines,
+    prefetch,
+    read_chunks,
+    reconcile_batches,
+)
+from api.services.reconcile import Reconciler
+
+LOGGER = logging.getLogger(__name__)
+
+# Lines reconciled per transaction
+BATCH_LINES = 20000
+
+
+class _Hasher:
+    """
+    Write-only file object hashing what's written to it
+    """
+    def __init__(self):
+        self.hash = hashlib.sha256()
+
+    def write(self, data):
+        self.hash.update(data)
+
+
+def content_hash(path, pool=ftp.POOL):
+    hasher = _Hasher()
+    ftp.download(path, hasher, pool=pool)
+    return hasher.hash.hexdigest()
+
+
+def needs_processing(entry, remote, pool=ftp.POOL):
+    """
+    Whether the file listed as remote has anything left to reconcile.
+    Files that changed are started over. Without MLSD there's no size or
+    time of modification to compare, reconciled files are never fetched
+    again.
+    """
+    if (entry.size, entry.mtime) == (remote.size, remote.modified):
+        return entry.status != CraInboxFile.RECONCILED
+
+    entry.size, entry.mtime = remote.size, remote.modified
+    if entry.status == CraInboxFile.RECONCILED \
+            and content_hash(remote.path, pool) == entry.sha256:
+        # Touched or copied again, but the same content
+        entry.save()
+        return False
+
+    LOGGER.info("%s changed, reconciling it from the start", remote.path)
+    entry.status = CraInboxFile.NEW
+    entry.sha256 = ""
+    entry.lines_processed = 0
+    entry.records = entry.malformed = 0
+    entry.applications = entry.household_members = entry.unmatched = 0
+    entry.reconciled_at = None
+    entry.save()
+    return True
+
+
+def hashed(chunks, digest):
+    for chunk in chunks:
+        digest.update(chunk)
+        yield chunk
+
+
+def save_batch(entry, records, result):
+    entry.lines_processed += records.lines
+    entry.records += len(records)
+    entry.malformed += len(records.malformed)
+    entry.applications += result["applications"]
+    entry.household_members += result["household_members"]
+    entry.unmatched += result["unmatched"]
+    entry.save()
+
+
+def process(entry, batch_lines=BATCH_LINES, pool=ftp.POOL, crypto_pool=None):
+    """
+    Reconciles the lines of the file past its offset through the
+    cra_pipeline stages, saving the offset reached with every batch.
+    SINs are decrypted in crypto_pool if given. Returns whether the whole
+    file was reconciled, errors are recorded on the entry.
+    """
+    entry.status = CraInboxFile.PROCESSING
+    entry.error = ""
+    entry.save()
+
+    # Lines already reconciled are downloaded again but only hashed
+    digest = hashlib.sha256()
+    try:
+        with ftp.open_file(entry.path, pool=pool) as file:
+            lines = frame_lines(hashed(read_chunks(file), digest))
+            batches = prefetch(decode_batches(
+                islice(lines, entry.lines_processed, None),
+                batch_lines,
+                first_line=entry.lines_processed + 1,
+            ))
+            for _ in reconcile_batches(
+                batches,
+                reconciler=Reconciler(crypto_pool=crypto_pool),
+                on_batch=partial(save_batch, entry),
+            ):
+                pass
+    except Exception as error:
+        LOGGER.exception("Error reconciling %s", entry.path)
+        entry.status = CraInboxFile.FAILED
+        entry.error = str(error)
+        entry.save()
+        return False
+
+    entry.sha256 = digest.hexdigest()
+    entry.status = CraInboxFile.RECONCILED
+    entry.reconciled_at = timezone.now()
+    entry.save()
+    return True
+
+
+def poll(directory=None, batch_lines=BATCH_LINES, pool=ftp.POOL,
+         crypto_pool=None):
+    """
+    Reconciles the new and changed files of the inbox, and the ones left
+    part way by an earlier poll. Returns their CraInboxFile rows.
+    """
+    if directory is None:
+        directory = settings.CRA_FTP_INBOX
+
+    processed = []
+    for remote in ftp.list_files(directory, pool=pool):
+        entry, created = CraInboxFile.objects.get_or_create(
+            path=remote.path,
+            defaults={"size": remote.size, "mtime": remote.modified},
+        )
+        if not created and not needs_processing(entry, remote, pool):
+            continue
+        process(entry, batch_lines, pool, crypto_pool)
+        processed.append(entry)
+    return processed
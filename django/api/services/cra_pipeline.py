@@ -0,0 +1,157 @@
+"""
+Reconciles a CRA response file as it's read, in memory proportional to
+the batch size rather than to the file.
+
+The file goes through a chain of generators: chunked reads, line framing,
+fixed-width decoding into batches of records, then reconciliation of each
+batch in its own transaction. The reading, framing and decoding run in a
+thread, at most MAX_PENDING batches ahead of the reconciliation: while
+the database work of a batch (decrypting and looking up the candidates,
+writing the matches) goes on, the next ones are read and decoded. When
+the reconciliation falls behind, the reading thread blocks and stops
+reading from the network until there is room again.
+"""
+import logging
+import queue
+import threading
+from itertools import islice
+
+from django.db import transaction
+
+from api.services import cra, ftp
+
+LOGGER = logging.getLogger(__name__)
+
+# Bytes read from the file at a time
+CHUNK_SIZE = 1024 * 1024
+
+# Lines decoded and reconciled together
+BATCH_LINES = 20000
+
+# Batches decoded ahead of the one being reconciled
+MAX_PENDING = 2
+
+_DONE = object()
+
+
+def read_chunks(file, chunk_size=CHUNK_SIZE):
+    return iter(lambda: file.read(chunk_size), b"")
+
+
+def frame_lines(chunks):
+    """
+    Yields the lines of a stream of byte chunks, without their newline.
+    Lines may span chunks.
+    """
+    partial = b""
+    for chunk in chunks:
+        lines = (partial + chunk).split(b"\n")
+        partial = lines.pop()
+        yield from lines
+    if partial:
+        yield partial
+
+
+def decode_batches(lines, batch_lines=BATCH_LINES, first_line=1):
+    """
+    Yields the IncomeRecords of every batch_lines lines
+    """
+    lines = iter(lines)
+    while True:
+        batch = list(islice(lines, batch_lines))
+        if not batch:
+            return
+        yield cra.decode(batch, first_line=first_line)
+        first_line += len(batch)
+
+
+def prefetch(iterable, max_pending=MAX_PENDING):
+    """
+    Yields the items of iterable, produced in a thread at most max_pending
+    items ahead of the consumer. Errors of the producer are raised to the
+    consumer, and the producer is stopped if the consumer stops early.
+    """
+    items = queue.Queue(maxsize=max_pending)
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                items.put((item, None))
+                if stop.is_set():
+                    return
+        except Exception as error:
+            items.put((_DONE, error))
+        else:
+            items.put((_DONE, None))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while True:
+            item, error = items.get()
+            if item is _DONE:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        stop.set()
+        # Unblocks the producer until it sees stop
+        while thread.is_alive():
+            try:
+                items.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def reconcile_batches(batches, reconciler=None, on_batch=None):
+    """
+    Reconciles every batch of IncomeRecords in its own transaction and
+    yields each batch with what reconcile returned for it. on_batch is
+    called with them in the same transaction, to record progress.
+    """
+    from api.services.reconcile import Reconciler
+
+    if reconciler is None:
+        reconciler = Reconciler()
+    for records in batches:
+        with transaction.atomic():
+            result = reconciler.reconcile(records)
+            if on_batch is not None:
+                on_batch(records, result)
+        yield records, result
+
+
+def reconcile_stream(file, chunk_size=CHUNK_SIZE, batch_lines=BATCH_LINES,
+                     max_pending=MAX_PENDING):
+    """
+    Reconciles a binary file object holding a CRA response file and
+    returns the totals of the whole file
+    """
+    lines = frame_lines(read_chunks(file, chunk_size))
+    batches = prefetch(decode_batches(lines, batch_lines), max_pending)
+    totals = {
+        'lines': 0,
+        'records': 0,
+        'malformed': 0,
+        'applications': 0,
+        'household_members': 0,
+        'unmatched': 0,
+    }
+    for records, result in reconcile_batches(batches):
+        totals['lines'] += records.lines
+        totals['records'] += len(records)
+        totals['malformed'] += len(records.malformed)
+        for key, value in result.items():
+            totals[key] += value
+    return totals
+
+
+def reconcile_file(path, chunk_size=CHUNK_SIZE, batch_lines=BATCH_LINES,
+                   max_pending=MAX_PENDING, pool=ftp.POOL):
+    """
+    Reconciles a CRA response file straight from the FTP server
+    """
+    with ftp.open_file(path, block_size=chunk_size, pool=pool) as file:
+        return reconcile_stream(file, chunk_size, batch_lines, max_pending)
@@ -0,0 +1,184 @@
+"""
+Bulk decryption and encryption of the values of the project's
+EncryptedCharFields (api.fields), for jobs going through whole tables of
+SINs. Batches of values are fanned out to a pool of processes sized to the
+CPUs of the pod, so Fernet isn't limited to the one thread holding the GIL.
+
+Workers are spawned, not forked, so they inherit neither database
+connections nor threads. They get the derived keys once, as arguments of
+the pool's initializer sent over the pool's pipe, and keep them in memory
+only: they're never written anywhere, and the workers don't need the
+settings or 100,000 PBKDF2 rounds per key to derive them again.
+
+This module imports nothing from Django at the top, so workers start
+without it.
+"""
+import math
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from cryptography.fernet import Fernet, MultiFernet
+
+# Values sent to a worker at a time, large enough for the pickling and
+# the round trip to be small next to the decryption
+CHUNK_SIZE = 2000
+
+# The Fernet of a worker process, set by _init_worker
+_FERNET = None
+
+
+def _init_worker(keys):
+    global _FERNET
+    _FERNET = MultiFernet([Fernet(key) for key in keys])
+
+
+def _decrypt_chunk(ciphertexts, fernet=None):
+    fernet = fernet or _FERNET
+    return [
+        None if value is None
+        else fernet.decrypt(value.encode('utf-8')).decode('utf-8')
+        for value in ciphertexts
+    ]
+
+
+def _encrypt_chunk(values, fernet=None):
+    # Empty values are stored as NULL, as EncryptedCharField does
+    fernet = fernet or _FERNET
+    return [
+        fernet.encrypt(str(value).encode('utf-8')).decode('utf-8')
+        if value else None
+        for value in values
+    ]
+
+
+def _cgroup_cpu_limit():
+    """
+    CPUs allowed by the CPU quota of the container, if it has one
+    """
+    try:
+        # cgroup v2
+        with open('/sys/fs/cgroup/cpu.max') as file:
+            quota, period = file.read().split()
+        if quota == 'max':
+            return None
+        return int(quota) / int(period)
+    except (OSError, ValueError):
+        pass
+    try:
+        # cgroup v1
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as file:
+            quota = int(file.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as file:
+            period = int(file.read())
+    except (OSError, ValueError):
+        return None
+    return quota / period if quota > 0 else None
+
+
+def available_cpus():
+    """
+    CPUs this process can use: the CPU limit of the pod when there is one,
+    otherwise the CPUs it may be scheduled on
+    """
+    if hasattr(os, 'sched_getaffinity'):
+        cpus = len(os.sched_getaffinity(0))
+    else:
+        cpus = os.cpu_count() or 1
+    limit = _cgroup_cpu_limit()
+    if limit is not None:
+        cpus = min(cpus, max(1, math.ceil(limit)))
+    return cpus
+
+
+def chunks(values, size):
+    values = iter(values)
+    return iter(lambda: list(islice(values, size)), [])
+
+
+class CryptoPool:
+    """
+    Processes decrypting and encrypting lists of values, which come back
+    in the order they were given. With a single worker the values are
+    handled in this process instead.
+    The processes are started on first use and stopped by close(), or at
+    the end of a with block.
+    """
+    def __init__(self, workers=None, chunk_size=CHUNK_SIZE):
+        self.workers = workers or available_cpus()
+        self.chunk_size = chunk_size
+        self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            from api.fields import fernet_keys
+
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=_init_worker,
+                initargs=(fernet_keys(),),
+            )
+        return self._executor
+
+    def map_chunks(self, function, value_chunks):
+        """
+        Yields function applied to every chunk, in order. At most
+        2 * workers chunks are sent ahead of the one being yielded, so an
+        iterator of chunks is never read much ahead.
+        """
+        if self.workers == 1:
+            from api.fields import fernet
+
+            for chunk in value_chunks:
+                yield function(chunk, fernet())
+            return
+
+        pending = deque()
+        for chunk in value_chunks:
+            pending.append(self.executor.submit(function, chunk))
+            if len(pending) >= 2 * self.workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+    def decrypt_chunks(self, ciphertext_chunks):
+        return self.map_chunks(_decrypt_chunk, ciphertext_chunks)
+
+    def encrypt_chunks(self, value_chunks):
+        return self.map_chunks(_encrypt_chunk, value_chunks)
+
+    def decrypt(self, ciphertexts):
+        """
+        Plaintexts of a list of Fernet tokens (None stays None)
+        """
+        ciphertext_chunks = chunks(ciphertexts, self.chunk_size)
+        return [
+            value
+            for chunk in self.decrypt_chunks(ciphertext_chunks)
+            for value in chunk
+        ]
+
+    def encrypt(self, values):
+        """
+        Fernet tokens of a list of values, as EncryptedCharField stores them
+        """
+        return [
+            value
+            for chunk in self.encrypt_chunks(chunks(values, self.chunk_size))
+            for value in chunk
+        ]
@@ -0,0 +1,196 @@
+"""
+Post-processing of the documents applicants upload: a copy of each original
+is re-encoded to a capped resolution without its EXIF metadata (GPS
+position, device...) and a small WebP thumbnail is stored next to it, so
+reviewers don't download full size phone photos on every page load. The
+uploads themselves are kept as they are.
+"""
+import io
+import logging
+import posixpath
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from api.services.minio import MinioTransferError, minio_download, \
+    minio_upload, minio_get_object
+
+LOGGER = logging.getLogger(__name__)
+
+PENDING = "pending"
+PROCESSED = "processed"
+FAILED = "failed"
+
+STATUSES = [(PENDING, "Pending"), (PROCESSED, "Processed"), (FAILED, "Failed")]
+
+BATCH_SIZE = 10
+# Seconds a worker has to process the rows it leased before another one may
+LEASE = 600
+MAX_DIMENSION = 2400  # pixels, longest side of the re-encoded original
+THUMBNAIL_DIMENSION = 400
+JPEG_QUALITY = 85
+THUMBNAIL_QUALITY = 75
+
+# Formats kept as they are, anything else is re-encoded as JPEG
+FORMATS = {
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+    "GIF": "image/gif",
+    "WEBP": "image/webp",
+}
+
+
+def thumbnail_name(object_name):
+    root, _ = posixpath.splitext(object_name)
+    return root + ".thumb.webp"
+
+
+def normalized_name(object_name):
+    root, extension = posixpath.splitext(object_name)
+    return root + ".normalized" + (extension or ".jpg")
+
+
+def document_url(object_name, status, original=False):
+    """
+    Presigned URL of the thumbnail of a document, or of its full size
+    normalized copy when the original is asked for. Documents that weren't
+    processed (yet) are served as they were uploaded.
+    """
+    if status != PROCESSED:
+        return minio_get_object(object_name)
+    if original:
+        return minio_get_object(normalized_name(object_name))
+    return minio_get_object(thumbnail_name(object_name))
+
+
+def normalize(image):
+    """
+    The image upright, no larger than MAX_DIMENSION and without metadata,
+    with the format it should be saved in.
+    """
+    image_format = image.format if image.format in FORMATS else "JPEG"
+    image = ImageOps.exif_transpose(image)
+    image.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.LANCZOS)
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    # Some encoders write what's left in Image.info back out, EXIF included
+    image.info = {
+        key: value for key, value in image.info.items()
+        if key in ("transparency", "icc_profile")
+    }
+    return image, image_format
+
+
+def encode(image, image_format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **options)
+    return buffer.getvalue()
+
+
+def make_thumbnail(image):
+    thumbnail = image.copy()
+    thumbnail.thumbnail(
+        (THUMBNAIL_DIMENSION, THUMBNAIL_DIMENSION), Image.LANCZOS
+    )
+    if thumbnail.mode not in ("RGB", "RGBA"):
+        has_alpha = "A" in thumbnail.getbands()
+        thumbnail = thumbnail.convert("RGBA" if has_alpha else "RGB")
+    return encode(thumbnail, "WEBP", quality=THUMBNAIL_QUALITY, method=4)
+
+
+def process_document(object_name):
+    """
+    Uploads the normalized copy and the thumbnail of a document, leaving it
+    as it is. Raises MinioTransferError, UnidentifiedImageError or
+    DecompressionBombError.
+    """
+    buffer = io.BytesIO()
+    minio_download(object_name, buffer)
+    buffer.seek(0)
+
+    with Image.open(buffer) as original:
+        original.load()
+        image, image_format = normalize(original)
+        options = {"quality": JPEG_QUALITY} if image_format == "JPEG" else {}
+
+        minio_upload(
+            normalized_name(object_name),
+            encode(image, image_format, **options),
+            FORMATS[image_format]
+        )
+        minio_upload(
+            thumbnail_name(object_name), make_thumbnail(image), "image/webp"
+        )
+
+
+def lease(model, batch_size=BATCH_SIZE):
+    """
+    Claims a batch of rows of model with pending documents for this
+    worker. Rows are locked with SKIP LOCKED only for as long as it takes
+    to give them a lease expiring LEASE seconds later: rows whose worker
+    died are pending again once it has expired.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        rows = list(
+            model.objects.select_for_update(skip_locked=True)
+            .filter(documents_status=PENDING)
+            .filter(
+                Q(documents_lease_expires__isnull=True)
+                | Q(documents_lease_expires__lte=now)
+            )
+            .order_by("created")
+            .only("pk", "doc1", "doc2", "documents_status")[:batch_size]
+        )
+        model.objects.filter(pk__in=[row.pk for row in rows]).update(
+            documents_lease_expires=now + timedelta(seconds=LEASE)
+        )
+    return rows
+
+
+def process_documents(model, batch_size=BATCH_SIZE):
+    """
+    Processes the documents of one batch of rows of model (an application or
+    a household member) and returns the number of rows attempted. Several
+    workers can share the backlog, each processes the rows it leased
+    outside of any transaction and saves their status one at a time.
+    """
+    rows = lease(model, batch_size)
+    for row in rows:
+        try:
+            for document in (row.doc1, row.doc2):
+                if document.name:
+                    process_document(document.name)
+            status = PROCESSED
+        except (
+            MinioTransferError,
+            UnidentifiedImageError,
+            Image.DecompressionBombError,
+            OSError,
+        ) as error:
+            # The original is still served, a reviewer can deal with it
+            LOGGER.error(
+                "Can't process the documents of %s: %s", row.pk, error
+            )
+            status = FAILED
+
+        model.objects.filter(pk=row.pk).update(
+            documents_status=status, documents_lease_expires=None
+        )
+
+    return len(rows)
+
+
+def drain_documents(model, batch_size=BATCH_SIZE):
+    """
+    Processes batches until no row of model is pending
+    """
+    total = 0
+    while True:
+        processed = process_documents(model, batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
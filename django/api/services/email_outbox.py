@@ -0,0 +1,153 @@
+"""
+Sends the emails queued in the outbox, in batches, retrying failures with
+exponential backoff.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from api.models.outbox_email import OutboxEmail
+from api.signals import CHES_TIMEOUT, send_email
+
+LOGGER = logging.getLogger(__name__)
+
+BATCH_SIZE = 50
+MAX_ATTEMPTS = 8
+BASE_DELAY = 30  # seconds before the first retry, doubled on every attempt
+MAX_DELAY = 3600
+# Seconds a worker has to send an email before another one may: at worst
+# a token request and the send, each taking CHES_TIMEOUT to connect and to
+# read, plus a margin
+LEASE = 2 * sum(CHES_TIMEOUT) + 30
+
+
+def retry_delay(attempts):
+    delay = min(BASE_DELAY * 2 ** (attempts - 1), MAX_DELAY)
+    # Spread retries out so a CHES outage doesn't end in a burst
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def due_emails(now):
+    """
+    The emails due to be sent, the longest waiting first: pending ones, and
+    the ones whose lease expired
+    """
+    return OutboxEmail.objects.filter(
+        status__in=[OutboxEmail.PENDING, OutboxEmail.SENDING],
+        next_attempt_at__lte=now,
+    ).order_by("next_attempt_at")
+
+
+def lease(batch_size=BATCH_SIZE):
+    """
+    Claims a batch of due emails for this worker and returns them. Rows
+    are locked with SKIP LOCKED only for as long as it takes to mark them
+    SENDING, with a lease: emails whose worker died while sending them are
+    due again once it has expired. The emails are sent one after the
+    other, the lease of each one covers the sends before it.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        emails = list(
+            due_emails(now).select_for_update(skip_locked=True)[:batch_size]
+        )
+        for position, email in enumerate(emails, 1):
+            email.status = OutboxEmail.SENDING
+            email.next_attempt_at = now + timedelta(seconds=LEASE * position)
+            email.attempts += 1
+            email.modified = now
+        OutboxEmail.objects.bulk_update(
+            emails, ["status", "next_attempt_at", "attempts", "modified"]
+        )
+    return emails
+
+
+def leased(email):
+    """
+    The email while this worker still holds its lease, i.e. no other worker
+    leased it since
+    """
+    return OutboxEmail.objects.filter(
+        pk=email.pk,
+        status=OutboxEmail.SENDING,
+        next_attempt_at=email.next_attempt_at,
+    )
+
+
+def renew(email):
+    """
+    Extends the lease of an email to LEASE seconds from now, right before
+    sending it. Returns False if the lease was lost to another worker.
+    """
+    now = timezone.now()
+    expires = now + timedelta(seconds=LEASE)
+    if not leased(email).update(next_attempt_at=expires, modified=now):
+        return False
+    email.next_attempt_at = expires
+    return True
+
+
+def send(email):
+    """
+    Sends a leased email and saves the outcome straight away, so a worker
+    dying later in the batch doesn't lose it. Emails whose lease was lost
+    are left to the worker holding it.
+    """
+    if not renew(email):
+        LOGGER.warning("Lost the lease of email %s, not sending it", email.pk)
+        return
+
+    try:
+        delivered = send_email(
+            email.recipient, email.application_id, email.message, email.cc
+        )
+        error = "" if delivered else "CHES did not accept the email"
+    except Exception as e:
+        delivered = False
+        error = str(e)
+
+    now = timezone.now()
+    if delivered:
+        outcome = {"status": OutboxEmail.SENT, "sent_at": now,
+                   "last_error": ""}
+    elif email.attempts >= MAX_ATTEMPTS:
+        outcome = {"status": OutboxEmail.FAILED, "last_error": error}
+        LOGGER.error("Giving up on email %s: %s", email.pk, error)
+    else:
+        outcome = {"status": OutboxEmail.PENDING, "last_error": error,
+                   "next_attempt_at": now + retry_delay(email.attempts)}
+    # Not saved if the send outlasted the lease and another worker leased
+    # the email meanwhile
+    if not leased(email).update(**outcome, modified=now):
+        LOGGER.warning(
+            "Lost the lease of email %s while sending it, its outcome "
+            "isn't saved", email.pk
+        )
+
+
+def process_outbox(batch_size=BATCH_SIZE):
+    """
+    Sends one batch of due emails and returns the number of emails that
+    were leased. Several workers can drain the outbox at the same time,
+    each sends the batch it leased, outside of any transaction.
+    """
+    emails = lease(batch_size)
+    for email in emails:
+        send(email)
+    return len(emails)
+
+
+def drain_outbox(batch_size=BATCH_SIZE):
+    """
+    Processes batches until no email is due. Failed emails are rescheduled
+    into the future, so this always terminates.
+    """
+    total = 0
+    while True:
+        processed = process_outbox(batch_size)
+        total += processed
+        if processed < batch_size:
+            return total
@@ -0,0 +1,233 @@
+"""
+Exports applications, joined with their household members, as CSV or
+Parquet. Rows are streamed from a server-side cursor and written out a
+batch at a time, so memory use doesn't depend on the size of the table.
+Only the columns asked for are selected, and so decrypted. Values
+repeated over the rows of an application are decrypted once, through a
+memo of bounded size (api.fields.DecryptMemo).
+"""
+import csv
+import io
+import time
+import uuid
+
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+
+CHUNK_SIZE = 2000
+
+# Exported column -> lookup from GoElectricRebateApplication. One row is
+# written per household member, applications without any get one row with
+# empty household_member_* columns.
+COLUMNS = {
+    "id": "id",
+    "created": "created",
+    "application_type": "application_type",
+    "tax_year": "tax_year",
+    "sin": "sin",
+    "last_name": "last_name",
+    "first_name": "first_name",
+    "middle_names": "middle_names",
+    "email": "email",
+    "address": "address",
+    "city": "city",
+    "postal_code": "postal_code",
+    "drivers_licence": "drivers_licence",
+    "date_of_birth": "date_of_birth",
+    "verified": "verified",
+    "net_income": "net_income",
+    "spouse_email": "spouse_email",
+    "household_member_sin": "householdmember__sin",
+    "household_member_last_name": "householdmember__last_name",
+    "household_member_first_name": "householdmember__first_name",
+    "household_member_middle_names": "householdmember__middle_names",
+    "household_member_email": "householdmember__email",
+    "household_member_date_of_birth": "householdmember__date_of_birth",
+    "household_member_verified": "householdmember__verified",
+    "household_member_net_income": "householdmember__net_income",
+}
+
+# What's exported unless asked otherwise, without SINs
+DEFAULT_COLUMNS = [
+    name for name in COLUMNS if name not in ("sin", "household_member_sin")
+]
+
+FORMATS = ("csv", "parquet")
+
+
+class ExportStats:
+    """
+    Rows written so far and the rate they were written at
+    """
+    def __init__(self):
+        self.rows = 0
+        self.started = time.monotonic()
+
+    @property
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.elapsed if self.elapsed else 0.0
+
+
+def rows(columns, queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields tuples of the requested columns, from a server-side cursor
+    """
+    unknown = set(columns) - set(COLUMNS)
+    if unknown:
+        raise ValueError("Unknown columns: " + ", ".join(sorted(unknown)))
+
+    if queryset is None:
+        queryset = GoElectricRebateApplication.objects.all()
+
+    return queryset.order_by("created", "id", "householdmember__id") \
+        .values_list(*[COLUMNS[column] for column in columns]) \
+        .iterator(chunk_size=chunk_size)
+
+
+def batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def iter_csv(columns, data, stats, chunk_size=CHUNK_SIZE):
+    """
+    Yields the CSV file as chunks of UTF-8 bytes, one per batch of rows
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for batch in batches(data, chunk_size):
+        writer.writerows(batch)
+        stats.rows += len(batch)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue().encode("utf-8")
+
+
+class _Sink(io.RawIOBase):
+    """
+    Write-only file object collecting what pyarrow writes until it's taken
+    """
+    def __init__(self):
+        self.chunks = []
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def take(self):
+        data = b"".join(self.chunks)
+        self.chunks.clear()
+        return data
+
+
+def model_field(column):
+    model = GoElectricRebateApplication
+    *relations, name = COLUMNS[column].split("__")
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def arrow_schema(columns):
+    """
+    Arrow types of the columns, from their model fields, so every row
+    group has the same schema whatever its values
+    """
+    import pyarrow
+
+    types = {
+        "BooleanField": pyarrow.bool_(),
+        "IntegerField": pyarrow.int64(),
+        "DateField": pyarrow.date32(),
+        "DateTimeField": pyarrow.timestamp("us", tz="UTC"),
+    }
+    return pyarrow.schema([
+        (
+            column,
+            types.get(
+                model_field(column).get_internal_type(), pyarrow.string()
+            )
+        )
+        for column in columns
+    ])
+
+
+def iter_parquet(columns, data, stats, chunk_size=CHUNK_SIZE):
+    """
+    Yields the Parquet file as chunks of bytes, one row group per batch of
+    rows. Needs pyarrow.
+    """
+    import pyarrow
+    import pyarrow.parquet
+
+    schema = arrow_schema(columns)
+    sink = _Sink()
+    writer = pyarrow.parquet.ParquetWriter(sink, schema)
+    for batch in batches(data, chunk_size):
+        arrays = [
+            pyarrow.array(
+                # UUIDs have no arrow type
+                [str(v) if isinstance(v, uuid.UUID) else v for v in values],
+                type=field.type,
+            )
+            for values, field in zip(zip(*batch), schema)
+        ]
+        writer.write_table(pyarrow.Table.from_arrays(arrays, schema=schema))
+        stats.rows += len(batch)
+        yield sink.take()
+
+    writer.close()
+    yield sink.take()
+
+
+def iter_export(columns, file_format="csv", queryset=None,
+                chunk_size=CHUNK_SIZE):
+    """
+    The export as chunks of bytes, and the stats filled in as it's consumed
+    """
+    if file_format not in FORMATS:
+        raise ValueError("Unknown format: " + file_format)
+
+    stats = ExportStats()
+    data = rows(columns, queryset, chunk_size)
+    encode = iter_csv if file_format == "csv" else iter_parquet
+    return encode(columns, data, stats, chunk_size), stats
+
+
+def export_to(out, columns, file_format="csv", queryset=None,
+              chunk_size=CHUNK_SIZE):
+    """
+    Writes the export to a binary file-like object and returns its stats
+    """
+    chunks, stats = iter_export(columns, file_format, queryset, chunk_size)
+    for chunk in chunks:
+        out.write(chunk)
+    return stats
+
+
+def upload(object_name, columns, file_format="csv", queryset=None,
+           chunk_size=CHUNK_SIZE):
+    """
+    Streams the export into MinIO as a multipart upload and returns its stats
+    """
+    from api.services.minio import minio_put_stream
+
+    chunks, stats = iter_export(columns, file_format, queryset, chunk_size)
+    minio_put_stream(object_name, chunks)
+    return stats
@@ -0,0 +1,307 @@
+"""
+Transfers files to and from the CRA FTP server.
+
+Logged in sessions are pooled, so parallel transfers each get their own
+control connection without logging in again every time. Files are read
+straight from the data connection, to be parsed or forwarded to MinIO as
+they arrive, without going through local disk. Uploads that break part way
+are resumed with REST from what the server already has.
+"""
+import ftplib
+import logging
+import posixpath
+import queue
+import ssl
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject
+
+LOGGER = logging.getLogger(__name__)
+
+# Size of the reads and writes on data connections
+BLOCK_SIZE = 1024 * 1024
+
+TIMEOUT = 60
+
+# Sessions idle for longer than this are checked with a NOOP before being
+# reused, the server may have dropped them
+IDLE_CHECK = 30
+
+RemoteFile = namedtuple("RemoteFile", ["path", "size", "modified"])
+
+
+class FtpTransferError(Exception):
+    """
+    Raised when a file can't be listed or transferred
+    """
+    def __init__(self, path, message):
+        self.path = path
+        self.message = message
+        super().__init__(f"{path}: {message}")
+
+    @classmethod
+    def from_exception(cls, path, error):
+        return cls(path, f"{type(error).__name__}: {error}")
+
+
+class FtpPool:
+    """
+    At most max_connections logged in sessions to one server, reused by
+    the transfers that check them out one at a time
+    """
+    def __init__(self, host, user, password, port=21, use_tls=False,
+                 max_connections=4, timeout=TIMEOUT):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_tls = use_tls
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_connections)
+
+    def connect(self):
+        ftp = (ftplib.FTP_TLS if self.use_tls else ftplib.FTP)(
+            timeout=self.timeout
+        )
+        ftp.connect(self.host, self.port)
+        ftp.login(self.user, self.password)
+        if self.use_tls:
+            ftp.prot_p()
+        ftp.voidcmd("TYPE I")
+        return ftp
+
+    def _checkout(self):
+        while True:
+            try:
+                ftp, released = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+            if time.monotonic() - released < IDLE_CHECK:
+                return ftp
+            try:
+                ftp.voidcmd("NOOP")
+                return ftp
+            except ftplib.all_errors:
+                ftp.close()
+
+    @contextmanager
+    def session(self):
+        """
+        A logged in session, waiting while max_connections are in use.
+        Sessions are put back for reuse unless something failed with them.
+        """
+        with self._slots:
+            ftp = self._checkout()
+            try:
+                yield ftp
+            except BaseException:
+                ftp.close()
+                raise
+            self._idle.put((ftp, time.monotonic()))
+
+    def close(self):
+        while True:
+            try:
+                ftp, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                ftp.quit()
+            except ftplib.all_errors:
+                ftp.close()
+
+
+# Created on first use, so importing this module doesn't need FTP settings
+POOL = SimpleLazyObject(lambda: FtpPool(
+    settings.CRA_FTP_HOST,
+    settings.CRA_FTP_USER,
+    settings.CRA_FTP_PASSWORD,
+    port=settings.CRA_FTP_PORT,
+    use_tls=settings.CRA_FTP_USE_TLS,
+    max_connections=settings.CRA_FTP_MAX_CONNECTIONS,
+))
+
+
+def parse_modify(value):
+    """
+    The modify fact of MLSD (YYYYMMDDHHMMSS[.sss], in UTC) as a datetime
+    """
+    return datetime.strptime(value[:14], "%Y%m%d%H%M%S") \
+        .replace(tzinfo=timezone.utc)
+
+
+def list_files(directory="", pool=POOL):
+    """
+    The files of a directory, sorted by path, with their size and time of
+    last modification from MLSD. Servers without MLSD are listed with NLST,
+    which gives neither.
+    """
+    try:
+        with pool.session() as ftp:
+            try:
+                files = [
+                    RemoteFile(
+                        posixpath.join(directory, name),
+                        int(facts["size"]) if "size" in facts else None,
+                        parse_modify(facts["modify"])
+                        if "modify" in facts else None,
+                    )
+                    for name, facts
+                    in ftp.mlsd(directory, facts=["type", "size", "modify"])
+                    if facts.get("type", "file") == "file"
+                ]
+            except ftplib.error_perm as error:
+                if not str(error).startswith(("500", "501", "502", "504")):
+                    raise
+                files = [
+                    RemoteFile(
+                        posixpath.join(directory, posixpath.basename(name)),
+                        None,
+                        None,
+                    )
+                    for name in ftp.nlst(directory) if name
+                ]
+    except ftplib.all_errors as error:
+        raise FtpTransferError.from_exception(directory, error) from error
+    return sorted(files)
+
+
+@contextmanager
+def open_file(path, offset=0, block_size=BLOCK_SIZE, pool=POOL):
+    """
+    The remote file, from offset, as a binary file object reading straight
+    from the data connection. It's meant to be read to the end: the server
+    only confirms the transfer once everything was sent.
+    """
+    try:
+        with pool.session() as ftp:
+            conn = ftp.transfercmd("RETR " + path, rest=offset or None)
+            with conn, conn.makefile("rb", buffering=block_size) as file:
+                yield file
+                if isinstance(conn, ssl.SSLSocket):
+                    conn.unwrap()
+            ftp.voidresp()
+    except ftplib.all_errors as error:
+        raise FtpTransferError.from_exception(path, error) from error
+
+
+def download(path, out, offset=0, block_size=BLOCK_SIZE, pool=POOL):
+    """
+    Writes the remote file, from offset, to a binary file-like object and
+    returns the number of bytes written
+    """
+    written = 0
+
+    def write(data):
+        nonlocal written
+        out.write(data)
+        written += len(data)
+
+    try:
+        with pool.session() as ftp:
+            ftp.retrbinary(
+                "RETR " + path, write, blocksize=block_size,
+                rest=offset or None
+            )
+    except ftplib.all_errors as error:
+        raise FtpTransferError.from_exception(path, error) from error
+    return written
+
+
+def read_cra(path, pool=POOL):
+    """
+    The income records of a CRA response file, decoded line by line as
+    the file comes in
+    """
+    from api.services import cra
+
+    with open_file(path, pool=pool) as file:
+        return cra.decode(file)
+
+
+def copy_to_minio(path, object_name, block_size=BLOCK_SIZE, pool=POOL):
+    """
+    Streams the remote file into MinIO as a multipart upload
+    """
+    from api.services.minio import minio_put_stream
+
+    with open_file(path, block_size=block_size, pool=pool) as file:
+        return minio_put_stream(
+            object_name, iter(lambda: file.read(block_size), b"")
+        )
+
+
+def map_files(function, paths, pool=POOL):
+    """
+    Calls function on every path, in parallel over the sessions of the
+    pool. Returns the results and the FtpTransferErrors, by path.
+    """
+    results = {}
+    errors = {}
+    with ThreadPoolExecutor(max_workers=pool.max_connections) as executor:
+        futures = {path: executor.submit(function, path) for path in paths}
+        for path, future in futures.items():
+            try:
+                results[path] = future.result()
+            except FtpTransferError as error:
+                LOGGER.error("Error: %s", error)
+                errors[path] = error
+    return results, errors
+
+
+def read_cra_files(paths, pool=POOL):
+    """
+    The income records of many CRA response files, read in parallel
+    """
+    return map_files(lambda path: read_cra(path, pool=pool), paths, pool)
+
+
+def remote_size(ftp, path):
+    """
+    Size of a remote file, or None if it doesn't exist
+    """
+    try:
+        return ftp.size(path)
+    except ftplib.error_perm:
+        return None
+
+
+def upload(path, file, block_size=BLOCK_SIZE, attempts=3, resume=False,
+           pool=POOL):
+    """
+    Uploads a binary file object from its current position and returns
+    the size of the remote file. When the transfer breaks, it's resumed
+    from the size the server has with REST, up to attempts times, which
+    needs a seekable file. resume also picks up a remote file left over
+    from an earlier upload instead of replacing it.
+    """
+    if not file.seekable():
+        attempts = 1
+        start = 0
+    else:
+        start = file.tell()
+
+    for attempt in range(1, attempts + 1):
+        try:
+            with pool.session() as ftp:
+                offset = 0
+                if resume or attempt > 1:
+                    offset = remote_size(ftp, path) or 0
+                    file.seek(start + offset)
+                ftp.storbinary(
+                    "STOR " + path, file, blocksize=block_size,
+                    rest=offset or None
+                )
+                return remote_size(ftp, path)
+        except ftplib.all_errors as error:
+            if attempt == attempts or isinstance(error, ftplib.error_perm):
+                raise FtpTransferError.from_exception(path, error) from error
+            LOGGER.warning("Resuming the upload of %s: %s", path, error)
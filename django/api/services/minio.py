@@ -1,53 +1,268 @@
-import contextlib
-from urllib.request import Request, urlopen
+import io
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from urllib3 import ProxyManager
+from urllib3.exceptions import HTTPError, IncompleteRead
 
 from django.conf import settings
+from django.utils.functional import SimpleLazyObject
 from minio import Minio
+from minio.error import MinioException, S3Error
 
-IS_LOCALHOST = 'localhost' in settings.MINIO_ENDPOINT.find('localhost')
+from api.cache import ExpiringLRUCache
 
-MINIO_PROXY = 'https://' if settings.MINIO_USE_SSL else 'http://' \
-    + settings.MINIO_ENDPOINT + '/'
+LOGGER = logging.getLogger(__name__)
+
+# MINIO_ENDPOINT may include the scheme (django-storages needs it), the
+# minio client only takes the host
+MINIO_HOST = (settings.MINIO_ENDPOINT or '').split('://')[-1].rstrip('/')
+
+IS_LOCALHOST = 'localhost' in MINIO_HOST
+
+MINIO_PROXY = ('https://' if settings.MINIO_USE_SSL else 'http://') \
+    + MINIO_HOST + '/'
 
 if IS_LOCALHOST:
     MINIO_PROXY = MINIO_PROXY.replace(
         '://localhost', '://host.docker.internal'
     )
 
-MINIO = Minio(
-    settings.MINIO_ENDPOINT,
+# Connections kept open to minio, shared by the parallel transfers below
+MINIO_MAX_CONNECTIONS = 10
+
+# Created on first use, so importing this module doesn't need minio settings
+MINIO = SimpleLazyObject(lambda: Minio(
+    MINIO_HOST,
     access_key=settings.MINIO_ACCESS_KEY,
     secret_key=settings.MINIO_SECRET_KEY,
     secure=settings.MINIO_USE_SSL,
-    http_client=ProxyManager(MINIO_PROXY),
-)
+    http_client=ProxyManager(MINIO_PROXY, maxsize=MINIO_MAX_CONNECTIONS),
+))
+
+GET_EXPIRES = timedelta(seconds=3600)
+PUT_EXPIRES = timedelta(seconds=7200)
+
+# Presigned URLs are reused while they have at least this long left, so a
+# URL handed out is always valid for at least this long
+PRESIGNED_URL_MIN_VALIDITY = timedelta(seconds=1800)
+
+PRESIGNED_URLS = ExpiringLRUCache(maxsize=10000)
+
+
+class MinioTransferError(Exception):
+    """
+    Raised when an object can't be transferred to or from minio
+    """
+    def __init__(self, object_name, code, message):
+        self.object_name = object_name
+        self.code = code
+        self.message = message
+        super().__init__(f"{object_name}: {code}: {message}")
+
+    @classmethod
+    def from_exception(cls, object_name, error):
+        if isinstance(error, S3Error):
+            return cls(object_name, error.code, error.message)
+        return cls(object_name, type(error).__name__, str(error))
+
+
+def presigned_url(method, object_name, expires):
+    """
+    Signs a URL for the object, or reuses one signed earlier that is still
+    valid for at least PRESIGNED_URL_MIN_VALIDITY.
+    """
+    key = (method, settings.MINIO_BUCKET_NAME, object_name)
+    url = PRESIGNED_URLS.get(key)
+    if url is None:
+        url = MINIO.get_presigned_url(
+            method,
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            object_name=object_name,
+            expires=expires
+        )
+        PRESIGNED_URLS.set(
+            key,
+            url,
+            time.time()
+            + (expires - PRESIGNED_URL_MIN_VALIDITY).total_seconds()
+        )
+    return url
 
 
 def minio_get_object(object_name):
-    return MINIO.presigned_get_object(
-        bucket_name=settings.MINIO_BUCKET_NAME,
-        object_name=object_name,
-        expires=timedelta(seconds=3600)
-    )
+    return presigned_url('GET', object_name, GET_EXPIRES)
 
 
 def minio_put_object(object_name):
-    return MINIO.presigned_put_object(
+    return presigned_url('PUT', object_name, PUT_EXPIRES)
+
+
+def minio_get_objects(object_names):
+    """
+    Presigned GET URLs for many objects, by object name
+    """
+    return {name: minio_get_object(name) for name in object_names}
+
+
+def minio_put_objects(object_names):
+    """
+    Presigned PUT URLs for many objects, by object name
+    """
+    return {name: minio_put_object(name) for name in object_names}
+
+
+class IterStream(io.RawIOBase):
+    """
+    Read-only file-like wrapper around an iterable of byte chunks, so that
+    generated content can be handed to put_object without being assembled
+    in memory first. Every read fills the buffer it's given from as many
+    chunks as needed, so short chunks (a line at a time) don't turn into
+    as many short reads.
+    """
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b''
+        self._offset = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        view = memoryview(buffer).cast('B')
+        size = 0
+        while size < len(view):
+            if self._offset >= len(self._buffer):
+                try:
+                    self._buffer = next(self._chunks)
+                except StopIteration:
+                    break
+                self._offset = 0
+            taken = min(len(view) - size, len(self._buffer) - self._offset)
+            view[size:size + taken] = \
+                self._buffer[self._offset:self._offset + taken]
+            self._offset += taken
+            size += taken
+        return size
+
+
+def minio_put_stream(object_name, chunks, part_size=10 * 1024 * 1024):
+    """
+    Uploads an iterable of byte chunks as a multipart upload of unknown
+    length. Only one part is held in memory at a time.
+    """
+    return MINIO.put_object(
         bucket_name=settings.MINIO_BUCKET_NAME,
         object_name=object_name,
-        expires=timedelta(seconds=7200)
+        data=IterStream(chunks),
+        length=-1,
+        part_size=part_size
     )
 
 
+def minio_upload(object_name, data, content_type):
+    """
+    Uploads bytes held in memory as a single object.
+    Raises MinioTransferError on failure.
+    """
+    try:
+        return MINIO.put_object(
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            object_name=object_name,
+            data=io.BytesIO(data),
+            length=len(data),
+            content_type=content_type
+        )
+    except (MinioException, HTTPError) as error:
+        raise MinioTransferError.from_exception(object_name, error) from error
+
+
+def minio_stat_object(object_name):
+    """
+    Metadata (size, content type...) of an object, fetched with a HEAD
+    request. Raises MinioTransferError if the object can't be found.
+    """
+    try:
+        return MINIO.stat_object(
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            object_name=object_name
+        )
+    except (MinioException, HTTPError) as error:
+        raise MinioTransferError.from_exception(object_name, error) from error
+
+
 def minio_remove_object(object_name):
+    for method in ('GET', 'PUT'):
+        PRESIGNED_URLS.invalidate(
+            (method, settings.MINIO_BUCKET_NAME, object_name)
+        )
+
     return MINIO.remove_object(
         bucket_name=settings.MINIO_BUCKET_NAME,
         object_name=object_name
     )
 
 
+def minio_download(object_name, out, chunk_size=8 * 1024 * 1024,
+                   max_workers=4, offset=0, attempts=3):
+    """
+    Streams an object into a file-like object (a file, BytesIO, a socket
+    wrapper...), fetching ranges of chunk_size bytes in parallel over the
+    pooled connections. Chunks are written in order and at most
+    2 * max_workers of them are held in memory at a time.
+    A download that stopped part way is resumed by passing the number of
+    bytes out already holds as offset. A range that breaks on a network
+    error is fetched again, up to attempts times.
+    Returns the size of the object, raises MinioTransferError on failure.
+    """
+    def fetch(start, length):
+        for attempt in range(1, attempts + 1):
+            try:
+                response = MINIO.get_object(
+                    bucket_name=settings.MINIO_BUCKET_NAME,
+                    object_name=object_name,
+                    offset=start,
+                    length=length
+                )
+                try:
+                    data = response.read()
+                finally:
+                    response.close()
+                    response.release_conn()
+                if len(data) != length:
+                    raise IncompleteRead(len(data), length - len(data))
+                return data
+            except (HTTPError, OSError) as error:
+                if attempt == attempts:
+                    raise
+                LOGGER.warning(
+                    "Fetching %s from %d again: %s", object_name, start, error
+                )
+
+    try:
+        size = MINIO.stat_object(
+            bucket_name=settings.MINIO_BUCKET_NAME,
+            object_name=object_name
+        ).size
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = deque()
+            for start in range(offset, size, chunk_size):
+                pending.append(executor.submit(
+                    fetch, start, min(chunk_size, size - start)
+                ))
+                if len(pending) >= 2 * max_workers:
+                    out.write(pending.popleft().result())
+            while pending:
+                out.write(pending.popleft().result())
+    except (MinioException, HTTPError, OSError) as error:
+        raise MinioTransferError.from_exception(object_name, error) from error
+
+    return size
+
+
 def url_retrieve(filename):
     """
     This function retrieves the object from minio and streams it to a local
@@ -57,31 +272,13 @@ def url_retrieve(filename):
     which means our front-end wouldn't be able to access it.
     The alternative solution is to modify the system's hosts file. But that
     requires some manual process.
-    Copied from:
-    https://github.com/python/cpython/blob/23c5f93b83f78f295313e137011edb18b24c37c2/Lib/urllib/request.py#L221-L282
+    Returns whether the file could be retrieved.
     """
-    url = minio_get_object(filename)
-
-    if IS_LOCALHOST:
-        url = url.replace('://localhost', '://host.docker.internal')
-
-    req = Request(url, headers={
-        'HOST': settings.MINIO_ENDPOINT
-    })
-
     try:
-        with contextlib.closing(urlopen(req)) as file_path:
-            temp_file_path = open(filename, 'wb')
-
-            with temp_file_path:
-                byte_size = 1024 * 8
-
-                while True:
-                    block = file_path.read(byte_size)
-                    if not block:
-                        break
-                    temp_file_path.write(block)
-    except Exception as error:
-        print(error)
+        with open(filename, 'wb') as file:
+            minio_download(filename, file)
+    except (MinioTransferError, OSError) as error:
+        LOGGER.error("Error: %s", error)
+        return False
 
     return True
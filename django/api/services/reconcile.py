@@ -0,0 +1,173 @@
+"""
+Applies the incomes assessed by CRA back onto applications and household
+members.
+
+SINs are encrypted, so they can't be matched in SQL. Instead every candidate
+is decrypted once while building an in-memory index keyed by SIN and tax
+year, the CRA records are joined against that index and the matches are
+written back with bulk_update, a chunk at a time.
+"""
+from collections import deque
+
+from django.db.models import QuerySet
+from django.utils import timezone
+
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+from api.services.crypto import chunks
+
+CHUNK_SIZE = 2000
+
+
+def income_rows(records):
+    """
+    Yields (sin, year, income) tuples from either the output of
+    api.services.cra.read or the IncomeRecords returned by read_bulk.
+    """
+    for record in records:
+        if isinstance(record, dict):
+            yield (
+                record['sin'],
+                int(record['year']),
+                int(record['income'] or 0),
+            )
+        else:
+            yield record
+
+
+def build_index(queryset, tax_year_field, chunk_size=CHUNK_SIZE,
+                crypto_pool=None):
+    """
+    Maps (sin, tax year) to the primary keys of the matching rows.
+    Rows are streamed in chunks and each SIN is decrypted exactly once,
+    in the processes of crypto_pool (see api.services.crypto) if given.
+    """
+    index = {}
+    if crypto_pool is None:
+        rows = queryset.values_list('pk', 'sin', tax_year_field) \
+            .iterator(chunk_size=chunk_size)
+        for pk, sin, tax_year in rows:
+            index.setdefault((sin, tax_year), []).append(pk)
+        return index
+
+    # The plain QuerySet.values_list leaves the SINs encrypted
+    rows = QuerySet.values_list(queryset, 'pk', 'sin', tax_year_field) \
+        .iterator(chunk_size=chunk_size)
+    pending = deque()
+
+    def ciphertexts():
+        for chunk in chunks(rows, crypto_pool.chunk_size):
+            pending.append(chunk)
+            # Plain strings, workers don't need to import api.fields for
+            # Ciphertext
+            yield [sin and str(sin) for _, sin, _ in chunk]
+
+    # Chunks are decrypted in order, each matches the oldest pending one
+    for sins in crypto_pool.decrypt_chunks(ciphertexts()):
+        for (pk, _, tax_year), sin in zip(pending.popleft(), sins):
+            index.setdefault((sin, tax_year), []).append(pk)
+    return index
+
+
+def match(index, rows):
+    """
+    Joins (sin, year, income) rows to an index built by build_index and
+    returns the income for each matched primary key.
+    """
+    matches = {}
+    for sin, year, income in rows:
+        for pk in index.get((sin, year), ()):
+            matches[pk] = income
+
+    return matches
+
+
+def apply(model, matches, chunk_size=CHUNK_SIZE):
+    """
+    Marks the matched rows as verified and stores their income, issuing one
+    UPDATE per chunk.
+    """
+    now = timezone.now()
+    pks = list(matches)
+    updated = 0
+
+    for start in range(0, len(pks), chunk_size):
+        rows = [
+            model(pk=pk, net_income=matches[pk], verified=True, modified=now)
+            for pk in pks[start:start + chunk_size]
+        ]
+        updated += model.objects.bulk_update(
+            rows, ['net_income', 'verified', 'modified']
+        )
+
+    return updated
+
+
+class Reconciler:
+    """
+    Reconciles batches of CRA records one after the other. The candidates
+    of a tax year are indexed, and their SINs decrypted, once for the
+    first batch covering it and reused for the following ones.
+    """
+    def __init__(self, chunk_size=CHUNK_SIZE, crypto_pool=None):
+        self.chunk_size = chunk_size
+        self.crypto_pool = crypto_pool
+        self.tax_years = set()
+        self.applications = {}
+        self.household_members = {}
+
+    def load(self, tax_years):
+        missing = set(tax_years) - self.tax_years
+        if not missing:
+            return
+
+        self.applications.update(build_index(
+            GoElectricRebateApplication.objects.filter(
+                tax_year__in=missing, verified=False
+            ),
+            'tax_year',
+            self.chunk_size,
+            self.crypto_pool
+        ))
+        self.household_members.update(build_index(
+            HouseholdMember.objects.filter(
+                application__tax_year__in=missing, verified=False
+            ),
+            'application__tax_year',
+            self.chunk_size,
+            self.crypto_pool
+        ))
+        self.tax_years |= missing
+
+    def reconcile(self, records):
+        rows = list(income_rows(records))
+        self.load({year for _, year, _ in rows})
+
+        application_matches = match(self.applications, rows)
+        household_matches = match(self.household_members, rows)
+        unmatched = sum(
+            1 for sin, year, _ in rows
+            if (sin, year) not in self.applications
+            and (sin, year) not in self.household_members
+        )
+
+        return {
+            'applications': apply(
+                GoElectricRebateApplication, application_matches,
+                self.chunk_size
+            ),
+            'household_members': apply(
+                HouseholdMember, household_matches, self.chunk_size
+            ),
+            'unmatched': unmatched,
+        }
+
+
+def reconcile(records, chunk_size=CHUNK_SIZE):
+    """
+    Reconciles parsed CRA records against every unverified application and
+    household member of the tax years they cover.
+    """
+    return Reconciler(chunk_size).reconcile(records)
@@ -0,0 +1,286 @@
+"""
+Runs the django_extensions jobs of the project (api/jobs/<when>/*.py) from
+one long-lived process instead of a cron line starting a new interpreter
+for every run.
+
+Every schedule is cut into slots (each hour for hourly jobs, each day from
+midnight for daily jobs...). A job runs once per slot: the slot is claimed
+by inserting a JobRun, which can only succeed once per job and slot, and
+the run itself holds a PostgreSQL advisory lock so a slow run is never
+overlapped by the next one, whichever pod starts it. Slots missed while no
+scheduler was running are caught up, up to the job's catch_up most recent.
+Runs left RUNNING by a scheduler that died are marked failed by the next
+one to take the job's lock. Succeeded runs are deleted by the daily
+prune_job_runs job once they're JOB_RUN_RETENTION_DAYS old.
+"""
+import hashlib
+import logging
+import socket
+import time
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.db import DatabaseError, IntegrityError, connection, transaction
+from django.db.models import Avg, Count, Exists, Max, OuterRef
+from django.utils import timezone
+from django_extensions.management.jobs import get_jobs
+
+from api.models.job_run import JobRun
+
+LOGGER = logging.getLogger(__name__)
+
+# Schedules supported, in the order their jobs run when several are due
+SCHEDULES = (
+    "minutely",
+    "quarter_hourly",
+    "hourly",
+    "daily",
+    "weekly",
+    "monthly",
+    "yearly",
+)
+
+# How many missed slots are run when a job doesn't say. Only the latest
+# by default, jobs that need every slot can set catch_up on their class.
+CATCH_UP = 1
+
+
+def slot_start(when, moment):
+    """
+    Start of the slot of the schedule that moment falls in, in local time
+    """
+    moment = timezone.localtime(moment).replace(second=0, microsecond=0)
+    if when == "minutely":
+        return moment
+    if when == "quarter_hourly":
+        return moment.replace(minute=moment.minute - moment.minute % 15)
+    moment = moment.replace(minute=0)
+    if when == "hourly":
+        return moment
+    moment = moment.replace(hour=0)
+    if when == "daily":
+        return moment
+    if when == "weekly":
+        return moment - timedelta(days=moment.weekday())
+    moment = moment.replace(day=1)
+    if when == "monthly":
+        return moment
+    if when == "yearly":
+        return moment.replace(month=1)
+    raise ValueError("Unknown schedule: " + when)
+
+
+def next_slot(when, slot):
+    """
+    Start of the slot after the one starting at slot
+    """
+    steps = {
+        "minutely": timedelta(minutes=1),
+        "quarter_hourly": timedelta(minutes=15),
+        "hourly": timedelta(hours=1),
+        "daily": timedelta(days=1),
+        "weekly": timedelta(weeks=1),
+    }
+    if when in steps:
+        # Wall clock arithmetic on local times, days stay aligned across DST
+        return slot + steps[when]
+    if when == "monthly":
+        return slot_start(when, slot.replace(day=28) + timedelta(days=4))
+    if when == "yearly":
+        return slot.replace(year=slot.year + 1)
+    raise ValueError("Unknown schedule: " + when)
+
+
+def due_slots(name, when, now, catch_up=CATCH_UP):
+    """
+    The slots of the job that haven't run yet, oldest first, at most the
+    catch_up latest ones
+    """
+    current = slot_start(when, now)
+    last = JobRun.objects.filter(job=name).order_by("-scheduled_for") \
+        .values_list("scheduled_for", flat=True).first()
+    if last is None:
+        return [current]
+
+    slots = []
+    slot = next_slot(when, timezone.localtime(last))
+    while slot <= current:
+        slots.append(slot)
+        slot = next_slot(when, slot)
+    return slots[-catch_up:] if catch_up else []
+
+
+def lock_key(name):
+    return int.from_bytes(
+        hashlib.sha256(name.encode("utf-8")).digest()[:8], "big", signed=True
+    )
+
+
+@contextmanager
+def advisory_lock(name):
+    """
+    Yields whether this process holds the lock named name. Other processes
+    (on any pod) get False until it's released. Without PostgreSQL there
+    is only ever one process, the lock is always taken.
+    """
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    key = lock_key(name)
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        locked = cursor.fetchone()[0]
+    # The lock belongs to this database session
+    session = connection.connection
+    try:
+        yield locked
+    finally:
+        if locked:
+            unlock(name, key, session)
+
+
+def unlock(name, key, session):
+    """
+    Releases an advisory lock taken in session. A session that was closed
+    in the meantime released its locks with it, and unlocking from another
+    one would do nothing.
+    """
+    if connection.connection is not session:
+        LOGGER.warning(
+            "The connection holding the lock of %s was closed", name
+        )
+        return
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
+    except DatabaseError:
+        # Closing the broken session is what releases the lock then
+        LOGGER.exception("Can't release the lock of %s", name)
+        connection.close()
+
+
+def fail_interrupted_runs(name):
+    """
+    Marks the runs of the job still RUNNING as failed. Only called with the
+    job's lock held, so none of them can still be going on.
+    """
+    return JobRun.objects.filter(job=name, status=JobRun.RUNNING).update(
+        status=JobRun.FAILED,
+        error="Interrupted: the scheduler running it stopped",
+        finished_at=timezone.now(),
+        modified=timezone.now(),
+    )
+
+
+def run_job(name, job_class, slot):
+    """
+    Runs the job for one slot unless it's already running or ran for that
+    slot. Returns its JobRun, or None if it didn't run.
+    """
+    with advisory_lock("job:" + name) as locked:
+        if not locked:
+            LOGGER.info("%s is already running elsewhere", name)
+            return None
+
+        if fail_interrupted_runs(name):
+            LOGGER.warning("Earlier runs of %s were interrupted", name)
+
+        try:
+            with transaction.atomic():
+                run = JobRun.objects.create(
+                    job=name,
+                    scheduled_for=slot,
+                    started_at=timezone.now(),
+                    host=socket.gethostname(),
+                )
+        except IntegrityError:
+            return None
+
+        started = time.monotonic()
+        try:
+            job = job_class()
+            job.scheduled_for = slot
+            job.execute()
+            run.status = JobRun.SUCCEEDED
+        except Exception:
+            LOGGER.exception("%s failed for %s", name, slot)
+            run.status = JobRun.FAILED
+            run.error = traceback.format_exc()
+
+        run.duration = time.monotonic() - started
+        run.finished_at = timezone.now()
+        run.save(update_fields=[
+            "status", "duration", "finished_at", "error", "modified"
+        ])
+        LOGGER.info(
+            "%s %s for %s in %.3fs", name, run.status, slot, run.duration
+        )
+        return run
+
+
+def scheduled_jobs():
+    """
+    The scheduled jobs of every app by name (app.job), in the order they run
+    """
+    jobs = {
+        f"{app_name}.{job_name}": job_class
+        for (app_name, job_name), job_class
+        in get_jobs(only_scheduled=True).items()
+    }
+    return dict(sorted(
+        jobs.items(), key=lambda item: (SCHEDULES.index(item[1].when), item[0])
+    ))
+
+
+def run_pending(now=None, jobs=None):
+    """
+    Runs every due slot of every job, one after the other, and returns the
+    runs made
+    """
+    now = now or timezone.now()
+    jobs = scheduled_jobs() if jobs is None else jobs
+    runs = []
+    for name, job_class in jobs.items():
+        catch_up = getattr(job_class, "catch_up", CATCH_UP)
+        for slot in due_slots(name, job_class.when, now, catch_up):
+            run = run_job(name, job_class, slot)
+            if run is not None:
+                runs.append(run)
+    return runs
+
+
+def job_stats(since=None):
+    """
+    Number of runs, failures and timings of every job since a date
+    """
+    runs = JobRun.objects.exclude(status=JobRun.RUNNING)
+    if since is not None:
+        runs = runs.filter(started_at__gte=since)
+    stats = runs.values("job").order_by("job").annotate(
+        runs=Count("id"),
+        average=Avg("duration"),
+        longest=Max("duration"),
+        last=Max("scheduled_for"),
+    )
+    failures = dict(
+        runs.filter(status=JobRun.FAILED).values("job").order_by("job")
+        .annotate(failures=Count("id")).values_list("job", "failures")
+    )
+    return [{**row, "failures": failures.get(row["job"], 0)} for row in stats]
+
+
+def prune_runs(before):
+    """
+    Deletes the succeeded runs that finished before a date and returns how
+    many. The latest run of every job is kept whatever its age, due_slots
+    starts from it, and failed runs are kept to be looked into.
+    """
+    newer = JobRun.objects.filter(
+        job=OuterRef("job"), scheduled_for__gt=OuterRef("scheduled_for")
+    )
+    deleted, _ = JobRun.objects.filter(
+        Exists(newer), status=JobRun.SUCCEEDED, finished_at__lt=before
+    ).delete()
+    return deleted
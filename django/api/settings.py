@@ -23,6 +23,13 @@ SALT_KEY = os.getenv(
     '0123456789abcdefghijklmnopqrstuvwxyz'
 )
 
+# Key for the keyed hash (blind index) stored next to each encrypted SIN so
+# SINs can be looked up without decrypting them
+SIN_BLIND_INDEX_KEY = os.getenv(
+    'DJANGO_SIN_BLIND_INDEX_KEY',
+    'zyxwvutsrqponmlkjihgfedcba9876543210'
+)
+
 # SECURITY WARNING: don't run with debug turned on in production!
 DEBUG = os.getenv('DJANGO_DEBUG', 'False') == 'True'
 TESTING = 'test' in sys.argv
@@ -67,6 +74,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
+    'api.middleware.DecryptCacheMiddleware',
 ]
 
 ROOT_URLCONF = 'api.urls'
@@ -156,6 +164,19 @@ KEYCLOAK_CLIENT_ID = os.getenv('KEYCLOAK_CLIENT_ID')
 KEYCLOAK_REALM = os.getenv('KEYCLOAK_REALM')
 KEYCLOAK_URL = os.getenv('KEYCLOAK_URL')
 
+# How long the realm's public keys are cached, and how often an unknown key
+# id may trigger a refresh (e.g. when keycloak rotates its keys)
+KEYCLOAK_KEYS_TTL = int(os.getenv('KEYCLOAK_KEYS_TTL', '3600'))
+KEYCLOAK_KEYS_REFRESH_INTERVAL = int(
+    os.getenv('KEYCLOAK_KEYS_REFRESH_INTERVAL', '60')
+)
+
+# Verified tokens are cached until they expire and users for a while, so
+# repeat requests skip the signature check and the user lookup
+KEYCLOAK_TOKEN_CACHE_SIZE = int(os.getenv('KEYCLOAK_TOKEN_CACHE_SIZE', '4096'))
+KEYCLOAK_USER_CACHE_SIZE = int(os.getenv('KEYCLOAK_USER_CACHE_SIZE', '4096'))
+KEYCLOAK_USER_CACHE_TTL = int(os.getenv('KEYCLOAK_USER_CACHE_TTL', '300'))
+
 
 MINIO_ACCESS_KEY = os.getenv('MINIO_ROOT_USER')
 MINIO_SECRET_KEY = os.getenv('MINIO_ROOT_PASSWORD')
@@ -168,6 +189,33 @@ MINIO_USE_SSL = bool(
 if DEBUG:
     MINIO_USE_SSL = False
 
+# CRA exchanges income files with us over FTP, in parallel sessions of at
+# most CRA_FTP_MAX_CONNECTIONS
+CRA_FTP_HOST = os.getenv('CRA_FTP_HOST')
+CRA_FTP_PORT = int(os.getenv('CRA_FTP_PORT', '21'))
+CRA_FTP_USER = os.getenv('CRA_FTP_USER')
+CRA_FTP_PASSWORD = os.getenv('CRA_FTP_PASSWORD')
+CRA_FTP_USE_TLS = bool(
+    os.getenv('CRA_FTP_USE_TLS', 'True').lower() in ['true', 1]
+)
+CRA_FTP_MAX_CONNECTIONS = int(os.getenv('CRA_FTP_MAX_CONNECTIONS', '4'))
+# Directory CRA drops its response files in
+CRA_FTP_INBOX = os.getenv('CRA_FTP_INBOX', '')
+
+# Succeeded runs of the scheduled jobs are deleted after this many days
+JOB_RUN_RETENTION_DAYS = int(os.getenv('JOB_RUN_RETENTION_DAYS', '30'))
+
+# Documents are uploaded by the browser straight to minio with presigned
+# URLs, then checked against these before an application can use them
+DOCUMENT_MAX_SIZE = int(os.getenv('DOCUMENT_MAX_SIZE', 10 * 1024 * 1024))
+DOCUMENT_CONTENT_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/gif': '.gif',
+    'image/webp': '.webp',
+    'image/heic': '.heic',
+}
+
 DEFAULT_AUTO_FIELD = 'django.db.models.AutoField'
 
 
@@ -1,19 +1,62 @@
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import time
 import requests
 import json
 
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from .models.go_electric_rebate_application import GoElectricRebateApplication
+from .models.outbox_email import OutboxEmail
+from .keycloak_authentication import USER_CACHE
 from django.dispatch import receiver
 from django.conf import settings
 from email.header import Header
 from email.utils import formataddr
+from requests.adapters import HTTPAdapter
 from requests.auth import HTTPBasicAuth
 
 LOGGER = logging.getLogger(__name__)
 
+# All CHES traffic goes through one pooled keep-alive session
+CHES_SESSION = requests.Session()
+CHES_SESSION.mount("https://",
+                   HTTPAdapter(pool_connections=2, pool_maxsize=10))
+CHES_SESSION.mount("http://",
+                   HTTPAdapter(pool_connections=2, pool_maxsize=10))
+CHES_TIMEOUT = (5, 30)  # seconds to connect, seconds to read
+
+# Refresh the token this many seconds before CHES says it expires
+TOKEN_REFRESH_MARGIN = 30
+
+_token = {"value": None, "expires_at": 0}
+_token_lock = threading.Lock()
+
 
 def get_email_service_token() -> {}:
+    """
+    Returns the CHES client credentials token, reusing it until shortly
+    before it expires.
+    """
+    with _token_lock:
+        if _token["value"] and time.monotonic() < _token["expires_at"]:
+            return _token["value"]
+
+        token = fetch_email_service_token()
+        if token and 'access_token' in token:
+            lifetime = token.get('expires_in', 0) - TOKEN_REFRESH_MARGIN
+            _token["value"] = token
+            _token["expires_at"] = time.monotonic() + max(lifetime, 0)
+        return token
+
+
+def clear_email_service_token():
+    with _token_lock:
+        _token["value"] = None
+        _token["expires_at"] = 0
+
+
+def fetch_email_service_token() -> {}:
     client_id = settings.EMAIL['EMAIL_SERVICE_CLIENT_ID']
     client_secret = settings.EMAIL['EMAIL_SERVICE_CLIENT_SECRET']
     url = settings.EMAIL['CHES_AUTH_URL']
@@ -21,11 +64,13 @@ def get_email_service_token() -> {}:
     header = {"content-type": "application/x-www-form-urlencoded"}
 
     try:
-        token_rs = requests.post(url, data=payload,
-                                 auth=HTTPBasicAuth(client_id, client_secret),
-                                 headers=header, verify=True)
+        token_rs = CHES_SESSION.post(
+            url, data=payload, auth=HTTPBasicAuth(client_id, client_secret),
+            headers=header, verify=True, timeout=CHES_TIMEOUT
+        )
         if not token_rs.status_code == 200:
-            LOGGER.error("Error: Unexpected response", token_rs.text.encode('utf8'))
+            LOGGER.error("Error: Unexpected response",
+                         token_rs.text.encode('utf8'))
             return
         json_obj = token_rs.json()
         return json_obj
@@ -34,18 +79,19 @@ def get_email_service_token() -> {}:
         return
 
 
-def send_email(recipient_email: str, application_id: str, message: str, cc_list: list) -> {}:
+def send_email(recipient_email: str, application_id: str, message: str,
+               cc_list: list) -> bool:
     sender_email = settings.EMAIL['SENDER_EMAIL']
     sender_name = settings.EMAIL['SENDER_NAME']
     url = settings.EMAIL['CHES_EMAIL_URL']
-    
+
     subject = "CleanBC Go Electric - Application #{}".format(application_id)
     bodyType = "html"
 
     token = get_email_service_token()
     if not token or 'access_token' not in token:
         LOGGER.error("No email service token provided", token)
-        return
+        return False
     auth_token = token['access_token']
 
     sender_info = formataddr((str(Header(sender_name, "utf-8")), sender_email))
@@ -66,18 +112,145 @@ def send_email(recipient_email: str, application_id: str, message: str, cc_list:
     headers = {"Authorization": 'Bearer ' + auth_token,
                "Content-Type": "application/json"}
     try:
-        response = requests.post(url, data=json.dumps(data), headers=headers)
+        response = CHES_SESSION.post(url, data=json.dumps(data),
+                                     headers=headers, timeout=CHES_TIMEOUT)
+        if response.status_code == 401:
+            # The cached token was revoked or expired early
+            clear_email_service_token()
         if not response.status_code == 201:
-            LOGGER.error("Error: Email failed! %s", response.text.encode('utf8'))
-            return
+            LOGGER.error("Error: Email failed! %s",
+                         response.text.encode('utf8'))
+            return False
 
         email_res = response.json()
         if email_res:
-            LOGGER.debug("Email sent successfully!", email_res['messages'][0]['msgId'])
-            return
+            LOGGER.debug("Email sent successfully!",
+                         email_res['messages'][0]['msgId'])
+        return True
     except requests.exceptions.RequestException as e:
         LOGGER.error("Error: {}".format(e))
-        return
+        return False
+
+
+def merge_url() -> str:
+    """
+    The CHES merge endpoint, which sits next to the email endpoint unless
+    configured otherwise.
+    """
+    url = settings.EMAIL.get('CHES_EMAIL_MERGE_URL')
+    if url:
+        return url
+    return settings.EMAIL['CHES_EMAIL_URL'].rstrip('/') + 'Merge'
+
+
+def send_merge_chunk(url: str, auth_token: str, template: dict,
+                     chunk: list) -> list:
+    """
+    Sends one emailMerge request and returns the delivery status of each of
+    its recipients.
+    """
+    data = {
+        **template,
+        "contexts": [{
+            "to": [recipient["to"]],
+            "cc": recipient.get("cc", []),
+            "bcc": [],
+            "context": recipient.get("context", {}),
+            "delayTS": 0,
+            "tag": recipient.get("tag", ""),
+        } for recipient in chunk],
+    }
+    headers = {"Authorization": 'Bearer ' + auth_token,
+               "Content-Type": "application/json"}
+
+    def failed(error):
+        return [{"to": recipient["to"], "tag": recipient.get("tag", ""),
+                 "sent": False, "msgId": None, "error": error}
+                for recipient in chunk]
+
+    try:
+        response = CHES_SESSION.post(url, data=json.dumps(data),
+                                     headers=headers, timeout=CHES_TIMEOUT)
+    except requests.exceptions.RequestException as e:
+        LOGGER.error("Error: {}".format(e))
+        return failed(str(e))
+
+    if response.status_code == 401:
+        clear_email_service_token()
+    if not response.status_code == 201:
+        LOGGER.error("Error: Email merge failed! %s",
+                     response.text.encode('utf8'))
+        return failed(response.text)
+
+    # CHES returns one message per context, in order
+    try:
+        messages = response.json()['messages']
+    except (KeyError, TypeError, ValueError):
+        LOGGER.error("Error: Unexpected email merge response %s",
+                     response.text.encode('utf8'))
+        return failed("Unexpected response: " + response.text)
+    return [{"to": recipient["to"], "tag": recipient.get("tag", ""),
+             "sent": True, "msgId": message['msgId'], "error": None}
+            for recipient, message in zip(chunk, messages)]
+
+
+def send_bulk_email(recipients: list, subject: str, message: str,
+                    chunk_size: int = 50, max_workers: int = 4) -> list:
+    """
+    Sends a personalised email to each recipient through the CHES merge
+    endpoint, chunk_size recipients per request with up to max_workers
+    requests in flight.
+
+    Recipients are dictionaries with a "to" address and optionally "cc",
+    a "tag" and a "context" used to fill the {{ placeholders }} of the
+    subject and message. Returns the delivery status of every recipient,
+    in order.
+    """
+    token = get_email_service_token()
+    if not token or 'access_token' not in token:
+        LOGGER.error("No email service token provided: %s", token)
+        return [{"to": recipient["to"], "tag": recipient.get("tag", ""),
+                 "sent": False, "msgId": None,
+                 "error": "No email service token"}
+                for recipient in recipients]
+
+    sender_email = settings.EMAIL['SENDER_EMAIL']
+    sender_name = settings.EMAIL['SENDER_NAME']
+    template = {
+        "bodyType": "html",
+        "body": message,
+        "encoding": "utf-8",
+        "from": formataddr((str(Header(sender_name, "utf-8")), sender_email)),
+        "priority": "normal",
+        "subject": subject,
+    }
+    chunks = [recipients[i:i + chunk_size]
+              for i in range(0, len(recipients), chunk_size)]
+    url = merge_url()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        results = executor.map(
+            lambda chunk: send_merge_chunk(
+                url, token['access_token'], template, chunk
+            ),
+            chunks
+        )
+        return [status for chunk in results for status in chunk]
+
+
+def queue_email(recipient_email: str, application_id: str, message: str,
+                cc_list: list):
+    """
+    Adds the email to the outbox rather than sending it right away, so that
+    it's saved in the same transaction as the application and retried if
+    CHES is unavailable. See api.services.email_outbox.
+    """
+    OutboxEmail.objects.create(
+        recipient=recipient_email,
+        application_id=str(application_id),
+        message=message,
+        cc=cc_list,
+    )
 
 
 def send_individual_confirm(recipient, id):
@@ -90,7 +263,7 @@ def send_individual_confirm(recipient, id):
 
         Please feel free to contact us at ZEVPrograms@gov.bc.ca
         """
-    send_email(recipient, id, message, cc_list=[])
+    queue_email(recipient, id, message, cc_list=[])
 
 
 def send_spouse_initial_message(recipient, id, initiator_email):
@@ -107,11 +280,9 @@ def send_spouse_initial_message(recipient, id, initiator_email):
 
         Please feel free to contact us at ZEVPrograms@gov.bc.ca
         """.format(id)
-    send_email(recipient, id, message, cc_list=[initiator_email])
+    queue_email(recipient, id, message, cc_list=[initiator_email])
 
 
-# TODO have this schedule an email task that's retried in the future incase
-# CHES has issues when we setup celery.
 @receiver(post_save, sender=GoElectricRebateApplication)
 def create_application(sender, instance, created, **kwargs):
     if created and settings.EMAIL['SEND_EMAIL']:
@@ -125,3 +296,9 @@ def create_application(sender, instance, created, **kwargs):
                 id=instance.id,
                 initiator_email=instance.email
                 )
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_user_cache(sender, instance, **kwargs):
+    USER_CACHE.invalidate(instance.username)
@@ -0,0 +1,46 @@
+"""
+Rebate applications for tests, with the fields every test needs filled in
+"""
+from datetime import date
+
+from django.contrib.auth import get_user_model
+
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+
+
+def create_user(username="sub"):
+    user, _ = get_user_model().objects.get_or_create(
+        username=username, defaults={"identity_provider": "bceid-basic"}
+    )
+    return user
+
+
+def create_application(**overrides):
+    """
+    Saves an individual application for 2021, made by the user "sub"
+    unless a user is given. Any field can be overridden.
+    """
+    fields = {
+        "sin": "123456789",
+        "last_name": "Doe",
+        "first_name": "John",
+        "email": "john@example.com",
+        "address": "1738 27th Ave",
+        "city": "Coquitlam",
+        "postal_code": "V7N1A2",
+        "drivers_licence": "1234567",
+        "date_of_birth": date(1954, 3, 23),
+        "tax_year": 2021,
+        "doc1": "docs/doc1.jpg",
+        "doc2": "docs/doc2.jpg",
+        "verified": False,
+        "application_type": "individual",
+        "consent_personal": True,
+        "consent_tax": True,
+        **overrides,
+    }
+    if "user" not in fields:
+        fields["user"] = create_user()
+    return GoElectricRebateApplication.objects.create(**fields)
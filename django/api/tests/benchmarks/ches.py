@@ -0,0 +1,51 @@
+# Benchmark sending emails to a local CHES stand-in: a new token and a new
+# connection for every email (the old behaviour) against the cached token
+# and pooled session.
+# From the `django` directory run:
+# ```bash
+# python3 -m api.tests.benchmarks.ches [emails] [latency in ms]
+# ```
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+django.setup()
+
+import requests  # noqa: E402
+from django.conf import settings  # noqa: E402
+
+from api import signals  # noqa: E402
+from api.tests.ches import ChesStandIn  # noqa: E402
+
+
+def legacy_send(recipient, application_id, message, cc_list):
+    token = requests.post(
+        settings.EMAIL['CHES_AUTH_URL'],
+        data={"grant_type": "client_credentials"},
+    ).json()
+    requests.post(
+        settings.EMAIL['CHES_EMAIL_URL'],
+        json={"bcc": [recipient], "body": message, "cc": cc_list},
+        headers={"Authorization": "Bearer " + token['access_token']},
+    )
+
+
+emails = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.002
+
+for name, send in [('legacy', legacy_send), ('pooled', signals.send_email)]:
+    with ChesStandIn(latency=latency) as ches:
+        settings.EMAIL = ches.settings(settings.EMAIL)
+        signals.clear_email_service_token()
+
+        start = time.perf_counter()
+        for i in range(emails):
+            send('john@example.com', i, 'Hello', [])
+        elapsed = (time.perf_counter() - start) / emails * 1000
+
+        print(f'{name:>8} {elapsed:7.2f} ms/email '
+              f'{len(ches.requests):6} requests '
+              f'{ches.connections:6} connections')
@@ -0,0 +1,77 @@
+# Benchmark parsers of CRA response files.
+# Every parser is run against the same generated file and its throughput is
+# reported in MB/s.
+# From the `django` directory run:
+# ```bash
+# python3 -m api.tests.benchmarks.cra_read [number of applicants]
+# ```
+import os
+import sys
+import tempfile
+import time
+
+from api.services.cra import read, read_bulk
+from api.services.cra_pipeline import decode_batches, frame_lines, read_chunks
+
+# Sub-codes returned for each applicant, as in the example response file
+SUB_CODES = ['0117', '0213', '0214', '0236', '0301', '0303', '0305', '0306']
+
+
+def generate(path, applicants):
+    blank = ' ' * 110
+    institution = '20211215 BCGSP00521'
+    with open(path, 'w', newline='') as file:
+        file.write('7200' + ' ' * 24 + institution + ' ' * 99 + '0\r\n')
+        for i in range(applicants):
+            sin = str(100000000 + i)
+            for sub_code in SUB_CODES:
+                income = f'{i % 100000:09d}'
+                suffix = f'{sub_code[1:]}00 0\r\n'
+                file.write(f'7201{sin}2020{sub_code}{income}{blank}{suffix}')
+        count = f'{applicants * len(SUB_CODES) + 2:08d}'
+        file.write(
+            '7202' + ' ' * 24 + institution + ' ' * 6 + count + ' ' * 85
+            + '0\r\n'
+        )
+
+
+def read_text(path):
+    with open(path, 'r') as file:
+        return read(file)
+
+
+# The decoding stages of the reconciliation pipeline, one batch in memory
+def read_stream(path):
+    with open(path, 'rb') as file:
+        for records in decode_batches(frame_lines(read_chunks(file))):
+            pass
+
+
+PARSERS = [
+  ('read', read_text),
+  ('read_bulk', read_bulk),
+  ('stream', read_stream),
+]
+
+
+def benchmark(parser, path, repeat=3):
+    size = os.path.getsize(path) / 1000000
+    best = min(timed(parser, path) for _ in range(repeat))
+    return size / best
+
+
+def timed(parser, path):
+    start = time.perf_counter()
+    parser(path)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    applicants = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'EMLI_RESPONSE_FILE.txt')
+        generate(path, applicants)
+        size = os.path.getsize(path) / 1000000
+        print(f'{size:.1f} MB, {applicants} applicants')
+        for name, parser in PARSERS:
+            print(f'{name:>10} {benchmark(parser, path):>8.1f} MB/s')
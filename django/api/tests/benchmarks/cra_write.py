@@ -0,0 +1,48 @@
+# Benchmark streaming a CRA request file.
+# Peak memory of write_to() should stay flat as the number of records grows,
+# while write() holds the whole file in memory.
+# From the `django` directory run:
+# ```bash
+# python3 -m api.tests.benchmarks.cra_write
+# ```
+import os
+import time
+import tracemalloc
+
+from api.services.cra import write, write_to
+
+
+def rows(count):
+    for i in range(count):
+        yield {
+          'sin': str(100000000 + i),
+          'year': '2021',
+          'given_name': 'John',
+          'family_name': 'Smith',
+          'birth_date': '1955-01-01'
+        }
+
+
+def measure(func, count):
+    tracemalloc.start()
+    start = time.perf_counter()
+    func(rows(count))
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def streamed(data):
+    with open(os.devnull, 'w') as out:
+        write_to(data, out)
+
+
+print(f'{"records":>10} {"method":>10} {"seconds":>10} {"peak KiB":>10}')
+for count in (10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6):
+    methods = [('write_to', streamed)]
+    if count <= 10 ** 5:
+        methods.append(('write', write))
+    for name, func in methods:
+        elapsed, peak = measure(func, count)
+        print(f'{count:>10} {name:>10} {elapsed:>10.2f} {peak // 1024:>10}')
@@ -0,0 +1,41 @@
+# Benchmark bulk Fernet decryption and encryption of SINs across 1, 2, 4 and
+# 8 worker processes. Throughput should grow with the workers up to the
+# number of CPUs available.
+# From the `django` directory run:
+# ```bash
+# python3 -m api.tests.benchmarks.crypto [number of values]
+# ```
+import os
+import sys
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+django.setup()
+
+from api.services.crypto import CryptoPool, available_cpus  # noqa: E402
+
+WORKERS = [1, 2, 4, 8]
+
+
+def timed(func, values):
+    start = time.perf_counter()
+    func(values)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    values = [str(100000000 + i) for i in range(count)]
+    ciphertexts = CryptoPool(workers=1).encrypt(values)
+    print(f'{count} values, {available_cpus()} CPUs available')
+
+    for workers in WORKERS:
+        with CryptoPool(workers=workers) as pool:
+            # Start the processes before timing
+            pool.decrypt(ciphertexts[:workers * pool.chunk_size])
+            decrypt = timed(pool.decrypt, ciphertexts)
+            encrypt = timed(pool.encrypt, values)
+        print(f'{workers} workers: decrypt {count / decrypt:>9.0f}/s, '
+              f'encrypt {count / encrypt:>9.0f}/s')
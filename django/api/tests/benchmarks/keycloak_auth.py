@@ -0,0 +1,65 @@
+# Benchmark token verification per request against a local keycloak
+# stand-in: the old path (new client and public key fetch for every request)
+# against the cached realm keys and the cache of verified tokens.
+# From the `django` directory run:
+# ```bash
+# python3 -m api.tests.benchmarks.keycloak_auth
+# ```
+import os
+import time
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'api.settings')
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from keycloak import KeycloakOpenID  # noqa: E402
+
+from api import keycloak_authentication  # noqa: E402
+from api.keycloak_authentication import KeycloakKeys, verify_token, \
+    verify_cached_token  # noqa: E402
+from api.tests.keycloak import KeycloakStandIn  # noqa: E402
+
+
+def legacy_verify(token):
+    keycloak_openid = KeycloakOpenID(
+        server_url=settings.KEYCLOAK_URL,
+        client_id=settings.KEYCLOAK_CLIENT_ID,
+        realm_name=settings.KEYCLOAK_REALM,
+    )
+    public_key = (
+        "-----BEGIN PUBLIC KEY-----\n"
+        + keycloak_openid.public_key()
+        + "\n-----END PUBLIC KEY-----"
+    )
+    options = {
+        "verify_signature": True, "verify_aud": True, "verify_exp": True
+    }
+    return keycloak_openid.decode_token(token, key=public_key, options=options)
+
+
+def measure(verify, token, requests):
+    start = time.perf_counter()
+    for _ in range(requests):
+        verify(token)
+    return (time.perf_counter() - start) / requests * 1000
+
+
+with KeycloakStandIn() as keycloak:
+    settings.KEYCLOAK_URL = keycloak.url
+    settings.KEYCLOAK_REALM = keycloak.realm
+    settings.KEYCLOAK_CLIENT_ID = keycloak.client_id
+    token = keycloak.sign()
+    keys = KeycloakKeys()
+    keycloak_authentication.KEYCLOAK_KEYS = keys
+
+    for name, verify in [
+        ('legacy', legacy_verify),
+        ('cached keys', lambda token: verify_token(token, keys)),
+        ('cached token', verify_cached_token),
+    ]:
+        before = keycloak.requests
+        latency = measure(verify, token, 200)
+        print(f'{name:>12} {latency:8.3f} ms/request '
+              f'{keycloak.requests - before:5} keycloak requests')
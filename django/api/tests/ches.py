@@ -0,0 +1,109 @@
+"""
+Local stand-in for the CHES token and email endpoints, for tests and
+benchmarks. It records every request and the number of TCP connections
+opened to it.
+"""
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class ChesStandIn:
+    def __init__(self, expires_in=300, latency=0):
+        self.expires_in = expires_in
+        self.latency = latency
+        self.connections = 0
+        self.requests = []
+        self.fail = set()  # addresses CHES should reject
+        # addresses CHES accepts, but without listing the messages sent
+        self.unlisted = set()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Send headers and body in one segment, or keep-alive requests
+            # stall on delayed ACKs
+            wbufsize = 64 * 1024
+
+            def setup(self):
+                stand_in.connections += 1
+                super().setup()
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = self.rfile.read(length).decode("utf-8")
+                stand_in.requests.append((self.path, body))
+                if stand_in.latency:
+                    time.sleep(stand_in.latency)
+
+                if self.path == "/token":
+                    self.respond(200, {
+                        "access_token": str(uuid.uuid4()),
+                        "expires_in": stand_in.expires_in,
+                    })
+                elif self.path == "/api/v1/email":
+                    self.respond(201, {
+                        "txId": str(uuid.uuid4()),
+                        "messages": [{"msgId": str(uuid.uuid4())}],
+                    })
+                elif self.path == "/api/v1/emailMerge":
+                    contexts = json.loads(body)["contexts"]
+                    recipients = [to for c in contexts for to in c["to"]]
+                    if any(to in stand_in.fail for to in recipients):
+                        self.respond(422, {"detail": "Invalid recipient"})
+                        return
+                    if any(to in stand_in.unlisted for to in recipients):
+                        self.respond(201, {"txId": str(uuid.uuid4())})
+                        return
+                    self.respond(201, {
+                        "txId": str(uuid.uuid4()),
+                        "messages": [{
+                            "msgId": str(uuid.uuid4()),
+                            "to": context["to"],
+                            "tag": context.get("tag"),
+                        } for context in contexts],
+                    })
+                else:
+                    self.respond(404, {})
+
+            def respond(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}"
+
+    def settings(self, email):
+        """
+        The EMAIL setting pointing at this stand-in
+        """
+        return {
+            **email,
+            "CHES_AUTH_URL": self.url + "/token",
+            "CHES_EMAIL_URL": self.url + "/api/v1/email",
+            "SEND_EMAIL": True,
+        }
+
+    def paths(self):
+        return [path for path, _ in self.requests]
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
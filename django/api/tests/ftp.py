@@ -1,43 +1,26 @@
-from ftplib import FTP
-from io import StringIO
-import re
+import io
+from ftplib import FTP_PORT
 
-import sys
+from api.services.ftp import FtpPool, download, list_files, upload
 
 # Connect to local ftp server
-ftp = FTP(host='localhost', user='user',passwd='1234')
+pool = FtpPool(host='localhost', user='user', password='1234', port=FTP_PORT)
 
 ###################### Download ###########################
-# Store output for later
-old_stdout = sys.stdout
-
-# Redirect output
-result = StringIO()
-sys.stdout = result
-
-# Print listing of files
-ftp.dir()
-
-# Reset standard output
-sys.stdout = old_stdout
-
-# Grab the string and create array of files
-listing = result.getvalue().splitlines()
-
-# Download all files
-for line in listing:
-  file = re.findall('.* (.*)',line)[0]
-  localfile = open(file, 'wb')
-  ftp.retrbinary('RETR ' + file,localfile.write, 1024)
+# Download all files into memory
+for file in list_files(pool=pool):
+  out = io.BytesIO()
+  print(file.path, download(file.path, out, pool=pool))
 #########################################################
 
 
 ###################### Upload ###########################
 # Upload a file
 filename = 'uploadme.txt'
-ftp.storbinary('STOR '+filename, open(filename,'rb'))
+with open(filename, 'rb') as file:
+  print(filename, upload(filename, file, pool=pool))
 #########################################################
 
 
-# Close connection
-ftp.close()
\ No newline at end of file
+# Close connections
+pool.close()
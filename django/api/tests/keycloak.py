@@ -0,0 +1,118 @@
+"""
+Local stand-in for the keycloak endpoints used by the API, for tests and
+benchmarks. It serves the realm's public key and certs from a throwaway
+RSA key pair and signs tokens with it.
+"""
+import base64
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from jose import jwt
+
+
+def _b64(number):
+    data = number.to_bytes((number.bit_length() + 7) // 8, "big")
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+class KeycloakStandIn:
+    def __init__(self, realm="Demo", client_id="demo-app"):
+        self.realm = realm
+        self.client_id = client_id
+        self.requests = 0
+        self.keys = []
+        self.rotate()
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                stand_in.requests += 1
+                realm_path = f"/auth/realms/{stand_in.realm}"
+                certs_path = realm_path + "/protocol/openid-connect/certs"
+                if self.path == realm_path:
+                    body = {
+                        "realm": stand_in.realm,
+                        "public_key": stand_in.public_key,
+                    }
+                elif self.path == certs_path:
+                    body = {"keys": [jwk for _, jwk in stand_in.keys]}
+                else:
+                    self.send_error(404)
+                    return
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server.server_port}/auth/"
+
+    @property
+    def public_key(self):
+        der = self.keys[-1][0].public_key().public_bytes(
+            serialization.Encoding.DER,
+            serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        return base64.b64encode(der).decode("ascii")
+
+    def rotate(self):
+        """
+        Adds a new signing key, used for every token signed from now on
+        """
+        private_key = rsa.generate_private_key(
+            public_exponent=65537, key_size=2048
+        )
+        numbers = private_key.public_key().public_numbers()
+        self.keys.append((private_key, {
+            "kid": str(uuid.uuid4()),
+            "kty": "RSA",
+            "alg": "RS256",
+            "use": "sig",
+            "n": _b64(numbers.n),
+            "e": _b64(numbers.e),
+        }))
+
+    def sign(self, sub="sub", expires_in=300, **claims):
+        private_key, key = self.keys[-1]
+        pem = private_key.private_bytes(
+            serialization.Encoding.PEM,
+            serialization.PrivateFormat.PKCS8,
+            serialization.NoEncryption(),
+        )
+        now = int(time.time())
+        payload = {
+            "sub": sub,
+            "aud": self.client_id,
+            "iat": now,
+            "identity_provider": "bceid-basic",
+            "display_name": "John Doe",
+            "email": "john@example.com",
+            **claims,
+        }
+        if expires_in is not None:
+            payload["exp"] = now + expires_in
+        return jwt.encode(
+            payload, pem, algorithm="RS256", headers={"kid": key["kid"]}
+        )
+
+    def __enter__(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
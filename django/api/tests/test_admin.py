@@ -0,0 +1,104 @@
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.services import minio
+from api.tests.applications import create_application, create_user
+
+CHANGELIST = "/admin/api/goelectricrebateapplication/"
+
+
+# The admin's static files aren't collected for the tests
+@override_settings(
+    STATICFILES_STORAGE="django.contrib.staticfiles.storage.StaticFilesStorage"
+)
+class TestApplicationAdmin(TestCase):
+    def setUp(self):
+        minio.PRESIGNED_URLS.clear()
+        client = mock.Mock()
+        client.get_presigned_url.side_effect = \
+            lambda method, bucket_name, object_name, expires: (
+                f"https://minio/{object_name}"
+            )
+        patcher = mock.patch.object(minio, "MINIO", client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch(
+            "storages.backends.s3boto3.S3Boto3Storage.url",
+            lambda storage, name: f"https://minio/{name}",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.admin = get_user_model().objects.create_superuser(
+            username="admin", password="admin", identity_provider="idir"
+        )
+        self.client.force_login(self.admin)
+
+    def create_applications(self, count, start=0):
+        for i in range(start, start + count):
+            create_application(
+                user=create_user(f"sub{i}"),
+                sin="046454286" if i == 0 else "123456789",
+                first_name=f"John {i}",
+                email=f"john{i}@example.com",
+                documents_status="processed",
+            )
+
+    def changelist_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(CHANGELIST, params)
+        self.assertEqual(response.status_code, 200)
+        return response, len(queries)
+
+    def test_no_query_per_row(self):
+        self.create_applications(2)
+        _, few = self.changelist_queries()
+        self.create_applications(10, start=2)
+        response, many = self.changelist_queries()
+
+        self.assertEqual(few, many)
+        self.assertContains(response, 'loading="lazy"', count=2 * 12)
+
+    def test_search(self):
+        self.create_applications(3)
+        application = GoElectricRebateApplication.objects.get(
+            first_name="John 0"
+        )
+
+        response, _ = self.changelist_queries(q="046 454 286")
+        self.assertContains(response, "John 0")
+        self.assertNotContains(response, "John 1")
+
+        response, _ = self.changelist_queries(q=str(application.id))
+        self.assertContains(response, "John 0")
+        self.assertNotContains(response, "John 1")
+
+        response, _ = self.changelist_queries(q="JOHN2@example.com")
+        self.assertContains(response, "John 2")
+        self.assertNotContains(response, "John 0")
+
+    def test_change_view(self):
+        self.create_applications(1)
+        application = GoElectricRebateApplication.objects.get()
+
+        with mock.patch(
+            "storages.backends.s3boto3.S3Boto3Storage.url"
+        ) as storage_url:
+            response = self.client.get(
+                f"{CHANGELIST}{application.id}/change/"
+            )
+
+        storage_url.assert_not_called()
+
+        self.assertContains(
+            response, 'src="https://minio/docs/doc1.thumb.webp"'
+        )
+        self.assertContains(
+            response, 'href="https://minio/docs/doc1.normalized.jpg"'
+        )
+        self.assertNotContains(response, 'href="https://minio/docs/doc1.jpg"')
@@ -0,0 +1,299 @@
+import json
+from base64 import urlsafe_b64encode
+from unittest import mock
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from minio.error import S3Error
+from rest_framework.test import APIClient
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.services import minio
+from api.tests.applications import create_application, create_user
+
+
+class TestDirectUploads(TestCase):
+    def setUp(self):
+        minio.PRESIGNED_URLS.clear()
+        self.minio = mock.Mock()
+        patcher = mock.patch.object(minio, "MINIO", self.minio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.minio.get_presigned_url.side_effect = \
+            lambda method, bucket_name, object_name, expires: (
+                f"https://minio/{object_name}"
+            )
+        self.minio.stat_object.return_value = mock.Mock(
+            size=1024, content_type="image/jpeg"
+        )
+        patcher = mock.patch(
+            "storages.backends.s3boto3.S3Boto3Storage.url",
+            lambda storage, name: f"https://minio/{name}",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = get_user_model().objects.create(
+            username="sub", identity_provider="bceid-basic"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def application(self, **kwargs):
+        return {
+            "sin": "046454286",
+            "last_name": "Doe",
+            "first_name": "John",
+            "middle_names": "",
+            "email": "john@example.com",
+            "address": "1738 27th Ave",
+            "city": "Coquitlam",
+            "postal_code": "V7N1A2",
+            "drivers_licence": "1234567",
+            "date_of_birth": "1954-03-23",
+            "tax_year": 2021,
+            "doc1": f"docs/{self.user.pk}/doc1.jpg",
+            "doc2": f"docs/{self.user.pk}/doc2.png",
+            "spouse_email": "",
+            "application_type": "individual",
+            "consent_personal": True,
+            "consent_tax": True,
+            **kwargs,
+        }
+
+    def test_upload_urls(self):
+        response = self.client.post(
+            "/api/application-form/upload-urls",
+            {"content_types": ["image/jpeg", "image/png"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 200)
+        first, second = response.json()["documents"]
+        prefix = f"^docs/{self.user.pk}/"
+        self.assertRegex(first["object_name"], prefix + r"[0-9a-f]{32}\.jpg$")
+        self.assertRegex(second["object_name"], prefix + r"[0-9a-f]{32}\.png$")
+        self.assertEqual(first["url"], "https://minio/" + first["object_name"])
+
+    def test_upload_urls_images_only(self):
+        response = self.client.post(
+            "/api/application-form/upload-urls",
+            {"content_types": ["application/pdf"]},
+            format="json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.minio.get_presigned_url.assert_not_called()
+
+    def test_create_with_uploaded_documents(self):
+        response = self.client.post(
+            "/api/application-form", self.application(), format="json"
+        )
+
+        self.assertEqual(response.status_code, 201, response.content)
+        application = GoElectricRebateApplication.objects.get()
+        doc1, doc2 = self.application()["doc1"], self.application()["doc2"]
+        self.assertEqual(application.doc1.name, doc1)
+        self.assertEqual(application.doc2.name, doc2)
+        self.assertEqual(
+            [
+                c.kwargs["object_name"]
+                for c in self.minio.stat_object.call_args_list
+            ],
+            [doc1, doc2],
+        )
+        self.minio.get_object.assert_not_called()
+
+    def test_create_rejects_documents_of_other_users(self):
+        other = get_user_model().objects.create(
+            username="other", identity_provider="bceid-basic"
+        )
+        for name in (f"docs/{other.pk}/doc1.jpg", "docs/doc1.jpg"):
+            response = self.client.post(
+                "/api/application-form",
+                self.application(doc1=name),
+                format="json",
+            )
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(set(response.json()), {"doc1"})
+
+        self.assertFalse(GoElectricRebateApplication.objects.exists())
+        # Rejected before asking minio about them
+        self.assertNotIn(
+            f"docs/{other.pk}/doc1.jpg",
+            [
+                c.kwargs["object_name"]
+                for c in self.minio.stat_object.call_args_list
+            ],
+        )
+
+    def test_create_rejects_invalid_documents(self):
+        self.minio.stat_object.return_value = mock.Mock(
+            size=1024, content_type="text/html"
+        )
+        response = self.client.post(
+            "/api/application-form",
+            self.application(doc1="../secrets.jpg"),
+            format="json",
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()), {"doc1", "doc2"})
+
+        self.minio.stat_object.side_effect = S3Error(
+            "NoSuchKey", "missing", "docs/doc1.jpg", None, None, None
+        )
+        response = self.client.post(
+            "/api/application-form", self.application(), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+        self.minio.stat_object.side_effect = None
+        self.minio.stat_object.return_value = mock.Mock(
+            size=50 * 1024 * 1024, content_type="image/jpeg"
+        )
+        response = self.client.post(
+            "/api/application-form", self.application(), format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(GoElectricRebateApplication.objects.exists())
+
+    def test_thumbnails_served_once_processed(self):
+        self.client.post(
+            "/api/application-form", self.application(), format="json"
+        )
+        application = GoElectricRebateApplication.objects.get()
+        url = f"/api/application-form/{application.id}"
+
+        doc1 = f"https://minio/docs/{self.user.pk}/doc1"
+        self.assertEqual(self.client.get(url).json()["doc1"], doc1 + ".jpg")
+
+        application.documents_status = "processed"
+        application.save()
+        self.assertEqual(
+            self.client.get(url).json()["doc1"], doc1 + ".thumb.webp"
+        )
+        self.assertEqual(
+            self.client.get(url + "?original=true").json()["doc1"],
+            doc1 + ".normalized.jpg",
+        )
+
+
+class TestKeysetPagination(TestCase):
+    def setUp(self):
+        user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.ids = []
+        for i in range(7):
+            application = create_application(
+                sin="046454286",
+                first_name=f"John {i}",
+            )
+            self.ids.append(str(application.id))
+        # Ties on created are broken by id
+        created = GoElectricRebateApplication.objects \
+            .get(id=self.ids[2]).created
+        GoElectricRebateApplication.objects.filter(id__in=self.ids[2:5]) \
+            .update(created=created)
+
+    def test_walk(self):
+        seen = []
+        url = "/api/application-form?page_size=2"
+        with mock.patch(
+            "storages.backends.s3boto3.S3Boto3Storage.url",
+            lambda storage, name: f"https://minio/{name}",
+        ):
+            while url:
+                page = self.client.get(url).json()
+                self.assertNotIn("count", page)
+                self.assertLessEqual(len(page["results"]), 2)
+                seen += [application["id"] for application in page["results"]]
+                url = page["next"]
+
+            self.assertEqual(sorted(seen), sorted(self.ids))
+            self.assertEqual(len(seen), len(set(seen)))
+
+            page = self.client.get("/api/application-form?count=true").json()
+            self.assertEqual(page["count"], 7)
+            self.assertIsNone(page["next"])
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/application-form?cursor=nonsense")
+        self.assertEqual(response.status_code, 404)
+
+    def test_malformed_cursor(self):
+        positions = [
+            ["2022-01-01T00:00:00+00:00", "not-a-uuid"],
+            ["2022-01-01T00:00:00+00:00", 42],
+            ["2022-01-01T00:00:00+00:00"],
+            [42, str(self.ids[0])],
+            {"created": "2022-01-01T00:00:00+00:00"},
+            "2022-01-01",
+        ]
+        for position in positions:
+            cursor = urlsafe_b64encode(json.dumps(position).encode()).decode()
+            response = self.client.get(
+                f"/api/application-form?cursor={cursor}"
+            )
+            self.assertEqual(response.status_code, 404, position)
+
+
+class TestSparseFieldsets(TestCase):
+    def setUp(self):
+        user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(user)
+        self.application = create_application(
+            sin="046454286",
+            documents_status="processed",
+        )
+        patcher = mock.patch(
+            "storages.backends.s3boto3.S3Boto3Storage.url",
+            lambda storage, name: f"https://minio/{name}",
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        select = next(
+            query["sql"] for query in queries
+            if 'FROM "go_electric_rebate_application"' in query["sql"]
+        )
+        return response.json(), select
+
+    def test_list(self):
+        page, select = self.get("/api/application-form")
+
+        self.assertEqual(
+            set(page["results"][0]),
+            {"id", "created", "first_name", "last_name", "email",
+             "application_type", "tax_year", "verified"},
+        )
+        self.assertNotIn('"sin"', select)
+        self.assertNotIn('"doc1"', select)
+
+    def test_list_fields(self):
+        page, select = self.get("/api/application-form?fields=id,sin,doc1")
+
+        self.assertEqual(page["results"][0], {
+            "id": str(self.application.id),
+            "sin": "046454286",
+            "doc1": "https://minio/docs/doc1.thumb.webp",
+        })
+        self.assertIn('"sin"', select)
+        self.assertIn('"documents_status"', select)
+        self.assertNotIn('"last_name"', select)
+
+    def test_retrieve_fields(self):
+        url = f"/api/application-form/{self.application.id}"
+        application, select = self.get(url + "?fields=first_name,unknown")
+        self.assertEqual(application, {"first_name": "John"})
+        self.assertNotIn('"sin"', select)
+
+        application, _ = self.get(url)
+        self.assertEqual(application["sin"], "046454286")
@@ -0,0 +1,34 @@
+from io import StringIO
+from django.core.management import call_command
+from django.test import TestCase
+from api.fields import blind_index
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.tests.applications import create_application
+
+
+class TestBlindIndex(TestCase):
+    def setUp(self):
+        self.application = create_application(tax_year=2020)
+
+    def test_filled_on_save(self):
+        self.assertEqual(self.application.sin_hash, blind_index("123456789"))
+        self.assertNotEqual(blind_index("123456789"), blind_index("046454286"))
+
+    def test_filter_sin(self):
+        applications = GoElectricRebateApplication.objects
+        self.assertEqual(
+            applications.filter_sin("123 456 789").get(), self.application
+        )
+        self.assertFalse(applications.filter_sin("046454286").exists())
+        self.assertEqual(
+            applications.filter_sins(["046454286", "123456789"]).count(), 1
+        )
+
+    def test_backfill(self):
+        GoElectricRebateApplication.objects.update(sin_hash=None)
+        call_command("backfill_sin_hash", stdout=StringIO())
+
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.sin_hash, blind_index("123456789"))
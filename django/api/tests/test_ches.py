@@ -0,0 +1,80 @@
+import json
+from django.conf import settings
+from django.test import SimpleTestCase, override_settings
+from api.signals import send_email, send_bulk_email, clear_email_service_token
+from api.tests.ches import ChesStandIn
+
+
+class TestChes(SimpleTestCase):
+    def setUp(self):
+        self.ches = ChesStandIn().__enter__()
+        self.addCleanup(self.ches.__exit__)
+        email = override_settings(EMAIL=self.ches.settings(settings.EMAIL))
+        email.enable()
+        self.addCleanup(email.disable)
+        clear_email_service_token()
+        self.addCleanup(clear_email_service_token)
+
+    def test_token_is_reused(self):
+        for i in range(3):
+            self.assertTrue(send_email("john@example.com", i, "Hello", []))
+
+        self.assertEqual(self.ches.paths(), ["/token"] + ["/api/v1/email"] * 3)
+        # Every request went over the same keep-alive connection
+        self.assertEqual(self.ches.connections, 1)
+
+    def test_token_is_refreshed_before_expiry(self):
+        # Expires within the refresh margin, so it's never reused
+        self.ches.expires_in = 10
+        send_email("john@example.com", 1, "Hello", [])
+        send_email("john@example.com", 2, "Hello", [])
+
+        self.assertEqual(self.ches.paths().count("/token"), 2)
+
+    def test_send_bulk_email(self):
+        recipients = [
+            {"to": f"user{i}@example.com", "tag": str(i),
+             "context": {"name": f"User {i}"}}
+            for i in range(5)
+        ]
+        self.ches.fail.add("user4@example.com")
+
+        results = send_bulk_email(
+            recipients, "Your application", "Hello {{ name }}", chunk_size=2
+        )
+
+        self.assertEqual(
+            self.ches.paths(), ["/token"] + ["/api/v1/emailMerge"] * 3
+        )
+        self.assertEqual([result["to"] for result in results],
+                         [recipient["to"] for recipient in recipients])
+        self.assertEqual([result["sent"] for result in results],
+                         [True, True, True, True, False])
+        self.assertIsNotNone(results[0]["msgId"])
+
+        # Chunks are sent concurrently, so they can arrive in any order
+        bodies = [json.loads(body) for _, body in self.ches.requests[1:]]
+        self.assertTrue(
+            all(body["body"] == "Hello {{ name }}" for body in bodies)
+        )
+        self.assertIn(
+            {"name": "User 0"},
+            [
+                context["context"]
+                for body in bodies for context in body["contexts"]
+            ],
+        )
+
+    def test_send_bulk_email_unexpected_response(self):
+        recipients = [{"to": f"user{i}@example.com"} for i in range(4)]
+        self.ches.unlisted.add("user3@example.com")
+
+        with self.assertLogs("api.signals", "ERROR"):
+            results = send_bulk_email(
+                recipients, "Your application", "Hello", chunk_size=2
+            )
+
+        # Only the chunk with the unexpected response failed
+        self.assertEqual([result["sent"] for result in results],
+                         [True, True, False, False])
+        self.assertIn("Unexpected response", results[3]["error"])
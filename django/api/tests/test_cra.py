@@ -1,54 +1,117 @@
+from io import StringIO
 from django.test import TestCase
-from api.services.cra import write, read
+from api.services.cra import write, write_to, read, read_bulk, decode
+
 
 class TestCra(TestCase):
-  # Test the CRA write function
-  def test_write(self):
-    data = [{
-    'sin': '123456789',
-    'year': '2020',
-    'given_name': 'John',
-    'family_name': 'Smith',
-    'birth_date': '1955-01-01'
-    },{
-    'sin': '987654321',
-    'year': '2020',
-    'given_name': 'Amanda',
-    'family_name': 'Williams',
-    'birth_date': '1965-02-21'
-    }]
-    file = write(data)
-
-    lines = file.split('\n') # Split the file into lines
-    lines.pop() # Remove the last line (the terminating character)
-
-    # 4 lines in the file
-    self.assertEqual(len(lines), 4)
-
-    # There should be header
-    self.assertTrue(lines[0].startswith('7100'))
-    self.assertTrue(lines[0].endswith('0'))
-
-    # There should be footer
-    self.assertTrue(lines[3].startswith('7102'))
-    self.assertTrue(lines[3].endswith('0'))
-
-    # There should two records
-    self.assertTrue(lines[1].startswith('7101'))
-    self.assertTrue(lines[1].endswith('0'))
-    self.assertTrue(lines[2].startswith('7101'))
-    self.assertTrue(lines[2].endswith('0'))
+    # Test the CRA write function
+    def test_write(self):
+        data = [{
+            'sin': '123456789',
+            'year': '2020',
+            'given_name': 'John',
+            'family_name': 'Smith',
+            'birth_date': '1955-01-01'
+        }, {
+            'sin': '987654321',
+            'year': '2020',
+            'given_name': 'Amanda',
+            'family_name': 'Williams',
+            'birth_date': '1965-02-21'
+        }]
+        file = write(data)
+
+        lines = file.split('\n')  # Split the file into lines
+        lines.pop()  # Remove the last line (the terminating character)
+
+        # 4 lines in the file
+        self.assertEqual(len(lines), 4)
+
+        # There should be header
+        self.assertTrue(lines[0].startswith('7100'))
+        self.assertTrue(lines[0].endswith('0'))
+
+        # There should be footer
+        self.assertTrue(lines[3].startswith('7102'))
+        self.assertTrue(lines[3].endswith('0'))
+
+        # There should two records
+        self.assertTrue(lines[1].startswith('7101'))
+        self.assertTrue(lines[1].endswith('0'))
+        self.assertTrue(lines[2].startswith('7101'))
+        self.assertTrue(lines[2].endswith('0'))
+
+        # The trailer should count every record, header and trailer included
+        self.assertEqual(lines[3][53:61], '00000004')
+
+        # Every record should be fixed width
+        for line in lines:
+            self.assertEqual(len(line), 147)
+
+    # Test streaming the CRA request file to a file-like object
+    def test_write_to(self):
+        data = ({
+            'sin': '123456789',
+            'year': 2020,
+            'given_name': 'John',
+            'family_name': 'Smith',
+            'birth_date': '1955-01-01'
+        } for _ in range(10))
+        out = StringIO()
+        count = write_to(data, out, lines_per_write=3)
+
+        lines = out.getvalue().split('\n')
+        lines.pop()  # Remove the last line (the terminating character)
+
+        self.assertEqual(count, 10)
+        self.assertEqual(len(lines), 12)
+        self.assertEqual(lines[-1][53:61], '00000012')
+        self.assertEqual(out.getvalue(), write([{
+            'sin': '123456789',
+            'year': 2020,
+            'given_name': 'John',
+            'family_name': 'Smith',
+            'birth_date': '1955-01-01'
+        }] * 10))
 
     # Test the CRA read function
-  def test_read(self):
-    # Sample file
-    f = open('api/tests/data/EMLI_RESPONSE_FILE_example.txt','r') 
-    data = read(f) # Extract our values
-    sin = data[0].get('sin')
-    income = data[0].get('income')
-    year = data[0].get('year')
-
-    # Test the values we care about
-    self.assertEqual(sin, '123456789')
-    self.assertEqual(income, '30257')
-    self.assertEqual(year, '2020')
\ No newline at end of file
+    def test_read(self):
+        # Sample file
+        f = open('api/tests/data/EMLI_RESPONSE_FILE_example.txt', 'r')
+        data = read(f)  # Extract our values
+        sin = data[0].get('sin')
+        income = data[0].get('income')
+        year = data[0].get('year')
+
+        # Test the values we care about
+        self.assertEqual(sin, '123456789')
+        self.assertEqual(income, '30257')
+        self.assertEqual(year, '2020')
+
+    # Test reading the CRA response file in bulk
+    def test_read_bulk(self):
+        data = read_bulk('api/tests/data/EMLI_RESPONSE_FILE_example.txt')
+
+        self.assertEqual(len(data), 1)
+        self.assertEqual(data.sins[0], '123456789')
+        self.assertEqual(data.years[0], 2020)
+        self.assertEqual(data.incomes[0], 30257)
+        self.assertEqual(data.line_numbers[0], 8)
+        self.assertEqual(data.lines, 18)
+        self.assertEqual(data.malformed, [])
+        self.assertEqual(data.index(), {('123456789', 2020): 30257})
+
+    # Test malformed lines are reported rather than skipped
+    def test_decode_malformed(self):
+        income = '7201123456789202002360000302X7'.ljust(146) + '0\r\n'
+        code = '7209'.ljust(146) + '0\r\n'
+        short = '720112345678920200236000030257\r\n'
+        data = decode([income.encode(), code.encode(), short.encode()])
+
+        self.assertEqual(len(data), 0)
+        self.assertEqual(data.malformed, [
+          (1, 'invalid income record'),
+          (2, 'invalid transaction code'),
+          (3, 'invalid length'),
+        ])
+        self.assertEqual(data.malformed_counts()['invalid length'], 1)
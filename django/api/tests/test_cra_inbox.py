@@ -0,0 +1,118 @@
+import io
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from unittest import mock
+from django.test import TestCase
+from api.models.cra_inbox_file import CraInboxFile
+from api.services import cra_inbox, ftp
+from api.services.reconcile import Reconciler, reconcile
+from api.tests.applications import create_application
+
+RESPONSE_FILE = "api/tests/data/EMLI_RESPONSE_FILE_example.txt"
+
+
+class FakeServer:
+    """
+    The FTP functions cra_inbox uses, over files held in memory
+    """
+    def __init__(self):
+        self.files = {}
+        self.downloads = []
+
+    def put(self, path, data, modified):
+        self.files[path] = (data, datetime(*modified, tzinfo=timezone.utc))
+
+    def list_files(self, directory, pool):
+        return [
+            ftp.RemoteFile(path, len(data), modified)
+            for path, (data, modified) in sorted(self.files.items())
+        ]
+
+    @contextmanager
+    def open_file(self, path, pool):
+        self.downloads.append(path)
+        yield io.BytesIO(self.files[path][0])
+
+    def download(self, path, out, pool):
+        self.downloads.append(path)
+        out.write(self.files[path][0])
+
+
+class TestCraInbox(TestCase):
+    def setUp(self):
+        with open(RESPONSE_FILE, "rb") as file:
+            self.response = file.read()
+
+        self.server = FakeServer()
+        for name in ("list_files", "open_file", "download"):
+            patcher = mock.patch.object(ftp, name, getattr(self.server, name))
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        self.application = create_application(tax_year=2020)
+
+    def test_new_file_reconciled_once(self):
+        self.server.put("inbox/a.txt", self.response, (2022, 3, 17))
+
+        [entry] = cra_inbox.poll("inbox")
+        self.assertEqual(entry.status, CraInboxFile.RECONCILED)
+        self.assertEqual(entry.applications, 1)
+        self.assertEqual(entry.lines_processed, self.response.count(b"\n"))
+        self.assertEqual(len(entry.sha256), 64)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.net_income, 30257)
+
+        self.assertEqual(cra_inbox.poll("inbox"), [])
+        self.assertEqual(self.server.downloads, ["inbox/a.txt"])
+
+    def test_touched_file_not_reconciled_again(self):
+        self.server.put("inbox/a.txt", self.response, (2022, 3, 17))
+        cra_inbox.poll("inbox")
+
+        self.server.put("inbox/a.txt", self.response, (2022, 3, 18))
+        with mock.patch.object(Reconciler, "reconcile") as reconcile_batch:
+            self.assertEqual(cra_inbox.poll("inbox"), [])
+        reconcile_batch.assert_not_called()
+
+        entry = CraInboxFile.objects.get()
+        self.assertEqual(
+            entry.mtime, datetime(2022, 3, 18, tzinfo=timezone.utc)
+        )
+
+    def test_changed_file_reconciled_again(self):
+        self.server.put("inbox/a.txt", b"", (2022, 3, 17))
+        [entry] = cra_inbox.poll("inbox")
+        self.assertEqual(entry.records, 0)
+
+        self.server.put("inbox/a.txt", self.response, (2022, 3, 18))
+        [entry] = cra_inbox.poll("inbox")
+
+        self.assertEqual(entry.status, CraInboxFile.RECONCILED)
+        self.assertEqual(entry.applications, 1)
+
+    def test_restarts_from_offset(self):
+        self.server.put("inbox/a.txt", self.response, (2022, 3, 17))
+        lines = self.response.splitlines(keepends=True)
+
+        with mock.patch.object(
+            Reconciler, "reconcile",
+            side_effect=[reconcile([]), RuntimeError("Database is down")],
+        ), self.assertLogs(cra_inbox.LOGGER, "ERROR"):
+            [entry] = cra_inbox.poll("inbox", batch_lines=2)
+
+        self.assertEqual(entry.status, CraInboxFile.FAILED)
+        self.assertEqual(entry.lines_processed, 2)
+        self.assertIn("Database is down", entry.error)
+
+        with mock.patch.object(
+            Reconciler, "reconcile", autospec=True,
+            side_effect=Reconciler.reconcile,
+        ) as reconcile_batch:
+            [entry] = cra_inbox.poll("inbox", batch_lines=2)
+
+        self.assertEqual(entry.status, CraInboxFile.RECONCILED)
+        self.assertEqual(entry.lines_processed, len(lines))
+        # The first two lines weren't reconciled again
+        first_lines = reconcile_batch.call_args_list[0].args[1].line_numbers
+        self.assertTrue(all(line > 2 for line in first_lines))
+        self.assertEqual(entry.applications, 1)
@@ -0,0 +1,85 @@
+import io
+import threading
+import time
+from itertools import count
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from api.services import cra_pipeline, reconcile
+from api.services.cra import read_bulk
+from api.tests.applications import create_application
+
+RESPONSE_FILE = "api/tests/data/EMLI_RESPONSE_FILE_example.txt"
+
+
+class TestStages(SimpleTestCase):
+    def test_frame_lines(self):
+        with open(RESPONSE_FILE, "rb") as file:
+            data = file.read()
+
+        for chunk_size in (1, 7, 147, 1000000):
+            lines = list(cra_pipeline.frame_lines(
+                cra_pipeline.read_chunks(io.BytesIO(data), chunk_size)
+            ))
+            self.assertEqual(lines, data.split(b"\n")[:-1])
+
+        self.assertEqual(
+            list(cra_pipeline.frame_lines([b"a\nb", b"c\n", b"d"])),
+            [b"a", b"bc", b"d"],
+        )
+
+    def test_prefetch_backpressure(self):
+        produced = []
+
+        def items():
+            for item in count():
+                produced.append(item)
+                yield item
+
+        batches = cra_pipeline.prefetch(items(), max_pending=2)
+        for consumed, item in enumerate(batches, 1):
+            time.sleep(0.05)
+            # Two in the queue and one waiting to be put in it
+            self.assertLessEqual(len(produced), consumed + 3)
+            if consumed == 5:
+                break
+        batches.close()
+
+        stopped = len(produced)
+        time.sleep(0.05)
+        self.assertEqual(len(produced), stopped)
+
+    def test_prefetch_errors(self):
+        def items():
+            yield 1
+            raise ValueError("Invalid line")
+
+        threads = threading.active_count()
+        with self.assertRaisesMessage(ValueError, "Invalid line"):
+            list(cra_pipeline.prefetch(items()))
+        self.assertEqual(threading.active_count(), threads)
+
+
+class TestReconcileStream(TestCase):
+    def setUp(self):
+        self.application = create_application(tax_year=2020)
+
+    def test_reconcile_stream(self):
+        with open(RESPONSE_FILE, "rb") as file:
+            data = file.read()
+
+        with mock.patch.object(
+            reconcile, "build_index", wraps=reconcile.build_index
+        ) as build_index:
+            totals = cra_pipeline.reconcile_stream(
+                io.BytesIO(data), chunk_size=100, batch_lines=3
+            )
+
+        self.assertEqual(totals["lines"], data.count(b"\n"))
+        self.assertEqual(totals["records"], len(read_bulk(RESPONSE_FILE)))
+        self.assertEqual(totals["applications"], 1)
+        # Candidates indexed once for the tax year, not once per batch
+        self.assertEqual(build_index.call_count, 2)
+
+        self.application.refresh_from_db()
+        self.assertTrue(self.application.verified)
+        self.assertEqual(self.application.net_income, 30257)
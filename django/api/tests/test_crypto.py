@@ -0,0 +1,64 @@
+from unittest import mock
+from django.test import SimpleTestCase, TestCase
+from api import fields
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.services import crypto
+from api.services.reconcile import Reconciler, build_index
+from api.tests.applications import create_application
+
+
+class TestCryptoPool(SimpleTestCase):
+    def test_in_order_across_processes(self):
+        values = [str(100000000 + i) for i in range(50)] + [None]
+
+        with crypto.CryptoPool(workers=2, chunk_size=7) as pool:
+            ciphertexts = pool.encrypt(values)
+            plaintexts = pool.decrypt(ciphertexts)
+
+        self.assertEqual(plaintexts, values)
+        self.assertIsNone(ciphertexts[-1])
+        # Readable with the keys of the model fields
+        self.assertEqual(
+            fields.fernet().decrypt(ciphertexts[0].encode()).decode(),
+            values[0],
+        )
+
+    def test_in_process(self):
+        ciphertexts = [
+            fields.fernet().encrypt(sin.encode()).decode()
+            for sin in ("123456789", "046454286")
+        ]
+        pool = crypto.CryptoPool(workers=1)
+
+        self.assertEqual(pool.decrypt(ciphertexts), ["123456789", "046454286"])
+        self.assertEqual(pool.encrypt(["", None]), [None, None])
+        self.assertIsNone(pool._executor)
+
+    def test_available_cpus(self):
+        with mock.patch.object(crypto, "_cgroup_cpu_limit", return_value=None):
+            cpus = crypto.available_cpus()
+        self.assertGreaterEqual(cpus, 1)
+
+        with mock.patch.object(crypto, "_cgroup_cpu_limit", return_value=0.5):
+            self.assertEqual(crypto.available_cpus(), 1)
+        with mock.patch.object(
+            crypto, "_cgroup_cpu_limit", return_value=1000.0
+        ):
+            self.assertEqual(crypto.available_cpus(), cpus)
+
+
+class TestBuildIndex(TestCase):
+    def test_same_index_with_pool(self):
+        for i, sin in enumerate(("123456789", "046454286", "123456789")):
+            create_application(sin=sin, tax_year=2020 + i)
+        queryset = GoElectricRebateApplication.objects.all()
+
+        with crypto.CryptoPool(workers=2, chunk_size=2) as pool:
+            index = build_index(queryset, "tax_year", crypto_pool=pool)
+            reconciler = Reconciler(crypto_pool=pool)
+            result = reconciler.reconcile([("046454286", 2021, 100)])
+
+        self.assertEqual(index, build_index(queryset, "tax_year"))
+        self.assertEqual(result["applications"], 1)
@@ -0,0 +1,154 @@
+import io
+from datetime import timedelta
+from unittest import mock, skipUnless
+from django.test import TestCase
+from django.utils import timezone
+from PIL import Image, features
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.services import documents, minio
+from api.tests.applications import create_application
+
+
+def photo(size=(4000, 3000), orientation=6):
+    """
+    A JPEG like a phone's: large, with GPS data and rotated through EXIF
+    """
+    image = Image.new("RGB", size, "red")
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    exif[0x010F] = "Phone maker"
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", exif=exif.tobytes())
+    return buffer.getvalue()
+
+
+class TestNormalize(TestCase):
+    def test_normalize(self):
+        with Image.open(io.BytesIO(photo())) as original:
+            image, image_format = documents.normalize(original)
+            data = documents.encode(image, image_format)
+
+        self.assertEqual(image_format, "JPEG")
+        with Image.open(io.BytesIO(data)) as result:
+            # Rotated upright and scaled down to MAX_DIMENSION
+            self.assertEqual(result.size, (1800, 2400))
+            self.assertNotIn("exif", result.info)
+            self.assertEqual(len(result.getexif()), 0)
+
+    def test_other_formats(self):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (10, 10)).save(buffer, format="TIFF")
+        with Image.open(buffer) as original:
+            image, image_format = documents.normalize(original)
+
+        self.assertEqual(image_format, "JPEG")
+        self.assertEqual(image.mode, "RGB")
+
+    def test_thumbnail_name(self):
+        self.assertEqual(
+            documents.thumbnail_name("docs/abc.jpg"), "docs/abc.thumb.webp"
+        )
+        self.assertEqual(
+            documents.normalized_name("docs/abc.jpg"),
+            "docs/abc.normalized.jpg",
+        )
+
+
+class TestProcessDocuments(TestCase):
+    def setUp(self):
+        minio.PRESIGNED_URLS.clear()
+        self.objects = {"docs/doc1.jpg": photo(), "docs/doc2.jpg": photo()}
+        self.minio = mock.Mock()
+        patcher = mock.patch.object(minio, "MINIO", self.minio)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.minio.stat_object.side_effect = \
+            lambda bucket_name, object_name: mock.Mock(
+                size=len(self.objects[object_name])
+            )
+        self.minio.get_object.side_effect = self.get_object
+        self.minio.put_object.side_effect = self.put_object
+        self.minio.get_presigned_url.side_effect = \
+            lambda method, bucket_name, object_name, expires: (
+                f"https://minio/{object_name}"
+            )
+
+        self.application = create_application()
+
+    def get_object(self, bucket_name, object_name, offset, length):
+        return mock.Mock(
+            read=lambda: self.objects[object_name][offset:offset + length]
+        )
+
+    def put_object(self, bucket_name, object_name, data, length, content_type):
+        self.objects[object_name] = data.read()
+
+    @skipUnless(features.check("webp"), "Pillow was built without WebP")
+    def test_process(self):
+        self.assertEqual(self.application.documents_status, documents.PENDING)
+        self.assertIn(
+            'src="https://minio/docs/doc1.jpg"', self.application.doc1_tag()
+        )
+
+        self.assertEqual(
+            documents.drain_documents(GoElectricRebateApplication), 1
+        )
+
+        self.application.refresh_from_db()
+        self.assertEqual(
+            self.application.documents_status, documents.PROCESSED
+        )
+        self.assertIsNone(self.application.documents_lease_expires)
+        # The upload is kept as it is
+        self.assertEqual(self.objects["docs/doc1.jpg"], photo())
+        normalized = self.objects["docs/doc1.normalized.jpg"]
+        with Image.open(io.BytesIO(normalized)) as image:
+            self.assertEqual(image.size, (1800, 2400))
+        thumbnail = self.objects["docs/doc2.thumb.webp"]
+        with Image.open(io.BytesIO(thumbnail)) as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (300, 400))
+
+        tag = self.application.doc1_tag()
+        self.assertIn('src="https://minio/docs/doc1.thumb.webp"', tag)
+        self.assertIn('href="https://minio/docs/doc1.normalized.jpg"', tag)
+
+        # Nothing left to do
+        self.assertEqual(
+            documents.drain_documents(GoElectricRebateApplication), 0
+        )
+
+    @skipUnless(features.check("webp"), "Pillow was built without WebP")
+    def test_not_an_image(self):
+        self.objects["docs/doc2.jpg"] = b"<html></html>"
+
+        documents.drain_documents(GoElectricRebateApplication)
+
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.documents_status, documents.FAILED)
+        self.assertIn(
+            'src="https://minio/docs/doc2.jpg"', self.application.doc2_tag()
+        )
+
+    def test_decompression_bomb(self):
+        with mock.patch.object(Image, "MAX_IMAGE_PIXELS", 1000), \
+                self.assertLogs(documents.LOGGER, "ERROR"):
+            documents.drain_documents(GoElectricRebateApplication)
+
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.documents_status, documents.FAILED)
+        self.assertEqual(set(self.objects), {"docs/doc1.jpg", "docs/doc2.jpg"})
+
+    def test_lease(self):
+        leased = documents.lease(GoElectricRebateApplication)
+
+        self.assertEqual([row.pk for row in leased], [self.application.pk])
+        # Held by the first worker until its lease expires
+        self.assertEqual(documents.lease(GoElectricRebateApplication), [])
+        GoElectricRebateApplication.objects.update(
+            documents_lease_expires=timezone.now() - timedelta(seconds=1)
+        )
+        self.assertEqual(len(documents.lease(GoElectricRebateApplication)), 1)
@@ -0,0 +1,136 @@
+from datetime import timedelta
+from unittest import mock
+from django.conf import settings
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from api.models.outbox_email import OutboxEmail
+from api import signals
+from api.services import email_outbox
+from api.tests.applications import create_application
+
+
+@override_settings(EMAIL={**settings.EMAIL, "SEND_EMAIL": True})
+class TestEmailOutbox(TestCase):
+    def setUp(self):
+        create_application(
+            application_type="household",
+            spouse_email="jane@example.com",
+        )
+
+    def test_emails_are_queued(self):
+        emails = OutboxEmail.objects.order_by("id")
+        self.assertEqual(
+            [(email.recipient, email.cc) for email in emails],
+            [
+                ("john@example.com", []),
+                ("jane@example.com", ["john@example.com"]),
+            ],
+        )
+        self.assertTrue(
+            all(email.status == OutboxEmail.PENDING for email in emails)
+        )
+
+    @mock.patch("api.services.email_outbox.send_email", return_value=True)
+    def test_process_outbox(self, send_email):
+        self.assertEqual(email_outbox.drain_outbox(), 2)
+        self.assertEqual(send_email.call_count, 2)
+        self.assertEqual(
+            OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 2
+        )
+
+        # Nothing left to send
+        self.assertEqual(email_outbox.process_outbox(), 0)
+
+    @mock.patch("api.services.email_outbox.send_email", return_value=False)
+    def test_retry_with_backoff(self, send_email):
+        email_outbox.process_outbox()
+
+        email = OutboxEmail.objects.first()
+        self.assertEqual(email.status, OutboxEmail.PENDING)
+        self.assertEqual(email.attempts, 1)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+
+        # Not due yet
+        self.assertEqual(email_outbox.process_outbox(), 0)
+
+        OutboxEmail.objects.update(
+            attempts=email_outbox.MAX_ATTEMPTS - 1,
+            next_attempt_at=timezone.now(),
+        )
+        email_outbox.process_outbox()
+        self.assertEqual(
+            OutboxEmail.objects.filter(status=OutboxEmail.FAILED).count(), 2
+        )
+
+    @mock.patch(
+        "api.services.email_outbox.send_email",
+        side_effect=[True, SystemExit()],
+    )
+    def test_worker_dying_mid_batch(self, send_email):
+        with self.assertRaises(SystemExit):
+            email_outbox.process_outbox()
+
+        # The email sent before is saved as sent, the other one is leased
+        first, second = OutboxEmail.objects.order_by("id")
+        self.assertEqual(first.status, OutboxEmail.SENT)
+        self.assertEqual(second.status, OutboxEmail.SENDING)
+        self.assertEqual(email_outbox.process_outbox(), 0)
+
+        # Sent by another worker once the lease expired, the first isn't
+        # sent again
+        OutboxEmail.objects.filter(pk=second.pk).update(
+            next_attempt_at=timezone.now()
+        )
+        send_email.side_effect = None
+        send_email.return_value = True
+        self.assertEqual(email_outbox.process_outbox(), 1)
+        self.assertEqual(
+            OutboxEmail.objects.filter(status=OutboxEmail.SENT).count(), 2
+        )
+
+    def test_lease_covers_the_sends_before(self):
+        first, second = email_outbox.lease()
+        self.assertEqual(
+            second.next_attempt_at - first.next_attempt_at,
+            timedelta(seconds=email_outbox.LEASE),
+        )
+        self.assertGreater(email_outbox.LEASE, 2 * sum(signals.CHES_TIMEOUT))
+
+    @mock.patch("api.services.email_outbox.send_email", return_value=True)
+    def test_lease_lost(self, send_email):
+        first, second = email_outbox.lease()
+        # Expired while the first email was being sent and leased again by
+        # another worker
+        OutboxEmail.objects.filter(pk=second.pk).update(
+            next_attempt_at=timezone.now() + timedelta(minutes=5)
+        )
+
+        email_outbox.send(first)
+        with self.assertLogs(email_outbox.LOGGER, "WARNING"):
+            email_outbox.send(second)
+
+        send_email.assert_called_once()
+        self.assertEqual(
+            OutboxEmail.objects.get(pk=second.pk).status, OutboxEmail.SENDING
+        )
+
+    def test_outcome_not_saved_after_lease_lost(self):
+        [email] = email_outbox.lease(batch_size=1)
+        expires = timezone.now() + timedelta(minutes=5)
+
+        def slow_send(*args):
+            # The send outlasted the lease, another worker leased it again
+            OutboxEmail.objects.filter(pk=email.pk).update(
+                next_attempt_at=expires
+            )
+            return False
+
+        with mock.patch(
+            "api.services.email_outbox.send_email", side_effect=slow_send
+        ), self.assertLogs(email_outbox.LOGGER, "WARNING"):
+            email_outbox.send(email)
+
+        email = OutboxEmail.objects.get(pk=email.pk)
+        self.assertEqual(email.status, OutboxEmail.SENDING)
+        self.assertEqual(email.next_attempt_at, expires)
+        self.assertEqual(email.last_error, "")
@@ -0,0 +1,99 @@
+from unittest import mock
+from django.db import connection
+from django.test import TestCase
+from encrypted_fields.fields import (
+    EncryptedCharField as LibraryEncryptedCharField,
+)
+from api import fields
+from api.fields import decrypt_cache
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.tests.applications import create_application
+
+
+class TestEncryptedCharField(TestCase):
+    def setUp(self):
+        for sin in ("123456789", "046454286"):
+            create_application(sin=sin)
+
+        fernet = mock.Mock(wraps=fields.fernet())
+        self.decrypt = fernet.decrypt
+        patcher = mock.patch.object(fields, "fernet", return_value=fernet)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_same_format_on_disk(self):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT sin FROM go_electric_rebate_application")
+            stored = sorted(
+                LibraryEncryptedCharField().f.decrypt(row[0].encode()).decode()
+                for row in cursor.fetchall()
+            )
+        self.assertEqual(stored, ["046454286", "123456789"])
+
+    def test_decrypted_on_first_access(self):
+        applications = list(
+            GoElectricRebateApplication.objects.order_by("sin_hash")
+        )
+        self.decrypt.assert_not_called()
+
+        sins = {application.sin for application in applications}
+        sins |= {application.sin for application in applications}
+
+        self.assertEqual(sins, {"123456789", "046454286"})
+        self.assertEqual(self.decrypt.call_count, 2)
+
+    def test_request_cache(self):
+        with decrypt_cache():
+            for _ in range(3):
+                for application in GoElectricRebateApplication.objects.all():
+                    application.sin
+        self.assertEqual(self.decrypt.call_count, 2)
+
+        # Nothing is kept once the request is over
+        for application in GoElectricRebateApplication.objects.all():
+            application.sin
+        self.assertEqual(self.decrypt.call_count, 4)
+
+    def test_values(self):
+        applications = GoElectricRebateApplication.objects
+        self.assertEqual(
+            sorted(applications.values_list("sin", flat=True)),
+            ["046454286", "123456789"],
+        )
+        self.assertEqual(
+            sorted(row["sin"] for row in applications.values("sin")),
+            ["046454286", "123456789"],
+        )
+        row = applications.values_list(
+            "sin", "tax_year", named=True
+        ).filter_sin("123456789").get()
+        self.assertEqual((row.sin, row.tax_year), ("123456789", 2021))
+
+    def test_save_unread(self):
+        application = GoElectricRebateApplication.objects \
+            .filter_sin("123456789").get()
+        application.verified = True
+        application.save()
+
+        application = GoElectricRebateApplication.objects \
+            .filter_sin("123456789").get()
+        self.assertEqual(application.sin, "123456789")
+        self.assertTrue(application.verified)
+
+    def test_decrypt_memo_bounded(self):
+        memo = fields.DecryptMemo(maxsize=2)
+        for ciphertext in ("a", "b", "a", "c"):
+            if ciphertext not in memo:
+                memo[ciphertext] = ciphertext.upper()
+            memo[ciphertext]
+
+        # "b" was the least recently used
+        self.assertEqual(list(memo), ["a", "c"])
+
+        with mock.patch.object(fields, "MEMO_SIZE", 1):
+            sins = GoElectricRebateApplication.objects.values_list(
+                "sin", flat=True
+            )
+            self.assertEqual(sorted(sins), ["046454286", "123456789"])
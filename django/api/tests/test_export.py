@@ -0,0 +1,145 @@
+import csv
+import io
+import os
+import tempfile
+from datetime import date
+from unittest import mock, skipUnless
+from django.core.management import call_command
+from django.test import TestCase
+from api.models.household_member import HouseholdMember
+from api import fields
+from api.services import export
+from api.tests.applications import create_application, create_user
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+
+class TestExport(TestCase):
+    def setUp(self):
+        user = create_user()
+        self.applications = []
+        types = ["individual", "household", "individual"]
+        for i, application_type in enumerate(types):
+            application = create_application(
+                first_name=f"John {i}",
+                application_type=application_type,
+            )
+            self.applications.append(application)
+        HouseholdMember.objects.create(
+            user=user,
+            application=self.applications[1],
+            sin="046454286",
+            last_name="Doe",
+            first_name="Jane",
+            email="jane@example.com",
+            date_of_birth=date(1956, 1, 1),
+            doc1="docs/doc3.jpg",
+            doc2="docs/doc4.jpg",
+            verified=True,
+        )
+
+    def read_csv(self, data):
+        return list(csv.DictReader(io.StringIO(data.decode("utf-8"))))
+
+    def test_csv(self):
+        out = io.BytesIO()
+        stats = export.export_to(out, export.DEFAULT_COLUMNS, chunk_size=2)
+
+        rows = self.read_csv(out.getvalue())
+        self.assertEqual(stats.rows, 3)
+        self.assertEqual(
+            [row["first_name"] for row in rows], ["John 0", "John 1", "John 2"]
+        )
+        self.assertEqual(rows[1]["household_member_first_name"], "Jane")
+        self.assertEqual(rows[1]["household_member_verified"], "True")
+        self.assertEqual(rows[0]["household_member_first_name"], "")
+        self.assertNotIn("sin", rows[0])
+
+    def test_only_requested_columns_decrypted(self):
+        with mock.patch("api.fields.decrypt", wraps=fields.decrypt) as decrypt:
+            out = io.BytesIO()
+            export.export_to(out, ["id", "last_name"])
+            decrypt.assert_not_called()
+
+            out = io.BytesIO()
+            export.export_to(out, ["id", "sin", "household_member_sin"])
+            self.assertEqual(decrypt.call_count, 4)
+
+        rows = self.read_csv(out.getvalue())
+        self.assertEqual(rows[1]["household_member_sin"], "046454286")
+        self.assertEqual(rows[2]["sin"], "123456789")
+
+    def test_streamed_in_chunks(self):
+        chunks, stats = export.iter_export(["id"], chunk_size=1)
+        self.assertEqual(len(list(chunks)), 4)
+        self.assertEqual(stats.rows, 3)
+
+    def test_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "applications.csv")
+            stdout = io.StringIO()
+            call_command(
+                "export_applications", output=path, columns="id,tax_year",
+                stdout=stdout
+            )
+            with open(path, "rb") as file:
+                rows = self.read_csv(file.read())
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual(set(rows[0]), {"id", "tax_year"})
+        self.assertRegex(stdout.getvalue(), r"Exported 3 rows in .* rows/s\)")
+
+    def test_upload(self):
+        with mock.patch("api.services.minio.minio_put_stream") as put_stream:
+            put_stream.side_effect = lambda name, chunks: b"".join(chunks)
+            stats = export.upload("exports/applications.csv", ["id"])
+
+        self.assertEqual(
+            put_stream.call_args.args[0], "exports/applications.csv"
+        )
+        self.assertEqual(stats.rows, 3)
+
+    @skipUnless(pyarrow, "pyarrow isn't installed")
+    def test_parquet(self):
+        out = io.BytesIO()
+        export.export_to(out, export.DEFAULT_COLUMNS, "parquet", chunk_size=2)
+
+        table = pyarrow.parquet.read_table(io.BytesIO(out.getvalue()))
+        self.assertEqual(table.num_rows, 3)
+        self.assertEqual(
+            table.column("household_member_first_name").to_pylist(),
+            [None, "Jane", None],
+        )
+
+    def test_memo_bounded(self):
+        application = self.applications[0]
+        for i in range(40):
+            application.pk = None
+            application.sin = "%09d" % i
+            application.save()
+
+        sizes = []
+        set_item = fields.DecryptMemo.__setitem__
+
+        def record_size(memo, ciphertext, value):
+            set_item(memo, ciphertext, value)
+            sizes.append(len(memo))
+
+        record = mock.patch.object(
+            fields.DecryptMemo, "__setitem__", record_size
+        )
+        with mock.patch.object(fields, "MEMO_SIZE", 5), record:
+            out = io.BytesIO()
+            stats = export.export_to(out, ["sin"], chunk_size=10)
+
+        self.assertEqual(stats.rows, 43)
+        self.assertEqual(len(sizes), 43)
+        self.assertEqual(max(sizes), 5)
+        rows = self.read_csv(out.getvalue())
+        self.assertEqual(
+            {"%09d" % i for i in range(40)} - {row["sin"] for row in rows},
+            set(),
+        )
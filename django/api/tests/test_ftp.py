@@ -0,0 +1,171 @@
+import io
+import os
+import shutil
+import tempfile
+import threading
+from unittest import mock, skipUnless
+from django.test import SimpleTestCase
+from api.services import ftp, minio
+
+try:
+    from pyftpdlib.authorizers import DummyAuthorizer
+    from pyftpdlib.handlers import FTPHandler
+    from pyftpdlib.servers import ThreadedFTPServer
+except ImportError:
+    FTPHandler = None
+
+RESPONSE_FILE = os.path.join(
+    os.path.dirname(__file__), "data", "EMLI_RESPONSE_FILE_example.txt"
+)
+
+
+class FlakyFile(io.BytesIO):
+    """
+    Breaks the connection once, after break_at bytes were read
+    """
+    def __init__(self, data, break_at):
+        super().__init__(data)
+        self.break_at = break_at
+
+    def read(self, size=-1):
+        if self.break_at is not None and self.tell() >= self.break_at:
+            self.break_at = None
+            raise ConnectionResetError("Connection reset by peer")
+        return super().read(size)
+
+
+@skipUnless(FTPHandler, "pyftpdlib isn't installed")
+class TestFtp(SimpleTestCase):
+    def setUp(self):
+        with open(RESPONSE_FILE, "rb") as file:
+            self.response = file.read()
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+        os.mkdir(os.path.join(self.root, "inbox"))
+        os.mkdir(os.path.join(self.root, "inbox", "archive"))
+        for name in ("b.txt", "a.txt"):
+            shutil.copy(RESPONSE_FILE, os.path.join(self.root, "inbox", name))
+
+        self.logins = []
+        logins = self.logins
+
+        class Handler(FTPHandler):
+            def on_login(self, username):
+                logins.append(username)
+
+        authorizer = DummyAuthorizer()
+        authorizer.add_user("cra", "secret", self.root, perm="elradfmwMT")
+        Handler.authorizer = authorizer
+        self.handler = Handler
+
+        server = ThreadedFTPServer(("127.0.0.1", 0), Handler)
+        thread = threading.Thread(
+            target=server.serve_forever,
+            kwargs={"timeout": 0.1, "handle_exit": False},
+        )
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(server.close_all)
+
+        self.pool = ftp.FtpPool(
+            "127.0.0.1", "cra", "secret", port=server.address[1],
+            max_connections=2,
+        )
+        self.addCleanup(self.pool.close)
+
+    def read(self, name):
+        with open(os.path.join(self.root, name), "rb") as file:
+            return file.read()
+
+    def test_list_files(self):
+        files = ftp.list_files("inbox", pool=self.pool)
+
+        self.assertEqual(
+            [file.path for file in files], ["inbox/a.txt", "inbox/b.txt"]
+        )
+        self.assertEqual(files[0].size, os.path.getsize(RESPONSE_FILE))
+        self.assertIsNotNone(files[0].modified)
+
+    def test_list_files_without_mlsd(self):
+        def ftp_MLSD(handler, path):
+            handler.respond("502 Command not implemented.")
+
+        with mock.patch.object(self.handler, "ftp_MLSD", ftp_MLSD):
+            files = ftp.list_files("inbox", pool=self.pool)
+
+        self.assertIn("inbox/a.txt", [file.path for file in files])
+        self.assertIsNone(files[0].size)
+
+    def test_download(self):
+        out = io.BytesIO()
+        size = ftp.download("inbox/a.txt", out, pool=self.pool)
+
+        self.assertEqual(out.getvalue(), self.response)
+        self.assertEqual(size, len(out.getvalue()))
+
+        out = io.BytesIO()
+        ftp.download("inbox/a.txt", out, offset=100, pool=self.pool)
+        self.assertEqual(out.getvalue(), self.response[100:])
+
+        with self.assertRaises(ftp.FtpTransferError):
+            ftp.download("inbox/missing.txt", io.BytesIO(), pool=self.pool)
+
+    def test_read_cra_files_in_parallel(self):
+        paths = ["inbox/a.txt", "inbox/b.txt", "inbox/missing.txt"]
+        for _ in range(3):
+            with self.assertLogs(ftp.LOGGER, "ERROR"):
+                results, errors = ftp.read_cra_files(paths, pool=self.pool)
+
+        self.assertEqual(
+            len(results["inbox/a.txt"]), len(results["inbox/b.txt"])
+        )
+        self.assertGreater(len(results["inbox/a.txt"]), 0)
+        self.assertEqual(list(errors), ["inbox/missing.txt"])
+        # Sessions are reused, only failed ones are replaced
+        self.assertLessEqual(len(self.logins), 2 + 3)
+
+    def test_copy_to_minio(self):
+        uploaded = []
+        client = mock.Mock()
+        client.put_object.side_effect = lambda **kwargs: uploaded.append(
+            kwargs["data"].read()
+        )
+
+        with mock.patch.object(minio, "MINIO", client):
+            ftp.copy_to_minio(
+                "inbox/a.txt", "cra/a.txt", block_size=100, pool=self.pool
+            )
+
+        self.assertEqual(uploaded, [self.response])
+        self.assertEqual(
+            client.put_object.call_args.kwargs["object_name"], "cra/a.txt"
+        )
+
+    def test_upload(self):
+        data = os.urandom(300000)
+        size = ftp.upload("request.txt", io.BytesIO(data), pool=self.pool)
+
+        self.assertEqual(size, len(data))
+        self.assertEqual(self.read("request.txt"), data)
+
+    def test_upload_resumed(self):
+        data = os.urandom(300000)
+        with self.assertLogs(ftp.LOGGER, "WARNING"):
+            size = ftp.upload(
+                "request.txt", FlakyFile(data, 100000), block_size=8192,
+                pool=self.pool,
+            )
+
+        self.assertEqual(size, len(data))
+        self.assertEqual(self.read("request.txt"), data)
+
+    def test_upload_resumes_leftover(self):
+        data = os.urandom(300000)
+        with open(os.path.join(self.root, "request.txt"), "wb") as file:
+            file.write(data[:12345])
+
+        ftp.upload(
+            "request.txt", io.BytesIO(data), resume=True, pool=self.pool
+        )
+
+        self.assertEqual(self.read("request.txt"), data)
@@ -0,0 +1,110 @@
+import threading
+from unittest import mock
+from django.test import TestCase, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from api.keycloak_authentication import KeycloakAuthentication, KeycloakKeys, \
+    verify_token, cache_stats, TOKEN_CACHE, USER_CACHE
+from api.tests.keycloak import KeycloakStandIn
+
+
+class TestKeycloakAuthentication(TestCase):
+    def setUp(self):
+        self.keycloak = KeycloakStandIn().__enter__()
+        self.addCleanup(self.keycloak.__exit__)
+        settings = override_settings(
+            KEYCLOAK_URL=self.keycloak.url,
+            KEYCLOAK_REALM=self.keycloak.realm,
+            KEYCLOAK_CLIENT_ID=self.keycloak.client_id,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.keys = KeycloakKeys(ttl=3600, refresh_interval=60)
+        patcher = mock.patch(
+            "api.keycloak_authentication.KEYCLOAK_KEYS", self.keys
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        TOKEN_CACHE.clear()
+        USER_CACHE.clear()
+
+    def test_keys_are_cached(self):
+        token = self.keycloak.sign()
+        for _ in range(3):
+            self.assertEqual(verify_token(token, self.keys)["sub"], "sub")
+        self.assertEqual(self.keycloak.requests, 1)
+
+    def test_one_fetch_per_process(self):
+        keys = KeycloakKeys(ttl=3600, refresh_interval=60)
+        token = self.keycloak.sign()
+        start = threading.Barrier(8)
+
+        def verify():
+            start.wait()
+            verify_token(token, keys)
+
+        threads = [threading.Thread(target=verify) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # The other threads waited for the first one's keys
+        self.assertEqual(self.keycloak.requests, 1)
+
+    def test_key_rotation(self):
+        verify_token(self.keycloak.sign(), self.keys)
+        self.keycloak.rotate()
+        self.keys.refresh_interval = 0
+
+        self.assertEqual(
+            verify_token(self.keycloak.sign(), self.keys)["sub"], "sub"
+        )
+        self.assertEqual(self.keycloak.requests, 2)
+
+    def test_unknown_key_is_not_refetched(self):
+        verify_token(self.keycloak.sign(), self.keys)
+        self.keycloak.rotate()
+
+        # A refresh happened less than refresh_interval ago
+        with self.assertRaises(AuthenticationFailed):
+            verify_token(self.keycloak.sign(), self.keys)
+        self.assertEqual(self.keycloak.requests, 1)
+
+    def test_invalid_token(self):
+        token = self.keycloak.sign(aud="other-app")
+        with self.assertRaises(AuthenticationFailed):
+            verify_token(token, self.keys)
+
+        with self.assertRaises(AuthenticationFailed):
+            verify_token(self.keycloak.sign(expires_in=-60), self.keys)
+
+    def test_token_without_expiry(self):
+        token = self.keycloak.sign(expires_in=None)
+        with self.assertRaises(AuthenticationFailed):
+            KeycloakAuthentication().authenticate_credentials(token)
+        self.assertEqual(cache_stats()["tokens"]["size"], 0)
+
+    def test_authenticate_credentials(self):
+        token = self.keycloak.sign()
+        user, _ = KeycloakAuthentication().authenticate_credentials(token)
+        self.assertEqual(user.username, "sub")
+        self.assertEqual(user.identity_provider, "bceid-basic")
+
+    def test_repeat_requests_are_cached(self):
+        token = self.keycloak.sign()
+        authentication = KeycloakAuthentication()
+        user, _ = authentication.authenticate_credentials(token)
+
+        target = "api.keycloak_authentication.verify_token"
+        with self.assertNumQueries(0), mock.patch(target) as verify:
+            cached_user, _ = authentication.authenticate_credentials(token)
+        verify.assert_not_called()
+        self.assertEqual(cached_user, user)
+        self.assertEqual(cache_stats()["tokens"]["hits"], 1)
+        self.assertEqual(cache_stats()["users"]["hits"], 1)
+
+        # Saving the user drops it from the cache
+        user.save()
+        with self.assertNumQueries(1):
+            authentication.authenticate_credentials(token)
+        self.assertEqual(cache_stats()["users"]["misses"], 2)
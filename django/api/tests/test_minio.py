@@ -0,0 +1,173 @@
+import io
+import os
+import threading
+from unittest import mock
+from django.test import SimpleTestCase
+from minio.error import S3Error
+from urllib3.exceptions import ProtocolError
+from api.services import minio
+
+
+class TestPresignedUrls(SimpleTestCase):
+    def setUp(self):
+        minio.PRESIGNED_URLS.clear()
+        self.client = mock.Mock()
+        patcher = mock.patch.object(minio, "MINIO", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client.get_presigned_url.side_effect = \
+            lambda method, bucket_name, object_name, expires: (
+                f"{method} {object_name}"
+            )
+
+    def test_urls_are_cached(self):
+        self.assertEqual(
+            minio.minio_get_object("docs/a.jpg"), "GET docs/a.jpg"
+        )
+        self.assertEqual(
+            minio.minio_get_object("docs/a.jpg"), "GET docs/a.jpg"
+        )
+        self.assertEqual(
+            minio.minio_put_object("docs/a.jpg"), "PUT docs/a.jpg"
+        )
+        self.assertEqual(self.client.get_presigned_url.call_count, 2)
+
+    def test_bulk(self):
+        minio.minio_get_object("docs/a.jpg")
+        urls = minio.minio_get_objects(["docs/a.jpg", "docs/b.jpg"])
+
+        self.assertEqual(urls, {
+            "docs/a.jpg": "GET docs/a.jpg",
+            "docs/b.jpg": "GET docs/b.jpg",
+        })
+        self.assertEqual(self.client.get_presigned_url.call_count, 2)
+
+    def test_expires_before_signature(self):
+        with mock.patch("api.cache.time.time", return_value=0):
+            minio.minio_get_object("docs/a.jpg")
+        # Past the reuse window but still well within the signature's hour
+        with mock.patch("api.cache.time.time", return_value=1801):
+            minio.minio_get_object("docs/a.jpg")
+        self.assertEqual(self.client.get_presigned_url.call_count, 2)
+
+    def test_remove_invalidates(self):
+        minio.minio_get_object("docs/a.jpg")
+        minio.minio_remove_object("docs/a.jpg")
+        minio.minio_get_object("docs/a.jpg")
+        self.assertEqual(self.client.get_presigned_url.call_count, 2)
+
+
+class TestPutStream(SimpleTestCase):
+    def test_short_chunks_fill_reads(self):
+        lines = [b"%0147d\n" % i for i in range(30000)]
+        stream = minio.IterStream(iter(lines))
+
+        buffer = bytearray(1024 * 1024)
+        self.assertEqual(stream.readinto(buffer), len(buffer))
+        self.assertEqual(bytes(buffer), b"".join(lines)[:len(buffer)])
+
+    def test_multipart_upload(self):
+        lines = [b"%0147d\n" % i for i in range(50000)]
+        parts = []
+
+        def put_object(bucket_name, object_name, data, length, part_size):
+            # As minio does for an unknown length, one part at a time
+            while True:
+                part = data.read(part_size)
+                if not part:
+                    return
+                parts.append(part)
+
+        client = mock.Mock()
+        client.put_object.side_effect = put_object
+        with mock.patch.object(minio, "MINIO", client):
+            minio.minio_put_stream(
+                "cra/request.txt", iter(lines), part_size=5 * 1024 * 1024
+            )
+
+        self.assertEqual(b"".join(parts), b"".join(lines))
+        self.assertEqual(len(parts), 2)
+        self.assertEqual(len(parts[0]), 5 * 1024 * 1024)
+
+
+class FakeMinio:
+    """
+    Serves the ranges of one object, failing the fetches of the offsets in
+    fail_at once each
+    """
+    def __init__(self, data, fail_at=(), short_at=()):
+        self.data = data
+        self.fail_at = set(fail_at)
+        self.short_at = set(short_at)
+        self.ranges = []
+        self.lock = threading.Lock()
+
+    def stat_object(self, bucket_name, object_name):
+        if object_name != "docs/a.jpg":
+            raise S3Error(
+                "NoSuchKey", "missing", object_name, None, None, None
+            )
+        return mock.Mock(size=len(self.data))
+
+    def get_object(self, bucket_name, object_name, offset, length):
+        with self.lock:
+            self.ranges.append((offset, length))
+            if offset in self.fail_at:
+                self.fail_at.remove(offset)
+                raise ProtocolError("Connection broken")
+            short = offset in self.short_at
+            self.short_at.discard(offset)
+        data = self.data[offset:offset + length]
+        return mock.Mock(read=lambda: data[:-1] if short else data)
+
+
+class TestDownload(SimpleTestCase):
+    def setUp(self):
+        self.data = os.urandom(1000)
+
+    def download(self, client, **kwargs):
+        out = io.BytesIO()
+        with mock.patch.object(minio, "MINIO", client):
+            size = minio.minio_download(
+                "docs/a.jpg", out, chunk_size=64, max_workers=3, **kwargs
+            )
+        return size, out.getvalue()
+
+    def test_download(self):
+        client = FakeMinio(self.data)
+        size, data = self.download(client)
+
+        self.assertEqual(size, len(self.data))
+        self.assertEqual(data, self.data)
+        self.assertEqual(len(client.ranges), 16)
+        self.assertEqual(sorted(client.ranges)[-1], (960, 40))
+
+    def test_resume(self):
+        client = FakeMinio(self.data)
+        size, data = self.download(client, offset=300)
+
+        self.assertEqual(size, len(self.data))
+        self.assertEqual(data, self.data[300:])
+        self.assertEqual(min(client.ranges), (300, 64))
+
+    def test_retry(self):
+        client = FakeMinio(self.data, fail_at=[64, 512], short_at=[128])
+        with self.assertLogs(minio.LOGGER, "WARNING") as logs:
+            size, data = self.download(client)
+
+        self.assertEqual(data, self.data)
+        self.assertEqual(len(logs.records), 3)
+        self.assertEqual(len(client.ranges), 16 + 3)
+
+    def test_errors(self):
+        client = FakeMinio(self.data, fail_at=[64])
+        with self.assertRaises(minio.MinioTransferError) as raised:
+            # Not retried when there's a single attempt
+            self.download(client, attempts=1)
+        self.assertEqual(raised.exception.code, "ProtocolError")
+        self.assertEqual(client.ranges.count((64, 64)), 1)
+
+        with self.assertRaises(minio.MinioTransferError) as raised:
+            with mock.patch.object(minio, "MINIO", client):
+                minio.minio_download("docs/missing.jpg", io.BytesIO())
+        self.assertEqual(raised.exception.code, "NoSuchKey")
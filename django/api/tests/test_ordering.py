@@ -0,0 +1,81 @@
+from unittest import mock
+from django.db.models import F
+from django.test import SimpleTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.filters.order_by import RelatedOrderingFilter
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+
+
+class View:
+    ordering_fields = "__all_related__"
+
+
+class TestRelatedOrderingFilter(SimpleTestCase):
+    def setUp(self):
+        RelatedOrderingFilter._all_related_fields_cache.clear()
+
+    def valid_fields(self, view, queryset=None):
+        if queryset is None:
+            queryset = HouseholdMember.objects.all()
+        return [
+            name for name, _ in
+            RelatedOrderingFilter().get_valid_fields(queryset, view)
+        ]
+
+    def test_encrypted_fields_refused(self):
+        fields = self.valid_fields(View())
+
+        self.assertIn("created", fields)
+        self.assertIn("application__tax_year", fields)
+        self.assertIn("user__username", fields)
+        self.assertNotIn("sin", fields)
+        self.assertNotIn("application__sin", fields)
+
+    def test_memoized_per_model(self):
+        with mock.patch.object(
+            RelatedOrderingFilter, "_retrieve_all_related_fields",
+            autospec=True,
+            side_effect=RelatedOrderingFilter._retrieve_all_related_fields,
+        ) as retrieve:
+            first = self.valid_fields(View())
+            second = self.valid_fields(View())
+            self.valid_fields(
+                View(), GoElectricRebateApplication.objects.all()
+            )
+            annotated = self.valid_fields(
+                View(),
+                HouseholdMember.objects.annotate(
+                    year=F("application__tax_year")
+                ),
+            )
+
+        self.assertEqual(first, second)
+        self.assertEqual(annotated, first + ["year"])
+        # Walked from the top once per model and set of annotations
+        top_level = [
+            call for call in retrieve.call_args_list if len(call.args) == 3
+        ]
+        self.assertEqual(len(top_level), 3)
+
+    def test_whitelist(self):
+        view = View()
+        view.ordering_whitelist = {"created", "application__tax_year", "sin"}
+
+        self.assertEqual(
+            sorted(self.valid_fields(view)),
+            ["application__tax_year", "created"],
+        )
+
+    def test_ordering_on_encrypted_field_ignored(self):
+        request = Request(
+            APIRequestFactory().get("/", {"ordering": "sin,-created"})
+        )
+        queryset = RelatedOrderingFilter().filter_queryset(
+            request, HouseholdMember.objects.all(), View()
+        )
+
+        self.assertEqual(queryset.query.order_by, ("-created",))
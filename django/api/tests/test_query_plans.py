@@ -0,0 +1,121 @@
+"""
+Checks the queries the application runs against its biggest tables keep
+using their indexes. A failure here usually means a query or an index was
+changed without the other.
+"""
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from api.models.go_electric_rebate_application import (
+    GoElectricRebateApplication,
+)
+from api.models.household_member import HouseholdMember
+from api.models.outbox_email import OutboxEmail
+from api.pagination import KeysetPagination
+from api.services import email_outbox
+from api.services.documents import PENDING
+
+
+class TestQueryPlans(TestCase):
+    def setUp(self):
+        if connection.vendor == "postgresql":
+            # The test tables are tiny, where a sequential scan always wins
+            with connection.cursor() as cursor:
+                cursor.execute("SET LOCAL enable_seqscan = off")
+
+    def index_name(self, model, field):
+        """
+        Name of the index Django made for a field with db_index or a foreign
+        key, as opposed to the ones declared in Meta.indexes
+        """
+        declared = {index.name for index in model._meta.indexes}
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, model._meta.db_table
+            )
+        return next(
+            name for name, constraint in constraints.items()
+            if constraint["index"] and constraint["columns"] == [field]
+            and not constraint["primary_key"] and name not in declared
+        )
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = queryset.explain()
+        self.assertIn(index_name, plan, f"{queryset.query}\n{plan}")
+
+    def test_pending_cra_verification(self):
+        self.assertUsesIndex(
+            GoElectricRebateApplication.objects.filter(
+                tax_year__in=[2021, 2022], verified=False
+            ),
+            "application_pending_cra_idx",
+        )
+        self.assertUsesIndex(
+            HouseholdMember.objects.filter(
+                application__tax_year__in=[2021, 2022], verified=False
+            ),
+            "member_pending_cra_idx",
+        )
+
+    def test_review_queue(self):
+        self.assertUsesIndex(
+            GoElectricRebateApplication.objects.filter(verified=False)
+            .order_by("created"),
+            "application_unverified_idx",
+        )
+
+    def test_keyset_pages(self):
+        paginator = KeysetPagination()
+        cursor = paginator.encode_cursor(GoElectricRebateApplication(
+            pk="8fb2d1a0-84b3-4b8b-9c49-34a1f1c3c2a1", created=timezone.now()
+        ))
+        self.assertUsesIndex(
+            paginator.page_queryset(
+                GoElectricRebateApplication.objects.all(), cursor
+            ),
+            next(
+                index.name
+                for index in GoElectricRebateApplication._meta.indexes
+                if index.fields == ["created", "id"]
+            ),
+        )
+
+    def test_household_members_of_an_application(self):
+        application = GoElectricRebateApplication(
+            pk="8fb2d1a0-84b3-4b8b-9c49-34a1f1c3c2a1"
+        )
+        self.assertUsesIndex(
+            HouseholdMember.objects.filter(application=application),
+            self.index_name(HouseholdMember, "application_id"),
+        )
+
+    def test_lookup_by_sin(self):
+        self.assertUsesIndex(
+            GoElectricRebateApplication.objects.filter_sin("123456789"),
+            self.index_name(GoElectricRebateApplication, "sin_hash"),
+        )
+        self.assertUsesIndex(
+            HouseholdMember.objects.filter_sins(["123456789", "046454286"]),
+            self.index_name(HouseholdMember, "sin_hash"),
+        )
+
+    def test_pending_documents(self):
+        self.assertUsesIndex(
+            GoElectricRebateApplication.objects.filter(
+                documents_status=PENDING
+            )
+            .order_by("created"),
+            "application_pending_docs_idx",
+        )
+        self.assertUsesIndex(
+            HouseholdMember.objects.filter(documents_status=PENDING)
+            .order_by("created"),
+            "member_pending_docs_idx",
+        )
+
+    def test_due_emails(self):
+        # The query email_outbox.lease runs
+        self.assertUsesIndex(
+            email_outbox.due_emails(timezone.now()),
+            OutboxEmail._meta.indexes[0].name,
+        )
@@ -0,0 +1,64 @@
+from datetime import date
+from django.test import TestCase
+from api.models.household_member import HouseholdMember
+from api.services.cra import read_bulk
+from api.services.reconcile import reconcile
+from api.tests.applications import create_application, create_user
+
+
+class TestReconcile(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.application = create_application(
+            tax_year=2020, application_type="household"
+        )
+
+    def test_reconcile(self):
+        other_year = create_application(application_type="household")
+        member = HouseholdMember.objects.create(
+            user=self.user,
+            application=other_year,
+            sin="046454286",
+            last_name="Doe",
+            first_name="Jane",
+            email="jane@example.com",
+            date_of_birth=date(1956, 1, 1),
+            doc1="docs/doc3.jpg",
+            doc2="docs/doc4.jpg",
+            verified=False,
+        )
+        records = read_bulk("api/tests/data/EMLI_RESPONSE_FILE_example.txt")
+
+        # One query per candidate table plus one update per matched chunk
+        with self.assertNumQueries(4):
+            result = reconcile([
+                *records,
+                ("046454286", 2021, 45000),
+                ("999999999", 2020, 10),
+            ])
+
+        self.assertEqual(result, {
+            "applications": 1,
+            "household_members": 1,
+            "unmatched": 1,
+        })
+
+        self.application.refresh_from_db()
+        self.assertTrue(self.application.verified)
+        self.assertEqual(self.application.net_income, 30257)
+
+        other_year.refresh_from_db()
+        self.assertFalse(other_year.verified)
+
+        member.refresh_from_db()
+        self.assertTrue(member.verified)
+        self.assertEqual(member.net_income, 45000)
+
+    def test_reconcile_read_output(self):
+        result = reconcile(
+            [{"sin": "123456789", "year": "2020", "income": "30257"}]
+        )
+
+        self.assertEqual(result["applications"], 1)
+        self.application.refresh_from_db()
+        self.assertEqual(self.application.net_income, 30257)
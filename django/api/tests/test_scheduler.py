@@ -0,0 +1,240 @@
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django_extensions.management.jobs import DailyJob, HourlyJob
+from api.models.job_run import JobRun
+from api.services import scheduler
+
+
+def at(*args):
+    return datetime(*args, tzinfo=dt_timezone.utc)
+
+
+class Hourly(HourlyJob):
+    runs = []
+
+    def execute(self):
+        self.runs.append(self.scheduled_for)
+
+
+class Daily(DailyJob):
+    catch_up = 3
+    runs = []
+
+    def execute(self):
+        self.runs.append(self.scheduled_for)
+
+
+class Failing(HourlyJob):
+    def execute(self):
+        raise RuntimeError("CRA is down")
+
+
+@override_settings(TIME_ZONE="UTC")
+class TestScheduler(TestCase):
+    def setUp(self):
+        Hourly.runs = []
+        Daily.runs = []
+
+    def test_slots(self):
+        moment = at(2022, 3, 17, 10, 47, 12)
+        self.assertEqual(
+            scheduler.slot_start("minutely", moment), at(2022, 3, 17, 10, 47)
+        )
+        self.assertEqual(
+            scheduler.slot_start("quarter_hourly", moment),
+            at(2022, 3, 17, 10, 45),
+        )
+        self.assertEqual(
+            scheduler.slot_start("hourly", moment), at(2022, 3, 17, 10)
+        )
+        self.assertEqual(
+            scheduler.slot_start("daily", moment), at(2022, 3, 17)
+        )
+        self.assertEqual(
+            scheduler.slot_start("weekly", moment), at(2022, 3, 14)
+        )
+        self.assertEqual(
+            scheduler.slot_start("monthly", moment), at(2022, 3, 1)
+        )
+        self.assertEqual(
+            scheduler.slot_start("yearly", moment), at(2022, 1, 1)
+        )
+
+        self.assertEqual(
+            scheduler.next_slot("monthly", at(2022, 1, 1)), at(2022, 2, 1)
+        )
+        self.assertEqual(
+            scheduler.next_slot("monthly", at(2022, 12, 1)), at(2023, 1, 1)
+        )
+        self.assertEqual(
+            scheduler.next_slot("yearly", at(2022, 1, 1)), at(2023, 1, 1)
+        )
+        with self.assertRaises(ValueError):
+            scheduler.slot_start("fortnightly", moment)
+
+    def test_once_per_slot(self):
+        jobs = {"api.hourly": Hourly}
+        now = at(2022, 3, 17, 10, 5)
+
+        runs = scheduler.run_pending(now, jobs)
+        scheduler.run_pending(now + timedelta(minutes=30), jobs)
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(runs[0].status, JobRun.SUCCEEDED)
+        self.assertIsNotNone(runs[0].duration)
+        self.assertEqual(Hourly.runs, [at(2022, 3, 17, 10)])
+
+        scheduler.run_pending(now + timedelta(hours=1), jobs)
+        self.assertEqual(
+            Hourly.runs, [at(2022, 3, 17, 10), at(2022, 3, 17, 11)]
+        )
+
+    def test_slot_already_claimed(self):
+        slot = at(2022, 3, 17, 10)
+        self.assertIsNotNone(scheduler.run_job("api.hourly", Hourly, slot))
+        self.assertIsNone(scheduler.run_job("api.hourly", Hourly, slot))
+        self.assertEqual(Hourly.runs, [slot])
+
+    def test_catch_up(self):
+        jobs = {"api.hourly": Hourly, "api.daily": Daily}
+        scheduler.run_pending(at(2022, 3, 1, 0, 5), jobs)
+
+        # The scheduler was down for a week
+        scheduler.run_pending(at(2022, 3, 8, 0, 5), jobs)
+
+        # Only the latest missed hour, the last three missed days
+        self.assertEqual(Hourly.runs, [at(2022, 3, 1), at(2022, 3, 8)])
+        self.assertEqual(
+            Daily.runs,
+            [at(2022, 3, 1), at(2022, 3, 6), at(2022, 3, 7), at(2022, 3, 8)],
+        )
+
+    def test_failure_recorded(self):
+        with self.assertLogs(scheduler.LOGGER, "ERROR"):
+            runs = scheduler.run_pending(
+                at(2022, 3, 17, 10, 5), {"api.failing": Failing}
+            )
+
+        self.assertEqual(runs[0].status, JobRun.FAILED)
+        self.assertIn("CRA is down", runs[0].error)
+        # A failed slot isn't retried, the next one runs
+        self.assertEqual(
+            scheduler.run_pending(
+                at(2022, 3, 17, 10, 50), {"api.failing": Failing}
+            ),
+            [],
+        )
+
+    def test_interrupted_runs_failed(self):
+        # Left behind by a scheduler that was killed mid-run
+        JobRun.objects.create(
+            job="api.hourly", scheduled_for=at(2022, 3, 17, 9),
+            started_at=at(2022, 3, 17, 9, 0, 1),
+        )
+
+        with self.assertLogs(scheduler.LOGGER, "WARNING"):
+            runs = scheduler.run_pending(
+                at(2022, 3, 17, 10, 5), {"api.hourly": Hourly}
+            )
+
+        self.assertEqual(len(runs), 1)
+        interrupted = JobRun.objects.get(scheduled_for=at(2022, 3, 17, 9))
+        self.assertEqual(interrupted.status, JobRun.FAILED)
+        self.assertIn("Interrupted", interrupted.error)
+        self.assertFalse(JobRun.objects.filter(status=JobRun.RUNNING).exists())
+
+    def test_advisory_lock_released_in_its_session(self):
+        connection = mock.MagicMock(vendor="postgresql")
+        cursor = connection.cursor.return_value.__enter__.return_value
+        cursor.fetchone.return_value = (True,)
+
+        with mock.patch.object(scheduler, "connection", connection):
+            with scheduler.advisory_lock("job:api.hourly") as locked:
+                self.assertTrue(locked)
+            self.assertIn(
+                "pg_advisory_unlock", cursor.execute.call_args.args[0]
+            )
+
+            # The job closed the connection, the lock went with its session
+            cursor.reset_mock()
+            with self.assertLogs(scheduler.LOGGER, "WARNING"):
+                with scheduler.advisory_lock("job:api.hourly"):
+                    connection.connection = mock.Mock()
+            self.assertNotIn(
+                "pg_advisory_unlock", cursor.execute.call_args.args[0]
+            )
+
+            # The session broke, closing it is what releases the lock
+            def execute(sql, params):
+                if "unlock" in sql:
+                    raise OperationalError("server closed the connection")
+
+            cursor.execute.side_effect = execute
+            with self.assertLogs(scheduler.LOGGER, "ERROR"):
+                with scheduler.advisory_lock("job:api.hourly"):
+                    pass
+            connection.close.assert_called_once_with()
+
+    def test_stale_connections_closed_every_tick(self):
+        path = "api.management.commands.run_scheduler"
+        with mock.patch(path + ".close_old_connections") as close, \
+                mock.patch(path + ".run_pending", return_value=[]):
+            call_command("run_scheduler", once=True, stdout=StringIO())
+        close.assert_called_once_with()
+
+    def test_stats(self):
+        jobs = {"api.hourly": Hourly, "api.failing": Failing}
+        with self.assertLogs(scheduler.LOGGER, "ERROR"):
+            for hour in (10, 11, 12):
+                scheduler.run_pending(at(2022, 3, 17, hour, 5), jobs)
+
+        stats = {row["job"]: row for row in scheduler.job_stats()}
+        self.assertEqual(stats["api.hourly"]["runs"], 3)
+        self.assertEqual(stats["api.hourly"]["failures"], 0)
+        self.assertEqual(stats["api.failing"]["failures"], 3)
+        self.assertEqual(stats["api.failing"]["last"], at(2022, 3, 17, 12))
+
+        out = StringIO()
+        call_command("run_scheduler", stats=36500, stdout=out)
+        self.assertIn("api.failing: 3 runs, 3 failed", out.getvalue())
+
+    def test_prune_runs(self):
+        jobs = {"api.hourly": Hourly, "api.failing": Failing}
+        with self.assertLogs(scheduler.LOGGER, "ERROR"):
+            for hour in (10, 11, 12):
+                scheduler.run_pending(at(2022, 3, 17, hour, 5), jobs)
+        scheduler.run_pending(at(2022, 3, 17, 10, 5), {"api.daily": Daily})
+
+        self.assertEqual(scheduler.prune_runs(timezone.now()), 2)
+        # The failures and the latest run of each job are kept
+        self.assertEqual(
+            sorted(JobRun.objects.values_list("job", "scheduled_for")),
+            [
+                ("api.daily", at(2022, 3, 17)),
+                ("api.failing", at(2022, 3, 17, 10)),
+                ("api.failing", at(2022, 3, 17, 11)),
+                ("api.failing", at(2022, 3, 17, 12)),
+                ("api.hourly", at(2022, 3, 17, 12)),
+            ],
+        )
+        self.assertEqual(
+            scheduler.prune_runs(timezone.now() - timedelta(days=1)), 0
+        )
+        # The next slot is still found from the latest run
+        runs = scheduler.run_pending(
+            at(2022, 3, 17, 13, 5), {"api.hourly": Hourly}
+        )
+        self.assertEqual(
+            [run.scheduled_for for run in runs], [at(2022, 3, 17, 13)]
+        )
+
+    def test_project_jobs_discovered(self):
+        jobs = scheduler.scheduled_jobs()
+        self.assertIn("api.fetch", jobs)
+        self.assertEqual(jobs["api.fetch"].when, "hourly")
+        self.assertEqual(jobs["api.prune_job_runs"].when, "daily")
@@ -1,7 +1,10 @@
 from datetime import date
 from dateutil.relativedelta import relativedelta
+from django.conf import settings
 from django.core.exceptions import ValidationError
 
+from api.services.minio import MinioTransferError, minio_stat_object
+
 
 def validate_driving_age(dob):
     birthday = date(dob.year, dob.month, dob.day)
@@ -54,3 +57,37 @@ def validate_consent(has_consented):
         raise ValidationError(
             "You must confirm both consent check boxes to submit your application."
         )
+
+
+def document_prefix(user):
+    """
+    Prefix of the keys of the documents a user is handed out presigned URLs
+    for, so keys can't be taken from someone else's application
+    """
+    return "docs/%s/" % user.pk
+
+
+def validate_document(object_name, user):
+    """
+    Checks a document uploaded to minio with a presigned URL is one we
+    handed out to this user and is an image of an acceptable size, without
+    downloading it.
+    """
+    if user is None or user.pk is None \
+            or not object_name.startswith(document_prefix(user)) \
+            or ".." in object_name:
+        raise ValidationError("Please upload your document again.")
+
+    try:
+        stat = minio_stat_object(object_name)
+    except MinioTransferError:
+        raise ValidationError("Please upload your document again.")
+
+    if stat.size > settings.DOCUMENT_MAX_SIZE:
+        raise ValidationError(
+            "Documents must be smaller than %d MB."
+            % (settings.DOCUMENT_MAX_SIZE // (1024 * 1024))
+        )
+
+    if stat.content_type not in settings.DOCUMENT_CONTENT_TYPES:
+        raise ValidationError("Documents must be images.")
@@ -1,18 +1,48 @@
+from rest_framework.decorators import action
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from api.serializers.application_form import ApplicationFormSerializer, \
-    ApplicationFormCreateSerializer
+    ApplicationFormCreateSerializer, DocumentUploadSerializer, \
+    ApplicationFormListSerializer
+from api.serializers.mixins import SparseFieldsetMixin, requested_fields
 from api.models.go_electric_rebate_application import GoElectricRebateApplication
+from api.pagination import KeysetPagination
 
 
 class ApplicationFormViewset(ModelViewSet):
     queryset = GoElectricRebateApplication.objects.all()
+    pagination_class = KeysetPagination
     serializer_classes = {
         'default': ApplicationFormSerializer,
         'create': ApplicationFormCreateSerializer,
+        'list': ApplicationFormListSerializer,
+        'upload_urls': DocumentUploadSerializer,
     }
 
     def get_serializer_class(self):
+        # Lists asking for specific fields may ask for any of them
+        if self.action == 'list' and requested_fields(self.request):
+            return self.serializer_classes.get('default')
+
         if self.action in list(self.serializer_classes.keys()):
             return self.serializer_classes.get(self.action)
 
         return self.serializer_classes.get('default')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            # Only load the columns that end up in the response (plus the
+            # pagination keyset), encrypted ones included
+            serializer = self.get_serializer()
+            if isinstance(serializer, SparseFieldsetMixin):
+                queryset = queryset.only(
+                    'created', *serializer.model_fields()
+                )
+        return queryset
+
+    @action(detail=False, methods=['post'], url_path='upload-urls')
+    def upload_urls(self, request):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(serializer.data)
@@ -2,6 +2,7 @@ import React from 'react';
 import { FormProvider, useForm, Controller } from 'react-hook-form';
 import { useNavigate } from 'react-router-dom';
 import { useMutation, useQueryClient } from 'react-query';
+import axios from 'axios';
 import FormGroup from '@mui/material/FormGroup';
 import Button from '@mui/material/Button';
 import TextField from '@mui/material/TextField';
@@ -45,19 +46,27 @@ const Form = () => {
   const { control, handleSubmit, register, watch } = methods;
   const axiosInstance = useAxios();
   const navigate = useNavigate();
-  const mutation = useMutation((data) => {
-    const formData = new FormData();
-    for (const [key, value] of Object.entries(data)) {
-      if (key === 'documents') {
-        formData.append('doc1', value[0]);
-        formData.append('doc2', value[1]);
-      } else {
-        formData.append(key, value);
-      }
-    }
-    formData.append('tax_year', 2021);
-    return axiosInstance.current.post('/api/application-form', formData, {
-      headers: { 'Content-Type': 'multipart/form-data' }
+  const mutation = useMutation(async (data) => {
+    const { documents, ...fields } = data;
+    // documents go straight to object storage, only their keys go to the API
+    const uploads = await axiosInstance.current.post(
+      '/api/application-form/upload-urls',
+      { content_types: documents.map((document) => document.type) }
+    );
+    // a missing document is left out, so the API reports it against its field
+    const [doc1 = {}, doc2 = {}] = uploads.data.documents;
+    await Promise.all(
+      uploads.data.documents.map(({ url }, index) =>
+        axios.put(url, documents[index], {
+          headers: { 'Content-Type': documents[index].type }
+        })
+      )
+    );
+    return axiosInstance.current.post('/api/application-form', {
+      ...fields,
+      doc1: doc1.object_name,
+      doc2: doc2.object_name,
+      tax_year: 2021
     });
   });
   const onSubmit = (data) =>